@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from bench_tokens import DictToken
+from my_lang_compiler.arena import Arena
+from my_lang_compiler.ast_nodes import AST
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.tokens import Token
+
+
+class DictNode:
+    # Node layout before __slots__ was added, kept for comparison.
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+
+
+def as_dict_nodes(node):
+    if isinstance(node, list):
+        return [as_dict_nodes(item) for item in node]
+    if isinstance(node, Token):
+        return DictToken(node.type, node.value, node.line, node.column)
+    if isinstance(node, AST):
+        return DictNode({name: as_dict_nodes(getattr(node, name)) for name in node._fields})
+    return node
+
+
+def retained(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory used by AST representations.")
+    parser.add_argument("--statements", type=int, default=20000)
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    source = generate_source(args.statements)
+    print(f"input: {len(source)} characters")
+
+    tree, slotted_size = retained(lambda: Parser(Scanner(source)).parse())
+    _, dict_size = retained(lambda: as_dict_nodes(tree))
+    arena, arena_size = retained(lambda: Arena.from_ast(tree))
+    rows = len(arena)
+
+    for name, size in (("dict nodes", dict_size), ("slotted nodes", slotted_size), ("Arena", arena_size)):
+        print(f"{name:14} {rows} nodes {size / 1024 / 1024:8.2f} MiB ({size / rows:.1f} bytes/node)")
+
+    for name, root in (("AST", tree), ("Arena views", arena.root())):
+        start = time.perf_counter()
+        SemanticAnalyzer().visit(root)
+        print(f"SemanticAnalyzer on {name}: {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from my_lang_compiler.incremental import IncrementalCompiler
+from my_lang_compiler.main import compile_source
+
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Edit latency of IncrementalCompiler vs a full compile.")
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    source = generate_source(args.statements)
+    print(f"input: {len(source)} characters")
+
+    _, full = timed(lambda: compile_source(source, verbose=False))
+    print(f"compile_source:        {full:.3f}s")
+
+    compiler = IncrementalCompiler()
+    result, initial = timed(lambda: compiler.compile(source))
+    print(f"session compile:       {initial:.3f}s")
+
+    # Rewrite a numeric literal at evenly spaced points through the file.
+    total = 0.0
+    reparsed = 0
+    for index in range(args.edits):
+        offset = len(result.text) * (index + 1) // (args.edits + 1)
+        text = result.text
+        while not (text[offset].isdigit() and not text[offset - 1].isalnum()):
+            offset += 1
+        result, elapsed = timed(lambda: compiler.recompile(result, [(offset, 1, "7")]))
+        if result.error:
+            raise SystemExit(result.error)
+        total += elapsed
+        reparsed += result.stats['reparsed']
+
+    print(f"single-character edit: {total / args.edits:.3f}s average, {reparsed / args.edits:.1f} statements re-parsed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
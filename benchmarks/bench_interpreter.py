@@ -0,0 +1,67 @@
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from bench_loops import PROGRAMS
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.pipeline import lower
+from my_lang_compiler.passes import DEFAULT_LEVEL, LEVELS
+from my_lang_compiler.codegen import CodeGenerator
+from my_lang_compiler.interpreter import Interpreter
+
+SAMPLE = Path(__file__).resolve().parent.parent / "sample.src"
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def compile_and_run(program, directory, name, cc, cflags):
+    # Output and (codegen, build, run) times of the generated C.
+    c_code, codegen = timed(lambda: CodeGenerator(program).generate())
+    source = Path(directory) / f"{name}.c"
+    binary = Path(directory) / name
+    source.write_text(c_code)
+    _, build = timed(lambda: subprocess.run([cc, *cflags, "-o", str(binary), str(source)], check=True))
+    result, run = timed(lambda: subprocess.run([str(binary)], check=True, capture_output=True, text=True))
+    return result.stdout, (codegen, build, run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Running the IR in-process against building and running the generated C.")
+    parser.add_argument("--size", type=int, default=300, help="outer loop bound of the bench_loops programs")
+    parser.add_argument("--statements", type=int, default=2000, help="size of the generated straight-line program")
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL)
+    parser.add_argument("--cc", default=shutil.which("cc") or "cc")
+    parser.add_argument("--cflags", default="-O1 -fwrapv")
+    args = parser.parse_args(argv)
+    cflags = args.cflags.split()
+    sys.setrecursionlimit(10000)
+
+    programs = {"sample": SAMPLE.read_text(encoding="utf-8"), "straight": generate_source(args.statements)}
+    programs.update((name, generate(args.size)) for name, generate in PROGRAMS.items())
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in programs.items():
+            program, frontend = timed(lambda: lower(Scanner(source), opt_level=args.level))
+            expected, (codegen, build, run) = compile_and_run(program, directory, name, args.cc, cflags)
+            interpreter = Interpreter(program)
+            output, interpret = timed(interpreter.run)
+            if output != expected:
+                raise SystemExit(f"{name}: interpreter output differs from the C program's")
+            native = codegen + build + run
+            print(f"{name:10} frontend {frontend:.3f}s  C: codegen {codegen:.3f}s + {args.cc} {build:.3f}s + run {run:.3f}s = {native:.3f}s  "
+                  f"interpreted {interpret:.3f}s ({interpreter.steps / interpret / 1e6:.1f}M instructions/s, {native / interpret:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
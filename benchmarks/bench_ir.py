@@ -0,0 +1,77 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.ir_generator import IRGenerator
+from my_lang_compiler.packed import PackedIR
+from my_lang_compiler.passes import PassManager, LEVELS
+from my_lang_compiler.pipeline import lower
+from my_lang_compiler.codegen import CodeGenerator
+
+# Starts with a loop, so the entry block is a join.
+LOOP_FIRST = "mywhile (1 > 2) { myprint(0); }\n"
+
+
+def retained(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory used by IR representations and code generation time over each.")
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--pass-statements", type=int, default=1000, help="size of the program the passes run on")
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    source = generate_source(args.statements)
+    print(f"input: {len(source)} characters")
+    ast = Parser(Scanner(source)).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.visit(ast)
+
+    program, program_size = retained(lambda: IRGenerator(analyzer.variables).visit(ast))
+    packed, packed_size = retained(lambda: PackedIR.from_program(program))
+    rows = len(packed)
+    if str(packed.to_program()) != str(program):
+        print("PackedIR round trip differs from the IRProgram")
+        return 1
+
+    for name, size in (("IRProgram", program_size), ("PackedIR", packed_size)):
+        print(f"{name:10} {rows} instructions {size / 1024 / 1024:8.2f} MiB ({size / rows:.1f} bytes/instruction)")
+    print(f"operand table: {len(packed.values)} entries")
+
+    for name, ir in (("IRProgram", program), ("PackedIR", packed)):
+        start = time.perf_counter()
+        CodeGenerator(ir).generate()
+        print(f"CodeGenerator on {name}: {time.perf_counter() - start:.3f}s")
+
+    program = lower(Scanner(LOOP_FIRST + generate_source(args.pass_statements)), opt_level=0)
+    packed = PackedIR.from_program(program)
+    for level in sorted(LEVELS):
+        results = []
+        for name, ir in (("IRProgram", program), ("PackedIR", packed)):
+            start = time.perf_counter()
+            result = PassManager.for_level(level).run(ir)
+            results.append(time.perf_counter() - start)
+            results.append(str(result.to_program() if type(result) is PackedIR else result))
+        if results[1] != results[3]:
+            print(f"-O{level} passes give different IR on the PackedIR")
+            return 1
+        print(f"-O{level} passes: IRProgram {results[0]:.3f}s  PackedIR {results[2]:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from my_lang_compiler.lexer import Lexer
+from my_lang_compiler.scanner import Scanner
+
+
+def generate_source(statements):
+    lines = ["# generated benchmark input", "myvar i = 0;", "myvar total = 0;"]
+    for n in range(statements):
+        lines.append(f"myvar v{n} = (i + {n}) * 3 - total / 2;")
+        lines.append(f"myif (v{n} >= {n}) {{ total = total + v{n}; }} myelse {{ myprint(\"miss\\n\"); }}")
+    return "\n".join(lines) + "\n"
+
+
+def measure(lexer_class, source, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(lexer_class(source).tokenize())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Lexer and Scanner throughput.")
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    source = generate_source(args.statements)
+    print(f"input: {len(source)} characters")
+
+    reference = [(t.type, t.value, t.line, t.column) for t in Lexer(source).tokenize()]
+    scanned = [(t.type, t.value, t.line, t.column) for t in Scanner(source).tokenize()]
+    if reference != scanned:
+        print("token streams differ")
+        return 1
+
+    for name, lexer_class in (("Lexer", Lexer), ("Scanner", Scanner)):
+        count, elapsed = measure(lexer_class, source, args.repeat)
+        print(f"{name:8} {count} tokens in {elapsed:.3f}s ({count / elapsed:,.0f} tokens/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from bench_optimizer import generate_loop_source
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.ir_generator import IRGenerator
+from my_lang_compiler.passes import PassManager, LEVELS
+from my_lang_compiler.regalloc import TempAllocator
+from my_lang_compiler.codegen import CodeGenerator
+
+
+def build(c_code, directory, name, cc, cflags):
+    # Builds the C code and returns the binary's output and the build time.
+    source = Path(directory) / f"{name}.c"
+    binary = Path(directory) / name
+    source.write_text(c_code)
+    start = time.perf_counter()
+    subprocess.run([cc, *cflags, "-o", str(binary), str(source)], check=True)
+    elapsed = time.perf_counter() - start
+    output = subprocess.run([str(binary)], check=True, capture_output=True, text=True).stdout
+    return output, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="C locals declared and C compile time with and without temp allocation.")
+    parser.add_argument("--statements", type=int, default=5000)
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=0, help="passes run before allocating")
+    parser.add_argument("--max-locals", type=int)
+    parser.add_argument("--cc", default=shutil.which("cc") or "cc")
+    parser.add_argument("--cflags", default="-O1")
+    args = parser.parse_args(argv)
+    cflags = args.cflags.split()
+    sys.setrecursionlimit(10000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in (("straight", generate_source(args.statements)), ("loop", generate_loop_source(args.statements))):
+            ast = Parser(Scanner(source)).parse()
+            analyzer = SemanticAnalyzer()
+            analyzer.visit(ast)
+            program = PassManager.for_level(args.level).run(IRGenerator(analyzer.variables).visit(ast))
+
+            start = time.perf_counter()
+            allocator = TempAllocator(program, args.max_locals)
+            allocated = allocator.optimize()
+            allocate_time = time.perf_counter() - start
+
+            expected, before = build(CodeGenerator(program).generate(), directory, f"{name}_temps", args.cc, cflags)
+            output, after = build(CodeGenerator(allocated).generate(), directory, f"{name}_locals", args.cc, cflags)
+            if output != expected:
+                raise SystemExit(f"{name}: output differs after temp allocation")
+            spilled = f" + {allocator.array_size} array elements" if allocator.spilled else ""
+            print(f"{name:9} {allocator.temps:7} temps -> {allocator.locals:5} locals{spilled} in {allocate_time:.3f}s  "
+                  f"{args.cc} {before:.2f}s -> {after:.2f}s ({before / after:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.ir_generator import IRGenerator
+from my_lang_compiler.optimizer import Optimizer
+from my_lang_compiler.sccp import ConstantPropagator
+from my_lang_compiler.dce import DeadCodeEliminator
+from my_lang_compiler.copyprop import CopyPropagator
+from my_lang_compiler.loops import LoopOptimizer
+from my_lang_compiler.codegen import CodeGenerator
+
+WITHOUT_LOOPS = (Optimizer, ConstantPropagator, DeadCodeEliminator, CopyPropagator)
+WITH_LOOPS = WITHOUT_LOOPS + (LoopOptimizer, CopyPropagator)
+
+
+def nested_source(size):
+    # A multiply-heavy double counting loop.
+    return f"""
+myvar n = {size};
+myvar i = 0;
+myvar sum = 0;
+mywhile (i < n) {{
+    myvar j = 0;
+    mywhile (j < n) {{
+        sum = sum + (i * 7 + j * 3) * 5 + (j + 2) * 11;
+        j = j + 1;
+    }}
+    i = i + 1;
+}}
+myprint(sum);
+"""
+
+
+def invariant_source(size):
+    # A loop recomputing values that only depend on `scale`, which is only
+    # known once the first loop has run.
+    return f"""
+myvar scale = 0;
+mywhile (scale < 9) {{ scale = scale + 1; }}
+myvar i = 0;
+myvar acc = 0;
+mywhile (i < {size * size}) {{
+    myvar a = i * 4 + scale * scale;
+    myvar b = (i + 3) * 6 - (scale + 1) * (scale - 1);
+    myif (a > b - scale * 2) {{ acc = acc + a; }} myelse {{ acc = acc - b; }}
+    i = i + 1;
+}}
+myprint(acc);
+"""
+
+
+def fibonacci_source(size):
+    # sample.src's loop, run for longer.
+    return f"""
+myvar a = 0;
+myvar b = 1;
+myvar i = 0;
+myvar next;
+mywhile (i < {size * size}) {{
+    next = a + b;
+    a = b;
+    b = next;
+    i = i + 1;
+}}
+myprint(a);
+"""
+
+
+PROGRAMS = {"nested": nested_source, "invariant": invariant_source, "fibonacci": fibonacci_source}
+
+
+def compile_ir(source, passes):
+    ast = Parser(Scanner(source)).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.visit(ast)
+    program = IRGenerator(analyzer.variables).visit(ast)
+    for optimization in passes:
+        program = optimization(program).optimize()
+    return program
+
+
+def build_and_run(c_code, directory, name, cc, cflags, repeat):
+    # Builds the C code and returns its output and best run time.
+    source = Path(directory) / f"{name}.c"
+    binary = Path(directory) / name
+    source.write_text(c_code)
+    subprocess.run([cc, *cflags, "-o", str(binary), str(source)], check=True)
+    best = None
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([str(binary)], check=True, capture_output=True, text=True).stdout
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return output, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run time of the generated C for loop-heavy programs, with and without loop optimization.")
+    parser.add_argument("--size", type=int, default=3000, help="outer loop bound; inner work grows with its square")
+    parser.add_argument("--cc", default=shutil.which("cc") or "cc")
+    parser.add_argument("--cflags", default="-O0 -fwrapv", help="the default keeps the C compiler from redoing the loop work")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    cflags = args.cflags.split()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generate in PROGRAMS.items():
+            source = generate(args.size)
+            plain = compile_ir(source, WITHOUT_LOOPS)
+            optimized = compile_ir(source, WITH_LOOPS)
+            expected, before = build_and_run(CodeGenerator(plain).generate(), directory, f"{name}_plain", args.cc, cflags, args.repeat)
+            output, after = build_and_run(CodeGenerator(optimized).generate(), directory, f"{name}_loops", args.cc, cflags, args.repeat)
+            if output != expected:
+                raise SystemExit(f"{name}: output differs with loop optimization")
+            print(f"{name:10} {len(plain.instructions):4} -> {len(optimized.instructions):4} instructions  "
+                  f"run {before:.3f}s -> {after:.3f}s ({before / after:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
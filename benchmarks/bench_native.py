@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_loops import PROGRAMS
+from my_lang_compiler.batch import compile_many
+from my_lang_compiler.cache import CompileCache
+from my_lang_compiler.native import DEFAULT_CFLAGS, Toolchain
+from my_lang_compiler.passes import DEFAULT_LEVEL, LEVELS
+
+
+def write_sources(directory, count, size):
+    # `count` distinct programs, cycling through the bench_loops programs with
+    # a different loop bound each.
+    generators = list(PROGRAMS.values())
+    for index in range(count):
+        source = generators[index % len(generators)](size + index)
+        (Path(directory) / f"program{index:03}.src").write_text(source, encoding="utf-8")
+
+
+def build(directory, toolchain, jobs, cache, level):
+    # Wall time and per-stage totals of building and running every program.
+    start = time.perf_counter()
+    results = compile_many([str(Path(directory) / "src")], jobs=jobs, output_dir=str(Path(directory) / "out"),
+                           cache=cache, opt_level=level, toolchain=toolchain, run=True)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if not result.ok or result.returncode]
+    if failed:
+        raise SystemExit(f"{failed[0].source}: {failed[0].error or failed[0].returncode}")
+    totals = {}
+    for result in results:
+        for stage, seconds in result.stages().items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return elapsed, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Building and running programs with the C compiler, serially, in parallel and from the binary cache.")
+    parser.add_argument("--programs", type=int, default=24)
+    parser.add_argument("--size", type=int, default=100, help="outer loop bound of the bench_loops programs")
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="workers for the parallel runs")
+    parser.add_argument("--cc")
+    parser.add_argument("--cflags", default=" ".join(DEFAULT_CFLAGS))
+    args = parser.parse_args(argv)
+    toolchain = Toolchain(args.cc, args.cflags)
+
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / "src").mkdir()
+        write_sources(Path(directory) / "src", args.programs, args.size)
+        runs = [("serial, no cache", 1, None), (f"{args.jobs} jobs, no cache", args.jobs, None)]
+        cache = CompileCache(Path(directory) / "cache")
+        runs += [(f"{args.jobs} jobs, cold cache", args.jobs, cache), (f"{args.jobs} jobs, warm cache", args.jobs, cache)]
+        for label, jobs, run_cache in runs:
+            elapsed, totals = build(directory, toolchain, jobs, run_cache, args.level)
+            stages = "  ".join(f"{stage} {seconds:6.3f}s" for stage, seconds in totals.items())
+            print(f"{label:22} {elapsed:6.3f}s wall ({args.programs / elapsed:6.1f} programs/s)  {stages}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
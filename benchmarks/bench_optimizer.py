@@ -0,0 +1,89 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.ir_generator import IRGenerator
+from my_lang_compiler.passes import PassManager, DEFAULT_LEVEL, LEVELS
+from my_lang_compiler.pipeline import lower
+from my_lang_compiler.cfg import ControlFlowGraph
+from my_lang_compiler.codegen import CodeGenerator
+
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - start
+
+
+def generate(program):
+    c_code, elapsed = timed(lambda: CodeGenerator(program).generate())
+    return f"codegen {elapsed:.3f}s, {len(c_code) / 1024:.0f} KiB of C"
+
+
+def generate_loop_source(statements):
+    # generate_source's statements inside a loop, so that little of it folds.
+    lines = ["# generated benchmark input", "myvar i = 0;", "myvar total = 0;", "mywhile (i < 3) {"]
+    for n in range(statements):
+        lines.append(f"    myvar v{n} = (i + {n}) * 3 - total / 2;")
+        lines.append(f"    myif (v{n} >= {n}) {{ total = total + v{n}; }} myelse {{ myprint(\"miss\\n\"); }}")
+    lines.append("    i = i + 1;")
+    lines.append("}")
+    lines.append("myprint(total);")
+    return "\n".join(lines) + "\n"
+
+
+def nested_if_source(depth):
+    # `depth` nested myifs, which all end at one block with `depth`
+    # predecessors.
+    return "myvar x = 1;\n" + "myif (x > 0) { " * depth + "myprint(x); " + "}" * depth + "\n"
+
+
+def scaling(depth):
+    # Dominators, dominance frontiers and SCCP on twice and four times the
+    # nesting: the times should double, not quadruple.
+    print("nested myif input:")
+    for size in (depth, 2 * depth, 4 * depth):
+        program = lower(Scanner(nested_if_source(size)), opt_level=0)
+        cfg = ControlFlowGraph(program)
+        _, dominators = timed(lambda: cfg.dominance_frontiers())
+        _, sccp = timed(lambda: PassManager(["sccp"]).run(program))
+        print(f"  depth {size:6}  {len(cfg):6} blocks  dominators {dominators:.3f}s  sccp {sccp:.3f}s")
+
+
+def run(name, source, level):
+    print(f"{name}: {len(source)} characters")
+    ast = Parser(Scanner(source)).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.visit(ast)
+    program = IRGenerator(analyzer.variables).visit(ast)
+    print(f"  {'IRGenerator':20} {len(program.instructions):8} instructions  {generate(program)}")
+
+    passes = PassManager.for_level(level)
+    program, elapsed = timed(lambda: passes.run(program))
+    print(passes.report())
+    print(f"  {f'optimized at -O{level}':20} {len(program.instructions):8} instructions  {elapsed:.3f}s, {generate(program)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time of each optimization pass and the IR and C it leaves.")
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--depth", type=int, default=1000, help="nesting of the smallest nested myif input")
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL)
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    run("straight-line input", generate_source(args.statements), args.level)
+    run("loop input", generate_loop_source(args.statements), args.level)
+    scaling(args.depth)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
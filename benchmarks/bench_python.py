@@ -0,0 +1,53 @@
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from bench_loops import PROGRAMS
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.pipeline import lower, compile_python
+from my_lang_compiler.passes import DEFAULT_LEVEL, LEVELS
+from my_lang_compiler.python_backend import ProgramCache
+from my_lang_compiler.vm import Bytecode
+
+SAMPLE = Path(__file__).resolve().parent.parent / "sample.src"
+
+
+def best(function, repeat):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Programs compiled to Python functions against the bytecode VM.")
+    parser.add_argument("--size", type=int, default=300, help="outer loop bound of the bench_loops programs")
+    parser.add_argument("--statements", type=int, default=2000, help="size of the generated straight-line program")
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL, help="passes run before lowering to bytecode")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    programs = {"sample": SAMPLE.read_text(encoding="utf-8"), "straight": generate_source(args.statements)}
+    programs.update((name, generate(args.size)) for name, generate in PROGRAMS.items())
+    for name, source in programs.items():
+        bytecode = Bytecode.from_program(lower(Scanner(source), opt_level=args.level))
+        cache = ProgramCache()
+        build = lambda: compile_python(Scanner(source))
+        compile_time = best(lambda: ProgramCache().get(source, build), 1)
+        program = cache.get(source, build)
+        if program.run() != bytecode.run():
+            raise SystemExit(f"{name}: Python output differs from the bytecode VM's")
+        hit = best(lambda: cache.get(source, build), args.repeat)
+        vm = best(bytecode.run, args.repeat)
+        python = best(program.run, args.repeat)
+        print(f"{name:10} compile {compile_time * 1000:8.2f}ms  cache hit {hit * 1e6:6.1f}us  "
+              f"run: bytecode {vm * 1000:8.2f}ms  python {python * 1000:8.2f}ms ({vm / python:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from bench_loops import PROGRAMS
+from bench_optimizer import nested_if_source
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.pipeline import lower
+from my_lang_compiler.passes import DEFAULT_LEVEL, LEVELS
+from my_lang_compiler.codegen import CodeGenerator
+from my_lang_compiler.structure import StructuredCodeGenerator
+from my_lang_compiler.native import DEFAULT_CFLAGS, Toolchain
+
+SAMPLE = Path(__file__).resolve().parent.parent / "sample.src"
+
+
+def loops_source(count, size):
+    # `count` consecutive nested loops, each summing into its own variable.
+    lines = []
+    for n in range(count):
+        lines += [
+            f"myvar s{n} = 0;", f"myvar i{n} = 0;",
+            f"mywhile (i{n} < {size}) {{",
+            f"  myvar j{n} = 0;",
+            f"  mywhile (j{n} < {size}) {{ s{n} = s{n} + i{n} * j{n} + {n}; j{n} = j{n} + 1; }}",
+            f"  i{n} = i{n} + 1;",
+            "}",
+            f"myprint(s{n});",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def nested_source(depth):
+    # `depth` loops nested in each other, each running once and counting
+    # itself in s: prints `depth`.
+    lines = ["myvar s = 0;"]
+    for n in range(depth):
+        lines += [f"myvar i{n} = 0;", f"mywhile (i{n} < 1) {{", f"i{n} = i{n} + 1;", "s = s + 1;"]
+    lines += ["}"] * depth
+    lines.append("myprint(s);")
+    return "\n".join(lines) + "\n"
+
+
+def build(toolchain, c_code, executable):
+    start = time.perf_counter()
+    toolchain.compile(c_code, executable)
+    return time.perf_counter() - start
+
+
+def best_run(toolchain, executable, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = toolchain.run(executable)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return completed.stdout, best
+
+
+def scaling(depth):
+    # Code generation on twice and four times the nesting: the times should
+    # double, not quadruple.
+    print("nested myif input at -O0:")
+    for size in (depth, 2 * depth, 4 * depth):
+        program = lower(Scanner(nested_if_source(size)), opt_level=0)
+        times = []
+        for generator in (CodeGenerator, StructuredCodeGenerator):
+            start = time.perf_counter()
+            c_code = generator(program).generate()
+            times.append((time.perf_counter() - start, len(c_code)))
+        (flat, flat_size), (structured, structured_size) = times
+        print(f"  depth {size:6}  goto-based: codegen {flat * 1000:7.1f}ms {flat_size / 1024:6.0f} KiB"
+              f"  | structured: codegen {structured * 1000:7.1f}ms {structured_size / 1024:6.0f} KiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="C compile and run time of goto-based against structured C.")
+    parser.add_argument("--size", type=int, default=3000, help="outer loop bound of the bench_loops programs")
+    parser.add_argument("--statements", type=int, default=2000, help="size of the generated straight-line program")
+    parser.add_argument("--loops", type=int, default=200, help="nested loops in the generated loop program")
+    parser.add_argument("--depth", type=int, default=400, help="nesting depth of the generated deep program")
+    parser.add_argument("--if-depth", type=int, default=1000, help="nesting of the smallest nested myif input")
+    parser.add_argument("-O", dest="level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL)
+    parser.add_argument("--cc")
+    parser.add_argument("--cflags", default=" ".join(DEFAULT_CFLAGS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    toolchain = Toolchain(args.cc, args.cflags)
+
+    programs = {"sample": SAMPLE.read_text(encoding="utf-8"), "straight": generate_source(args.statements),
+                "loops": loops_source(args.loops, 100),
+                "deep": nested_source(args.depth)}
+    programs.update((name, generate(args.size)) for name, generate in PROGRAMS.items())
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in programs.items():
+            program = lower(Scanner(source), opt_level=args.level)
+            results = []
+            for generator in (CodeGenerator, StructuredCodeGenerator):
+                start = time.perf_counter()
+                c_code = generator(program).generate()
+                codegen = time.perf_counter() - start
+                executable = str(Path(directory) / f"{name}_{generator.__name__}")
+                compile_time = build(toolchain, c_code, executable)
+                output, run = best_run(toolchain, executable, args.repeat)
+                results.append((output, codegen, compile_time, run, c_code.count("goto")))
+            (expected, *flat), (output, *structured) = results
+            if output != expected:
+                raise SystemExit(f"{name}: structured C prints something else than the goto-based C")
+            print(f"{name:10} goto-based: codegen {flat[0] * 1000:7.1f}ms  {toolchain.cc} {flat[1]:6.3f}s  run {flat[2]:6.3f}s  {flat[3]:5} gotos"
+                  f"  | structured: codegen {structured[0] * 1000:7.1f}ms  {toolchain.cc} {structured[1]:6.3f}s  run {structured[2]:6.3f}s"
+                  f"  {structured[3]:5} gotos")
+    scaling(args.if_depth)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.tokens import TokenStream
+
+
+class DictToken:
+    # Token layout before __slots__ was added, kept for comparison.
+    def __init__(self, type_, value, line=0, column=0):
+        self.type = type_
+        self.value = value
+        self.line = line
+        self.column = column
+
+
+def as_dict_tokens(source):
+    return [DictToken(t.type, t.value, t.line, t.column) for t in Scanner(source)]
+
+
+def slotted_tokens(source):
+    return Scanner(source).tokenize()
+
+
+def token_stream(source):
+    return TokenStream.from_lexer(Scanner(source))
+
+
+def retained_size(build, source):
+    tracemalloc.start()
+    result = build(source)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory used by token representations.")
+    parser.add_argument("--statements", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    source = generate_source(args.statements)
+    print(f"input: {len(source)} characters")
+
+    for name, build in (
+        ("dict Token list", as_dict_tokens),
+        ("slotted Token list", slotted_tokens),
+        ("TokenStream", token_stream),
+    ):
+        count, size = retained_size(build, source)
+        print(f"{name:20} {count} tokens {size / 1024 / 1024:8.2f} MiB ({size / count:.1f} bytes/token)")
+
+    stream = token_stream(source)
+    start = time.perf_counter()
+    Parser(stream).parse()
+    print(f"parsed TokenStream in {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+from types import GeneratorType
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_lexer import generate_source
+from my_lang_compiler.ir_generator import IRGenerator
+from my_lang_compiler.parser import Parser
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.semantic_analyzer import SemanticAnalyzer
+from my_lang_compiler.visitor import NodeVisitor, iter_child_nodes
+
+
+class RecursiveCounter:
+    # The dispatch scheme the passes used before NodeVisitor: an f-string and
+    # getattr per node, recursion per child.
+    def __init__(self):
+        self.count = 0
+
+    def visit(self, node):
+        method_name = f'visit_{type(node).__name__}'
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+    def generic_visit(self, node):
+        self.count += 1
+        for child in iter_child_nodes(node):
+            self.visit(child)
+
+    def visit_BinaryOp(self, node):
+        self.count += 1
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_Num(self, node):
+        self.count += 1
+
+    def visit_Var(self, node):
+        self.count += 1
+
+
+class StackCounter(NodeVisitor):
+    def __init__(self):
+        self.count = 0
+
+    def generic_visit(self, node):
+        self.count += 1
+        return tuple(iter_child_nodes(node))
+
+    def visit_BinaryOp(self, node):
+        self.count += 1
+        return (node.left, node.right)
+
+    def visit_Num(self, node):
+        self.count += 1
+
+    def visit_Var(self, node):
+        self.count += 1
+
+
+def recursive(pass_class):
+    # `pass_class` with the dispatch scheme the passes used before
+    # NodeVisitor (a getattr per node, recursion per child) driving the same
+    # visit_* methods.
+    class Recursive(pass_class):
+        def visit(self, node):
+            result = getattr(self, f'visit_{type(node).__name__}', self.generic_visit)(node)
+            if type(result) is tuple:
+                for child in result:
+                    self.visit(child)
+                return None
+            if type(result) is not GeneratorType:
+                return result
+            value = None
+            try:
+                while True:
+                    value = self.visit(result.send(value))
+            except StopIteration as stop:
+                return stop.value
+
+    return Recursive
+
+
+def timed(run_pass):
+    # Collections triggered by other passes' garbage would otherwise land
+    # in whichever pass happens to run next.
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        run_pass()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def measure(counter_class, tree, repeat):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        counter = counter_class()
+        elapsed = timed(lambda: counter.visit(tree))
+        count = counter.count
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nodes visited per second by AST walkers.")
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+
+    tree = Parser(Scanner(generate_source(args.statements))).parse()
+    for name, counter_class in (("recursive getattr", RecursiveCounter), ("NodeVisitor", StackCounter)):
+        count, elapsed = measure(counter_class, tree, args.repeat)
+        print(f"{name:18} {count} nodes in {elapsed:.3f}s ({count / elapsed:,.0f} nodes/s)")
+
+    count = measure(StackCounter, tree, 1)[0]
+    analyzer = SemanticAnalyzer()
+    analyzer.visit(tree)
+    for name, pass_class, make in (
+        ("SemanticAnalyzer", SemanticAnalyzer, lambda cls: cls()),
+        # IR generation reads the slots the analysis assigned.
+        ("IRGenerator", IRGenerator, lambda cls: cls(analyzer.variables)),
+    ):
+        before = min(timed(lambda: make(recursive(pass_class)).visit(tree)) for _ in range(args.repeat))
+        after = min(timed(lambda: make(pass_class).visit(tree)) for _ in range(args.repeat))
+        print(f"{name:18} {count} nodes: recursive getattr {before:.3f}s ({count / before:,.0f} nodes/s), "
+              f"NodeVisitor {after:.3f}s ({count / after:,.0f} nodes/s, {before / after:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
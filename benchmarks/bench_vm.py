@@ -0,0 +1,59 @@
+import argparse
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_loops import PROGRAMS
+from my_lang_compiler.scanner import Scanner
+from my_lang_compiler.pipeline import lower
+from my_lang_compiler.passes import DEFAULT_LEVEL, LEVELS
+from my_lang_compiler.interpreter import Interpreter
+from my_lang_compiler.vm import Bytecode
+
+SAMPLE = Path(__file__).resolve().parent.parent / "sample.src"
+
+
+def per_run(function, repeat):
+    # Best seconds per call, over `repeat` rounds of at least 0.2s each.
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Instructions per second of the IR interpreter and the bytecode VM on loop-heavy programs.")
+    parser.add_argument("--size", type=int, default=300, help="outer loop bound of the bench_loops programs")
+    parser.add_argument("-O", dest="levels", type=int, choices=sorted(LEVELS), action="append",
+                        help=f"optimization level; repeat for several (default: 0 and {DEFAULT_LEVEL})")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    programs = {"sample": SAMPLE.read_text(encoding="utf-8")}
+    programs.update((name, generate(args.size)) for name, generate in PROGRAMS.items())
+    for level in args.levels or (0, DEFAULT_LEVEL):
+        print(f"-O{level}")
+        for name, source in programs.items():
+            program = lower(Scanner(source), opt_level=level)
+            interpreter = Interpreter(program).load()
+            expected = interpreter.run()
+            steps = interpreter.steps
+
+            start = time.perf_counter()
+            bytecode = Bytecode.from_program(program)
+            lowering = time.perf_counter() - start
+            if bytecode.run() != expected:
+                raise SystemExit(f"{name} at -O{level}: bytecode output differs from the interpreter's")
+
+            interpreted = per_run(interpreter.run, args.repeat)
+            vm = per_run(bytecode.run, args.repeat)
+            print(f"  {name:10} {steps:9} IR instructions  interpreter {steps / interpreted / 1e6:5.1f}M/s  "
+                  f"bytecode {steps / vm / 1e6:5.1f}M/s ({interpreted / vm:.2f}x)  "
+                  f"{len(program.instructions)} IR -> {bytecode.instructions} bytecode instructions in {lowering * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+from array import array
+
+from .ast_nodes import (
+    Program, Block, VarDecl, Assignment, BinaryOp, UnaryOp, Num, String, Bool, Var, If, While, Print, NoOp
+)
+from .tokens import Token, TokenType, TOKEN_TYPES
+
+# Row kinds, in the order of NODE_CLASSES.
+NODE_CLASSES = (Program, Block, VarDecl, Assignment, BinaryOp, UnaryOp, Num, String, Bool, Var, If, While, Print, NoOp)
+(PROGRAM, BLOCK, VARDECL, ASSIGNMENT, BINARYOP, UNARYOP, NUM, STRING, BOOL, VAR,
+ IF, WHILE, PRINT, NOOP) = range(len(NODE_CLASSES))
+KIND_OF = {node_class: kind for kind, node_class in enumerate(NODE_CLASSES)}
+
+# Which node fields are stored in the a/b/c child columns. Program and Block
+# keep (start, count) of a run in Arena.children instead.
+CHILD_COLUMNS = {
+    VARDECL: ('var_name', 'initializer'),
+    ASSIGNMENT: ('left', 'right'),
+    BINARYOP: ('left', 'right'),
+    UNARYOP: ('expr',),
+    IF: ('condition', 'then_branch', 'else_branch'),
+    WHILE: ('condition', 'body'),
+    PRINT: ('expr',),
+}
+
+LEAF_TOKEN_TYPES = {
+    NUM: TokenType.NUMBER,
+    STRING: TokenType.STRING,
+    BOOL: TokenType.MYBOOL,
+    VAR: TokenType.IDENTIFIER,
+}
+
+
+# Flat AST storage: one row per node in parallel typed arrays.
+#   kinds    node kind (index into NODE_CLASSES)
+#   a, b, c  child row indices, -1 when absent; for BinaryOp/UnaryOp, c holds
+#            the operator's TokenType code
+#   value_ids index into the interned values table (literal, name, operator
+#            text or VarDecl type annotation), -1 when unused
+#   lines, columns source position of the node's token
+#   slots    resolved variable slot of a Var (see SemanticAnalyzer), -1 if unset
+# Statement lists live in the children array, addressed by (a=start, b=count).
+class Arena:
+    def __init__(self):
+        self.kinds = array("B")
+        self.a = array("i")
+        self.b = array("i")
+        self.c = array("i")
+        self.value_ids = array("i")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.slots = array("i")
+        self.children = array("i")
+        self.values = []
+        self._value_index = {}
+        self.root_index = -1
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, value):
+        key = (value.__class__, value)
+        index = self._value_index.get(key)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self._value_index[key] = index
+        return index
+
+    def add(self, kind, a=-1, b=-1, c=-1, value_id=-1, line=0, column=0, slot=-1):
+        self.kinds.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        self.value_ids.append(value_id)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.slots.append(slot)
+        return len(self.kinds) - 1
+
+    @classmethod
+    def from_ast(cls, root):
+        arena = cls()
+        # Post-order over an explicit stack: children get their rows before
+        # the parent that refers to them.
+        stack = [(root, False)]
+        results = []
+        while stack:
+            node, ready = stack.pop()
+            kind = KIND_OF[type(node)]
+            if not ready:
+                stack.append((node, True))
+                for child in reversed(arena._child_nodes(kind, node)):
+                    if child is not None:
+                        stack.append((child, False))
+                continue
+
+            children = arena._child_nodes(kind, node)
+            present = sum(1 for child in children if child is not None)
+            ids = results[len(results) - present:] if present else []
+            if present:
+                del results[len(results) - present:]
+            results.append(arena._add_node(kind, node, children, ids))
+
+        arena.root_index = results[0]
+        return arena
+
+    def _child_nodes(self, kind, node):
+        if kind == PROGRAM or kind == BLOCK:
+            return node.statements
+        columns = CHILD_COLUMNS.get(kind)
+        if columns is None:
+            return ()
+        return [getattr(node, name) for name in columns]
+
+    def _add_node(self, kind, node, children, ids):
+        if kind == PROGRAM or kind == BLOCK:
+            start = len(self.children)
+            self.children.extend(ids)
+            return self.add(kind, a=start, b=len(ids))
+
+        if kind in LEAF_TOKEN_TYPES:
+            token = node.token
+            slot = node.slot if kind == VAR and node.slot is not None else -1
+            return self.add(kind, value_id=self.intern(node.value), line=token.line, column=token.column, slot=slot)
+
+        slots = [-1, -1, -1]
+        ids = iter(ids)
+        for position, child in enumerate(children):
+            if child is not None:
+                slots[position] = next(ids)
+
+        if kind == BINARYOP or kind == UNARYOP:
+            op = node.op
+            return self.add(
+                kind, a=slots[0], b=slots[1], c=op.type.value,
+                value_id=self.intern(op.value), line=op.line, column=op.column,
+            )
+        if kind == VARDECL:
+            return self.add(kind, a=slots[0], b=slots[1], value_id=self.intern(node.type_annotation))
+        return self.add(kind, a=slots[0], b=slots[1], c=slots[2])
+
+    def node(self, index):
+        if index < 0:
+            return None
+        return VIEW_CLASSES[self.kinds[index]](self, index)
+
+    def root(self):
+        return self.node(self.root_index)
+
+    def token(self, index, token_type):
+        return Token(token_type, self.values[self.value_ids[index]], self.lines[index], self.columns[index])
+
+    def to_ast(self, index=None):
+        if index is None:
+            index = self.root_index
+        # Pre-order visit pushes rows, post-order rebuild pops finished nodes.
+        stack = [(index, False)]
+        results = []
+        kinds = self.kinds
+        while stack:
+            row, ready = stack.pop()
+            kind = kinds[row]
+            child_rows = self._child_rows(row)
+            if not ready:
+                stack.append((row, True))
+                for child in reversed(child_rows):
+                    if child >= 0:
+                        stack.append((child, False))
+                continue
+
+            present = sum(1 for child in child_rows if child >= 0)
+            built = results[len(results) - present:] if present else []
+            if present:
+                del results[len(results) - present:]
+            results.append(self._build_node(row, kind, child_rows, built))
+        return results[0]
+
+    def _child_rows(self, row):
+        kind = self.kinds[row]
+        if kind == PROGRAM or kind == BLOCK:
+            start = self.a[row]
+            return self.children[start:start + self.b[row]].tolist()
+        if kind in LEAF_TOKEN_TYPES or kind == NOOP:
+            return ()
+        if kind == IF:
+            return [self.a[row], self.b[row], self.c[row]]
+        return [self.a[row], self.b[row]]
+
+    def _build_node(self, row, kind, child_rows, built):
+        node_class = NODE_CLASSES[kind]
+        if kind == PROGRAM or kind == BLOCK:
+            return node_class(built)
+        if kind in LEAF_TOKEN_TYPES:
+            node = node_class(self.token(row, LEAF_TOKEN_TYPES[kind]))
+            if kind == VAR and self.slots[row] >= 0:
+                node.slot = self.slots[row]
+            return node
+        if kind == NOOP:
+            return NoOp()
+
+        built = iter(built)
+        fields = [next(built) if child >= 0 else None for child in child_rows]
+        if kind == BINARYOP:
+            return BinaryOp(fields[0], self.token(row, TOKEN_TYPES[self.c[row]]), fields[1])
+        if kind == UNARYOP:
+            return UnaryOp(self.token(row, TOKEN_TYPES[self.c[row]]), fields[0])
+        if kind == VARDECL:
+            return VarDecl(fields[0], self.values[self.value_ids[row]], fields[1])
+        if kind == ASSIGNMENT:
+            return Assignment(fields[0], fields[1])
+        if kind == IF:
+            return If(fields[0], fields[1], fields[2])
+        if kind == WHILE:
+            return While(fields[0], fields[1])
+        return Print(fields[0])
+
+
+# Arena views subclass the node classes they stand for, so visitors dispatch to
+# the same visit_* methods and isinstance checks keep working. Fields are read
+# from the arena on access.
+def _child_property(column):
+    def getter(self):
+        return self.arena.node(getattr(self.arena, column)[self.index])
+    return property(getter)
+
+
+def _statements_property():
+    def getter(self):
+        arena = self.arena
+        start = arena.a[self.index]
+        return [arena.node(row) for row in arena.children[start:start + arena.b[self.index]]]
+    return property(getter)
+
+
+def _value_property():
+    def getter(self):
+        return self.arena.values[self.arena.value_ids[self.index]]
+    return property(getter)
+
+
+def _slot_property():
+    def getter(self):
+        slot = self.arena.slots[self.index]
+        return slot if slot >= 0 else None
+
+    def setter(self, slot):
+        self.arena.slots[self.index] = -1 if slot is None else slot
+    return property(getter, setter)
+
+
+def _token_property(token_type):
+    def getter(self):
+        return self.arena.token(self.index, token_type)
+    return property(getter)
+
+
+def _operator_property():
+    def getter(self):
+        arena = self.arena
+        return arena.token(self.index, TOKEN_TYPES[arena.c[self.index]])
+    return property(getter)
+
+
+def _view_class(kind, node_class):
+    namespace = {'__slots__': ('arena', 'index')}
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    namespace['__init__'] = __init__
+    if kind == PROGRAM or kind == BLOCK:
+        namespace['statements'] = _statements_property()
+    elif kind in LEAF_TOKEN_TYPES:
+        namespace['value'] = _value_property()
+        namespace['token'] = _token_property(LEAF_TOKEN_TYPES[kind])
+        if kind == VAR:
+            namespace['slot'] = _slot_property()
+    elif kind == VARDECL:
+        namespace['var_name'] = _child_property('a')
+        namespace['initializer'] = _child_property('b')
+        namespace['type_annotation'] = _value_property()
+    elif kind == BINARYOP:
+        namespace['left'] = _child_property('a')
+        namespace['right'] = _child_property('b')
+        namespace['op'] = _operator_property()
+    elif kind == UNARYOP:
+        namespace['expr'] = _child_property('a')
+        namespace['op'] = _operator_property()
+    elif kind in CHILD_COLUMNS:
+        for column, name in zip('abc', CHILD_COLUMNS[kind]):
+            namespace[name] = _child_property(column)
+    return type(f'Arena{node_class.__name__}', (node_class,), namespace)
+
+
+VIEW_CLASSES = tuple(_view_class(kind, node_class) for kind, node_class in enumerate(NODE_CLASSES))
@@ -1,70 +1,98 @@
 class AST:
-    pass
+    __slots__ = _fields = ()
 
 class Program(AST):
+    __slots__ = _fields = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements
 
 class Block(AST):
+    __slots__ = _fields = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements
 
 class VarDecl(AST):
+    __slots__ = _fields = ('var_name', 'type_annotation', 'initializer')
+
     def __init__(self, var_name, type_annotation=None, initializer=None):
         self.var_name = var_name
         self.type_annotation = type_annotation
         self.initializer = initializer
 
 class Assignment(AST):
+    __slots__ = _fields = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left # Var
         self.right = right # Expr
 
 class BinaryOp(AST):
+    __slots__ = _fields = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
 
 class UnaryOp(AST):
+    __slots__ = _fields = ('op', 'expr')
+
     def __init__(self, op, expr):
         self.op = op
         self.expr = expr
 
 class Num(AST):
+    __slots__ = _fields = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 class String(AST):
+    __slots__ = _fields = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 class Bool(AST):
+    __slots__ = _fields = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 class Var(AST):
+    _fields = ('token', 'value')
+    __slots__ = _fields + ('slot',)
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
+        self.slot = None # set by SemanticAnalyzer
 
 class If(AST):
+    __slots__ = _fields = ('condition', 'then_branch', 'else_branch')
+
     def __init__(self, condition, then_branch, else_branch=None):
         self.condition = condition
         self.then_branch = then_branch
         self.else_branch = else_branch
 
 class While(AST):
+    __slots__ = _fields = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
 class Print(AST):
+    __slots__ = _fields = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
 class NoOp(AST):
-    pass
+    __slots__ = ()
@@ -0,0 +1,228 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+from .scanner import Scanner
+from .pipeline import translate, cache_settings
+from .passes import DEFAULT_LEVEL
+from .native import executable_path, describe_status
+
+# Timings that are not part of the compiler's own phases.
+IO_STAGES = ("read", "write")
+NATIVE_STAGES = ("cc", "run")
+
+
+class CompileResult:
+    # Outcome of compiling one file. `error` holds the diagnostic when the
+    # compile failed; `timings` maps phase name to seconds, with "read" and
+    # "write" covering file I/O, "cc" the C compiler and "run" the program.
+    # `cached` is set when the C code came from a CompileCache,
+    # `binary_cached` when the executable did. After a run, `stdout`,
+    # `stderr` and `returncode` hold what the program did.
+    def __init__(self, source, output=None):
+        self.source = source
+        self.output = output
+        self.c_code = None
+        self.cached = False
+        self.executable = None
+        self.binary_cached = False
+        self.stdout = None
+        self.stderr = None
+        self.returncode = None
+        self.error = None
+        self.size = 0
+        self.timings = {}
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def stages(self):
+        # Seconds in the frontend (every compiler phase), the C compiler and
+        # the run; stages that didn't happen are left out.
+        stages = {"frontend": sum(seconds for phase, seconds in self.timings.items()
+                                  if phase not in IO_STAGES and phase not in NATIVE_STAGES)}
+        for stage in NATIVE_STAGES:
+            if stage in self.timings:
+                stages[stage] = self.timings[stage]
+        return stages
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error: {self.error}"
+        return f"CompileResult({self.source!r}, {status}, {self.elapsed * 1000:.1f} ms)"
+
+
+def expand_sources(paths, output_dir=None):
+    # Pairs every input with its output path. Directories contribute the .src
+    # files below them, mirrored under output_dir; plain files are written to
+    # output_dir under their own stem. Raises ValueError when two inputs
+    # would be written to the same file.
+    jobs = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for source in sorted(path.rglob("*.src")):
+                output = None
+                if output_dir is not None:
+                    output = Path(output_dir) / source.relative_to(path).with_suffix(".c")
+                jobs.append((str(source), None if output is None else str(output)))
+        else:
+            output = None
+            if output_dir is not None:
+                output = Path(output_dir) / (path.stem + ".c")
+            jobs.append((str(path), None if output is None else str(output)))
+
+    writers = {}
+    for source, output in jobs:
+        if output is None:
+            continue
+        key = os.path.normcase(os.path.abspath(output))
+        if key in writers:
+            raise ValueError(f"'{writers[key]}' and '{source}' would both be compiled to '{output}'")
+        writers[key] = source
+    return jobs
+
+
+def compile_path(source, output=None, cache=None, opt_level=DEFAULT_LEVEL, max_locals=None, toolchain=None, build=False,
+                 run=False):
+    # With a native.Toolchain, `build` writes an executable next to `output`
+    # and `run` runs the program (built into the cache, or a temporary
+    # directory without one) and captures its output.
+    result = CompileResult(source, output)
+    start = perf_counter()
+    try:
+        with open(source, "r", encoding="utf-8") as source_file:
+            source_code = source_file.read()
+    except OSError as exc:
+        result.error = f"Failed to read source file '{source}': {exc}"
+        result.elapsed = perf_counter() - start
+        return result
+    result.size = len(source_code)
+    result.timings["read"] = perf_counter() - start
+
+    try:
+        if cache is None:
+            result.c_code = translate(Scanner(source_code), timings=result.timings, opt_level=opt_level, max_locals=max_locals)
+        else:
+            result.c_code, result.cached = cache.compile(
+                source_code,
+                lambda artifacts: translate(
+                    Scanner(source_code), timings=result.timings, artifacts=artifacts, opt_level=opt_level, max_locals=max_locals
+                ),
+                settings=cache_settings(opt_level, max_locals),
+            )
+    except Exception as e:
+        result.error = f"Compilation Error: {e}"
+
+    if result.ok and output is not None:
+        written = perf_counter()
+        try:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            with open(output, "w", encoding="utf-8") as out_file:
+                out_file.write(result.c_code)
+        except OSError as exc:
+            result.error = f"Failed to write output file '{output}': {exc}"
+        result.timings["write"] = perf_counter() - written
+
+    if result.ok and toolchain is not None and (build or run):
+        executable = executable_path(output if output is not None else source) if build else None
+        if executable is None and cache is None:
+            with tempfile.TemporaryDirectory(prefix="my_lang_") as directory:
+                _build_and_run(result, toolchain, str(Path(directory) / "program"), None, run)
+        else:
+            _build_and_run(result, toolchain, executable, cache, run)
+
+    result.elapsed = perf_counter() - start
+    return result
+
+
+def _build_and_run(result, toolchain, executable, cache, run):
+    built = perf_counter()
+    try:
+        result.executable, result.binary_cached = toolchain.build(result.c_code, executable, cache)
+    except Exception as e:
+        result.error = str(e)
+    result.timings["cc"] = perf_counter() - built
+    if result.ok and run:
+        started = perf_counter()
+        try:
+            completed = toolchain.run(result.executable)
+        except OSError as exc:
+            result.error = f"Failed to run '{result.executable}': {exc}"
+        else:
+            result.stdout = completed.stdout
+            result.stderr = completed.stderr
+            result.returncode = completed.returncode
+        result.timings["run"] = perf_counter() - started
+
+
+def _compile_job(job):
+    return compile_path(*job)
+
+
+def compile_many(paths, jobs=None, output_dir=None, cache=None, opt_level=DEFAULT_LEVEL, max_locals=None, toolchain=None,
+                 build=False, run=False):
+    # Compiles every input on a pool of `jobs` processes (default: one per
+    # CPU) and returns a CompileResult per file, in input order. Workers get
+    # their own copy of `cache`, so its counters stay at zero here; count
+    # CompileResult.cached instead. `toolchain`, `build` and `run` are as
+    # for compile_path(); C compilers and programs run in the workers too.
+    work = [(source, output, cache, opt_level, max_locals, toolchain, build, run)
+            for source, output in expand_sources(paths, output_dir)]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(work)))
+    if jobs == 1:
+        return [_compile_job(job) for job in work]
+
+    # Hand each worker a few batches so short files don't pay a round trip each.
+    chunksize = max(1, len(work) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_compile_job, work, chunksize=chunksize))
+
+
+def format_stages(result):
+    # "frontend 12.0 ms, cc 40.1 ms (cached), run 1.2 ms (exit 0)"
+    parts = []
+    for stage, seconds in result.stages().items():
+        part = f"{stage} {seconds * 1000:.1f} ms"
+        if stage == "cc" and result.binary_cached:
+            part += " (cached)"
+        if stage == "run" and result.returncode is not None:
+            part += f" (exit {result.returncode})"
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def format_report(results, elapsed):
+    lines = []
+    native = any("cc" in result.timings for result in results)
+    for result in results:
+        status = ("cached" if result.cached else "ok") if result.ok else "FAILED"
+        line = f"{result.elapsed * 1000:9.1f} ms  {status:6}  {result.source}"
+        if native:
+            line += f"  [{format_stages(result)}]"
+        lines.append(line)
+        if not result.ok:
+            lines.append(f"                     {result.error}")
+        elif result.returncode:
+            lines.append(f"                     program {describe_status(result.returncode)}")
+
+    failed = sum(1 for result in results if not result.ok)
+    cached = sum(1 for result in results if result.cached)
+    characters = sum(result.size for result in results)
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    lines.append(
+        f"{len(results)} files, {failed} failed, {cached} from cache in {elapsed:.2f}s "
+        f"({rate:.1f} files/s, {characters / 1024 / max(elapsed, 1e-9):.0f} KiB/s)"
+    )
+    if native:
+        totals = {}
+        for result in results:
+            for stage, seconds in result.stages().items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        lines.append("total " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in totals.items()))
+    return "\n".join(lines)
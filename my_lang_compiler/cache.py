@@ -0,0 +1,223 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from .packed import PackedIR
+from .version import cli_version
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+BINARY_SUFFIX = ".exe" if os.name == "nt" else ".bin"
+
+
+# Setting it also turns the cache on for the CLI.
+CACHE_DIR_VARIABLE = "MY_LANG_CACHE_DIR"
+
+
+def default_cache_dir():
+    override = os.environ.get(CACHE_DIR_VARIABLE)
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "my_lang_compiler"
+
+
+class CompileCache:
+    # Content-addressed store of compiler outputs. Entries are keyed by a hash
+    # of the source text, the compiler version and the optimization settings,
+    # and live under <directory>/<2 hex digits>/<key>.c (plus <key>.ir for the
+    # IRProgram, pickled as a PackedIR). Executables built from C code (see
+    # native.Toolchain) are entries of their own, <key>.bin, keyed by the C
+    # code and the toolchain. Writes go through a temp file and os.replace, so
+    # concurrent builds sharing a directory only ever see whole entries.
+    # Reads touch the entry's mtime, which orders eviction once the cache
+    # grows past max_bytes.
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, version=None, store_ir=False):
+        if version is None:
+            version = cli_version()
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.version = version
+        self.store_ir = store_ir
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.binary_hits = 0
+        self.binary_misses = 0
+        # Bytes this instance believes are stored; rescanned only when it says
+        # the cache is over budget.
+        self._estimate = None
+
+    def key(self, source_code, settings=""):
+        digest = hashlib.sha256()
+        for part in (self.version, str(settings), source_code):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key, suffix):
+        return self.directory / key[:2] / (key + suffix)
+
+    def get(self, key):
+        path = self._path(key, ".c")
+        try:
+            with open(path, "r", encoding="utf-8") as entry:
+                c_code = entry.read()
+            os.utime(path)
+        except OSError:
+            # Missing, or evicted by another process between open and utime.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return c_code
+
+    def get_ir(self, key):
+        try:
+            with open(self._path(key, ".ir"), "rb") as entry:
+                ir_program = pickle.load(entry)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if type(ir_program) is PackedIR:
+            ir_program = ir_program.to_program()
+        return ir_program
+
+    def get_binary(self, key):
+        # Path of the cached executable for `key`, or None.
+        path = self._path(key, BINARY_SUFFIX)
+        try:
+            os.utime(path)
+        except OSError:
+            self.binary_misses += 1
+            return None
+        self.binary_hits += 1
+        return path
+
+    def put_binary(self, key, build):
+        # `build(path)` writes the executable at a temporary path, which then
+        # becomes the entry for `key`; returns the entry's path.
+        path = self._path(key, BINARY_SUFFIX)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=BINARY_SUFFIX)
+        os.close(fd)
+        try:
+            build(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._stored(path.stat().st_size)
+        return path
+
+    def put(self, key, c_code, ir_program=None):
+        written = 0
+        if ir_program is not None:
+            written += self._write(self._path(key, ".ir"), pickle.dumps(PackedIR.from_program(ir_program), pickle.HIGHEST_PROTOCOL))
+        written += self._write(self._path(key, ".c"), c_code.encode("utf-8"))
+        self._stored(written)
+
+    def _stored(self, written):
+        self.writes += 1
+        if self._estimate is None:
+            self._estimate = self.size()
+        else:
+            self._estimate += written
+        if self._estimate > self.max_bytes:
+            self.evict()
+
+    def _write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+            return len(data)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _entries(self):
+        # One (mtime, size, paths) per key; a key's .c and .ir files are
+        # evicted together.
+        entries = {}
+        if not self.directory.is_dir():
+            return []
+        for shard in self.directory.iterdir():
+            if not shard.is_dir():
+                continue
+            for path in shard.iterdir():
+                if path.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entry = entries.get(path.stem)
+                if entry is None:
+                    entries[path.stem] = [stat.st_mtime, stat.st_size, [path]]
+                else:
+                    entry[0] = max(entry[0], stat.st_mtime)
+                    entry[1] += stat.st_size
+                    entry[2].append(path)
+        return list(entries.values())
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Drops least recently used entries until the cache fits max_bytes.
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            entries.sort(key=lambda entry: entry[0])
+            for _, size, paths in entries:
+                if total <= self.max_bytes:
+                    break
+                for path in paths:
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                self.evictions += 1
+                total -= size
+        self._estimate = total
+
+    def clear(self):
+        for _, _, paths in self._entries():
+            for path in paths:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        self._estimate = 0
+
+    def compile(self, source_code, translate, settings=""):
+        # Returns (c_code, hit). `translate(artifacts)` produces the C code on
+        # a miss; exceptions from it propagate and nothing is stored.
+        key = self.key(source_code, settings)
+        c_code = self.get(key)
+        if c_code is not None:
+            return c_code, True
+        artifacts = {} if self.store_ir else None
+        c_code = translate(artifacts)
+        if c_code is not None:
+            self.put(key, c_code, artifacts.get("ir") if artifacts else None)
+        return c_code, False
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "binary_hits": self.binary_hits,
+            "binary_misses": self.binary_misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,310 @@
+from .ir import OpCode, JUMP_COMPARES
+
+# Instructions that end a basic block.
+BRANCH_OPS = (OpCode.JMP, OpCode.JIF, OpCode.JFALSE) + tuple(JUMP_COMPARES)
+
+
+class Loop:
+    # Natural loop: `header` dominates every block in `blocks`, `latches` are
+    # the sources of its back edges. Loops sharing a header are merged.
+    # `parent` is the innermost enclosing loop.
+    __slots__ = ('header', 'blocks', 'latches', 'parent', 'depth')
+
+    def __init__(self, header, blocks, latches):
+        self.header = header
+        self.blocks = blocks
+        self.latches = latches
+        self.parent = None
+        self.depth = 1
+
+    def __repr__(self):
+        return f"Loop(header={self.header}, blocks={sorted(self.blocks)}, latches={self.latches})"
+
+
+class ControlFlowGraph:
+    # Basic blocks of an IRProgram, numbered 0..n-1 in instruction order; block
+    # 0 is the entry. Block b covers instructions[starts[b]:ends[b]], and
+    # succs[b]/preds[b] hold block ids. A run of labels opens a single block.
+    # Dominators and loops are computed on first use.
+    #
+    # Build it through ControlFlowGraph.of(program), which caches it on the
+    # program until the program changes.
+    def __init__(self, program):
+        self.program = program
+        instructions = program.instructions
+        starts = []
+        block_of_label = {}
+        opens = True
+        only_labels = False
+        for index, instr in enumerate(instructions):
+            op = instr.op
+            if op == OpCode.LABEL:
+                if not only_labels:
+                    opens = True
+            if opens:
+                starts.append(index)
+                opens = False
+                only_labels = True
+            if op == OpCode.LABEL:
+                block_of_label[instr.result] = len(starts) - 1
+            else:
+                only_labels = False
+                if op in BRANCH_OPS:
+                    opens = True
+
+        count = len(starts)
+        self.starts = starts
+        self.ends = starts[1:] + [len(instructions)]
+        self.block_of_label = block_of_label
+
+        succs = []
+        for block in range(count):
+            last = instructions[self.ends[block] - 1]
+            op = last.op
+            if op == OpCode.JMP:
+                succs.append([self._target(last)])
+                continue
+            targets = [block + 1] if block + 1 < count else []
+            if op in BRANCH_OPS:
+                target = self._target(last)
+                if target not in targets:
+                    targets.append(target)
+            succs.append(targets)
+        preds = [[] for _ in range(count)]
+        for block, targets in enumerate(succs):
+            for target in targets:
+                preds[target].append(block)
+        self.succs = succs
+        self.preds = preds
+
+        self._order = None
+        self._idom = None
+        self._frontiers = None
+        self._loops = None
+
+    @classmethod
+    def of(cls, program):
+        return program.analysis(cls, cls)
+
+    def _target(self, instr):
+        block = self.block_of_label.get(instr.result)
+        if block is None:
+            raise Exception(f"Jump to undefined label {instr.result}")
+        return block
+
+    def __len__(self):
+        return len(self.starts)
+
+    def instructions(self, block):
+        return self.program.instructions[self.starts[block]:self.ends[block]]
+
+    def reverse_postorder(self):
+        # Blocks reachable from the entry, each after all of its predecessors
+        # except along back edges.
+        if self._order is None:
+            order = []
+            if self.starts:
+                succs = self.succs
+                seen = [False] * len(self.starts)
+                seen[0] = True
+                stack = [(0, iter(succs[0]))]
+                while stack:
+                    block, targets = stack[-1]
+                    for target in targets:
+                        if not seen[target]:
+                            seen[target] = True
+                            stack.append((target, iter(succs[target])))
+                            break
+                    else:
+                        stack.pop()
+                        order.append(block)
+                order.reverse()
+            self._order = order
+        return self._order
+
+    def reachable(self, block):
+        self.idom()
+        return self._rpo_index[block] >= 0
+
+    def idom(self):
+        # Immediate dominators (Lengauer and Tarjan, the simple version with
+        # path compression: O(m log n)). The entry is its own idom;
+        # unreachable blocks get -1.
+        if self._idom is None:
+            count = len(self.starts)
+            order = self.reverse_postorder()
+            index = [-1] * count
+            for position, block in enumerate(order):
+                index[block] = position
+            idom = [-1] * count
+            if order:
+                idom[0] = 0
+                self._lengauer_tarjan(idom)
+            self._rpo_index = index
+            self._idom = idom
+            self._number_dominator_tree()
+        return self._idom
+
+    def _lengauer_tarjan(self, idom):
+        # Works on DFS preorder numbers: vertex[n] is the block numbered n,
+        # parent[n] its parent in the DFS tree.
+        succs = self.succs
+        number = [-1] * len(self.starts)
+        number[0] = 0
+        vertex = [0]
+        parent = [-1]
+        stack = [(0, iter(succs[0]))]
+        while stack:
+            block, targets = stack[-1]
+            for target in targets:
+                if number[target] < 0:
+                    number[target] = len(vertex)
+                    parent.append(number[block])
+                    vertex.append(target)
+                    stack.append((target, iter(succs[target])))
+                    break
+            else:
+                stack.pop()
+
+        count = len(vertex)
+        semi = list(range(count))
+        # The forest of processed vertices, and for each vertex the one with
+        # the lowest semidominator on its path up that forest.
+        ancestor = [-1] * count
+        best = list(range(count))
+        dom = [0] * count
+        same = [-1] * count
+        bucket = [[] for _ in range(count)]
+
+        def lowest(v):
+            path = []
+            while ancestor[ancestor[v]] >= 0:
+                path.append(v)
+                v = ancestor[v]
+            for u in reversed(path):
+                a = ancestor[u]
+                if semi[best[a]] < semi[best[u]]:
+                    best[u] = best[a]
+                ancestor[u] = ancestor[a]
+            return best[path[0]] if path else best[v]
+
+        preds = self.preds
+        for w in range(count - 1, 0, -1):
+            p = parent[w]
+            s = p
+            for pred in preds[vertex[w]]:
+                v = number[pred]
+                if v < 0:
+                    continue
+                candidate = v if v <= w else semi[lowest(v)]
+                if candidate < s:
+                    s = candidate
+            semi[w] = s
+            bucket[s].append(w)
+            ancestor[w] = p
+            for v in bucket[p]:
+                y = lowest(v)
+                if semi[y] == semi[v]:
+                    dom[v] = p
+                else:
+                    same[v] = y
+            bucket[p] = []
+        for w in range(1, count):
+            if same[w] >= 0:
+                dom[w] = dom[same[w]]
+            idom[vertex[w]] = vertex[dom[w]]
+
+    def _number_dominator_tree(self):
+        # Pre/post numbers on the dominator tree make dominates() O(1).
+        count = len(self.starts)
+        children = [[] for _ in range(count)]
+        for block, parent in enumerate(self._idom):
+            if parent >= 0 and parent != block:
+                children[parent].append(block)
+        self.dom_children = children
+        enter = [-1] * count
+        leave = [-1] * count
+        clock = 0
+        if count and self._idom[0] == 0:
+            stack = [(0, iter(children[0]))]
+            enter[0] = clock
+            clock += 1
+            while stack:
+                block, pending = stack[-1]
+                child = next(pending, None)
+                if child is None:
+                    stack.pop()
+                    leave[block] = clock
+                    clock += 1
+                else:
+                    enter[child] = clock
+                    clock += 1
+                    stack.append((child, iter(children[child])))
+        self._enter = enter
+        self._leave = leave
+
+    def dominates(self, a, b):
+        # True if every path from the entry to b passes through a.
+        self.idom()
+        enter = self._enter
+        if enter[a] < 0 or enter[b] < 0:
+            return False
+        return enter[a] <= enter[b] and self._leave[b] <= self._leave[a]
+
+    def dominance_frontiers(self):
+        # frontiers[b]: blocks where b's dominance ends, i.e. joins reachable
+        # from b that b does not strictly dominate.
+        if self._frontiers is None:
+            idom = self.idom()
+            frontiers = [set() for _ in self.starts]
+            for block, preds in enumerate(self.preds):
+                if len(preds) < 2 or idom[block] < 0:
+                    continue
+                for pred in preds:
+                    # A runner that finds `block` already in a frontier
+                    # follows one that went the rest of the way up.
+                    runner = pred
+                    while idom[runner] >= 0 and runner != idom[block] and block not in frontiers[runner]:
+                        frontiers[runner].add(block)
+                        runner = idom[runner]
+            self._frontiers = frontiers
+        return self._frontiers
+
+    def loops(self):
+        # Natural loops, outermost first.
+        if self._loops is None:
+            self.idom()
+            preds = self.preds
+            by_header = {}
+            for block in self.reverse_postorder():
+                for target in self.succs[block]:
+                    if self.dominates(target, block):
+                        by_header.setdefault(target, []).append(block)
+
+            loops = []
+            for header, latches in by_header.items():
+                blocks = {header}
+                stack = [latch for latch in latches if latch != header]
+                blocks.update(stack)
+                while stack:
+                    block = stack.pop()
+                    for pred in preds[block]:
+                        if pred not in blocks and self._enter[pred] >= 0:
+                            blocks.add(pred)
+                            stack.append(pred)
+                loops.append(Loop(header, frozenset(blocks), latches))
+
+            loops.sort(key=lambda loop: len(loop.blocks), reverse=True)
+            innermost = [None] * len(self.starts)
+            for loop in loops:
+                # Larger loops come first, so the header's current innermost
+                # loop is the nearest one enclosing this loop.
+                parent = innermost[loop.header]
+                if parent is not None:
+                    loop.parent = parent
+                    loop.depth = parent.depth + 1
+                for block in loop.blocks:
+                    innermost[block] = loop
+            self.innermost_loop = innermost
+            self._loops = loops
+        return self._loops
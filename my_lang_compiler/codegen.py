@@ -1,4 +1,11 @@
-from .ir import OpCode
+from .ir import OpCode, Variable, INT_BITS, JUMP_COMPARES
+from .packed import PackedIR, TEMP, VARIABLE
+
+# Instructions whose result is a label rather than a value.
+LABEL_OPS = (OpCode.JMP, OpCode.JFALSE, OpCode.JIF, OpCode.LABEL) + tuple(JUMP_COMPARES)
+JUMP_OPERATORS = {
+    OpCode.JLT: "<", OpCode.JLE: "<=", OpCode.JGT: ">", OpCode.JGE: ">=", OpCode.JEQ: "==", OpCode.JNE: "!=",
+}
 
 class CodeGenerator:
     def __init__(self, ir_program):
@@ -7,15 +14,15 @@ class CodeGenerator:
         self.vars = set()
 
     def _collect_operand(self, operand):
-        if operand is None or not isinstance(operand, str):
-            return
-        if operand.startswith('L'):
-            return
-        if operand.startswith('t'):
-            self.temps.add(operand)
-            return
-        if operand.isidentifier():
-            self.vars.add(operand)
+        if type(operand) is Variable:
+            self.vars.add(operand.name)
+
+    def _operand(self, operand):
+        # Integer operands are literals. The most negative int has no literal
+        # of type int in C.
+        if type(operand) is int and operand == -(1 << (INT_BITS - 1)):
+            return f"({operand + 1} - 1)"
+        return operand
 
     def _escape_c_string(self, value):
         escaped = value.replace("\\", "\\\\")
@@ -26,73 +33,107 @@ class CodeGenerator:
         return escaped
 
     def generate(self):
-        # 1. Collect all variables and temps
-        for instr in self.ir.instructions:
-            if instr.result is not None:
-                self._collect_operand(instr.result)
-
-            if instr.op in (
-                OpCode.LOAD, OpCode.STORE, OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV,
-                OpCode.JFALSE, OpCode.PRINT, OpCode.SLT, OpCode.SEQ, OpCode.SLE,
-                OpCode.SGT, OpCode.SGE, OpCode.SNE
-            ):
-                self._collect_operand(instr.arg1)
-                self._collect_operand(instr.arg2)
+        # 1. Collect all variables and temps; a PackedIR has them in its
+        # operand table already.
+        if type(self.ir) is PackedIR:
+            self.temps.update(self.ir.operands(TEMP))
+            self.vars.update(variable.name for variable in self.ir.operands(VARIABLE))
+        else:
+            self.collect(self.ir.instructions)
 
         # 2. Output C code
+        return self.assemble(list(self.temps) + list(self.vars), self.body())
+
+    def body(self):
+        # The statements of main(), one per instruction.
+        return self.emit(self.ir.instructions)
+
+    def assemble(self, names, body_lines):
         lines = []
         lines.append("#include <stdio.h>")
         lines.append("int main() {")
-        
-        # Declarations
-        all_vars = sorted(list(self.temps) + list(self.vars))
+
+        # Declarations; names like spill[3] are elements of an array.
+        scalars = []
+        arrays = {}
+        for name in names:
+            base, bracket, index = name.partition("[")
+            if bracket:
+                arrays[base] = max(arrays.get(base, 0), int(index[:-1]) + 1)
+            else:
+                scalars.append(name)
+        all_vars = sorted(scalars) + [f"{base}[{size}]" for base, size in sorted(arrays.items())]
         if all_vars:
             lines.append("    int " + ", ".join(all_vars) + ";")
 
         # Instructions
-        for instr in self.ir.instructions:
+        lines.extend(body_lines)
+
+        lines.append("    return 0;")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def collect(self, instructions):
+        # Temps are the results of value-producing instructions; variables
+        # are the Variable operands.
+        for instr in instructions:
+            if instr.op not in LABEL_OPS:
+                result = instr.result
+                if type(result) is Variable:
+                    self.vars.add(result.name)
+                elif result is not None:
+                    self.temps.add(result)
+            self._collect_operand(instr.arg1)
+            self._collect_operand(instr.arg2)
+
+    def emit(self, instructions):
+        lines = []
+        for instr in instructions:
+            arg1 = self._operand(instr.arg1)
+            arg2 = self._operand(instr.arg2)
             line = "    "
             if instr.op == OpCode.CONST:
-                line += f"{instr.result} = {instr.arg1};"
+                line += f"{instr.result} = {arg1};"
             elif instr.op == OpCode.LOAD:
-                line += f"{instr.result} = {instr.arg1};"
+                line += f"{instr.result} = {arg1};"
             elif instr.op == OpCode.STORE:
-                line += f"{instr.result} = {instr.arg1};"
+                line += f"{instr.result} = {arg1};"
             elif instr.op == OpCode.ADD:
-                line += f"{instr.result} = {instr.arg1} + {instr.arg2};"
+                line += f"{instr.result} = {arg1} + {arg2};"
             elif instr.op == OpCode.SUB:
-                line += f"{instr.result} = {instr.arg1} - {instr.arg2};"
+                line += f"{instr.result} = {arg1} - {arg2};"
             elif instr.op == OpCode.MUL:
-                line += f"{instr.result} = {instr.arg1} * {instr.arg2};"
+                line += f"{instr.result} = {arg1} * {arg2};"
             elif instr.op == OpCode.DIV:
-                line += f"{instr.result} = {instr.arg1} / {instr.arg2};"
+                line += f"{instr.result} = {arg1} / {arg2};"
             elif instr.op == OpCode.JMP:
                 line += f"goto {instr.result};"
             elif instr.op == OpCode.JFALSE:
-                line += f"if (!{instr.arg1}) goto {instr.result};"
+                line += f"if (!{arg1}) goto {instr.result};"
+            elif instr.op == OpCode.JIF:
+                line += f"if ({arg1}) goto {instr.result};"
+            elif instr.op in JUMP_COMPARES:
+                line += f"if ({arg1} {JUMP_OPERATORS[instr.op]} {arg2}) goto {instr.result};"
             elif instr.op == OpCode.LABEL:
                 line = f"{instr.result}:;" 
             elif instr.op == OpCode.PRINT:
-                line += f'printf("%d\\n", {instr.arg1});'
+                line += f'printf("%d\\n", {arg1});'
             elif instr.op == OpCode.PRINTS:
                 line += f'printf("%s\\n", "{self._escape_c_string(instr.arg1)}");'
             elif instr.op == OpCode.SLT:
-                line += f"{instr.result} = ({instr.arg1} < {instr.arg2});"
+                line += f"{instr.result} = ({arg1} < {arg2});"
             elif instr.op == OpCode.SEQ:
-                line += f"{instr.result} = ({instr.arg1} == {instr.arg2});"
+                line += f"{instr.result} = ({arg1} == {arg2});"
             elif instr.op == OpCode.SNE:
-                line += f"{instr.result} = ({instr.arg1} != {instr.arg2});"
+                line += f"{instr.result} = ({arg1} != {arg2});"
             elif instr.op == OpCode.SLE:
-                line += f"{instr.result} = ({instr.arg1} <= {instr.arg2});"
+                line += f"{instr.result} = ({arg1} <= {arg2});"
             elif instr.op == OpCode.SGT:
-                line += f"{instr.result} = ({instr.arg1} > {instr.arg2});"
+                line += f"{instr.result} = ({arg1} > {arg2});"
             elif instr.op == OpCode.SGE:
-                line += f"{instr.result} = ({instr.arg1} >= {instr.arg2});"
+                line += f"{instr.result} = ({arg1} >= {arg2});"
             else:
                 raise Exception(f"Unsupported opcode in codegen: {instr.op}")
             
             lines.append(line)
-
-        lines.append("    return 0;")
-        lines.append("}")
-        return "\n".join(lines)
+        return lines
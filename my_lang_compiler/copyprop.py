@@ -0,0 +1,189 @@
+from .ir import OpCode, Quadruple, IRProgram
+from .cfg import ControlFlowGraph
+from .ssa import LITERAL_OPS
+from .liveness import Liveness, definition
+from .dce import DeadCodeEliminator
+
+# Instructions whose result is a plain copy of arg1.
+COPY_OPS = (OpCode.LOAD, OpCode.STORE)
+
+
+def _is_copy(instr):
+    op = instr.op
+    return op == OpCode.CONST or (op in COPY_OPS and instr.arg1 != instr.result)
+
+
+class CopyPropagator:
+    # Forwards copies: after `LOAD x -> t`, `STORE t -> x` or `CONST 5 -> t`,
+    # later reads of t (or of x) use x, t or the literal 5 directly, for as
+    # long as neither side is assigned again. Within a block this also turns
+    # a LOAD of a just-stored variable, or a second LOAD of the same one,
+    # into a copy of the value already in hand.
+    #
+    # Across blocks a copy is forwarded when it holds on every path into the
+    # block (available copies, as int bitsets over the copy instructions).
+    # Only copies to names that live across blocks are tracked there; the
+    # rest are never read outside their block.
+    #
+    # The copies left unread are deleted with a DeadCodeEliminator pass;
+    # `removed` counts the instructions that went.
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.rewritten = 0
+        self.removed = 0
+
+    def optimize(self):
+        program = self.ir
+        cfg = ControlFlowGraph.of(program)
+        instructions = program.instructions
+        self._number_copies(instructions, Liveness.of(program).index)
+        available_in = self._available(cfg, instructions)
+
+        result = []
+        for block in range(len(cfg)):
+            body = instructions[cfg.starts[block]:cfg.ends[block]]
+            if available_in[block] is None:
+                # Unreachable: leave it for DeadCodeEliminator.
+                result.extend(body)
+            else:
+                self._forward(body, available_in[block], result)
+
+        rewritten = IRProgram()
+        rewritten.instructions = result
+        cleaned = DeadCodeEliminator(rewritten).optimize()
+        self.removed = len(instructions) - len(cleaned.instructions)
+        return cleaned
+
+    def _number_copies(self, instructions, global_names):
+        # Gives every copy to a name in `global_names` a bit. kills[name] has
+        # the bits of the copies an assignment to `name` invalidates: those to
+        # it and those of it.
+        copy_bit = {}
+        values = []
+        targets = {}
+        kills = {}
+        for instr in instructions:
+            name = instr.result
+            if name not in global_names or not _is_copy(instr):
+                continue
+            value = instr.arg1
+            key = (name, value)
+            if key in copy_bit:
+                continue
+            bit = 1 << len(values)
+            copy_bit[key] = bit
+            values.append(value)
+            targets[name] = targets.get(name, 0) | bit
+            kills[name] = kills.get(name, 0) | bit
+            if type(value) is not int:
+                kills[value] = kills.get(value, 0) | bit
+        self.copy_bit = copy_bit
+        self.values = values
+        self.targets = targets
+        self.kills = kills
+
+    def _available(self, cfg, instructions):
+        # Bits of the copies holding on entry to each block; None for blocks
+        # the entry can't reach.
+        kills = self.kills
+        copy_bit = self.copy_bit
+        gen_bits = []
+        kill_bits = []
+        for block in range(len(cfg)):
+            gen = 0
+            kill = 0
+            for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+                name = definition(instr)
+                if name is None:
+                    continue
+                mask = kills.get(name)
+                if mask is None:
+                    continue
+                gen &= ~mask
+                kill |= mask
+                bit = copy_bit.get((name, instr.arg1))
+                if bit is not None and _is_copy(instr):
+                    gen |= bit
+            gen_bits.append(gen)
+            kill_bits.append(kill)
+
+        # Forward "on every path" problem: start from every copy and shrink.
+        everything = (1 << len(self.values)) - 1
+        available_in = [None] * len(cfg)
+        available_out = [everything] * len(cfg)
+        order = cfg.reverse_postorder()
+        changed = True
+        while changed:
+            changed = False
+            for block in order:
+                if block == 0:
+                    entry = 0
+                else:
+                    entry = everything
+                    for pred in cfg.preds[block]:
+                        entry &= available_out[pred]
+                available_in[block] = entry
+                out = gen_bits[block] | (entry & ~kill_bits[block])
+                if out != available_out[block]:
+                    available_out[block] = out
+                    changed = True
+        return available_in
+
+    def _forward(self, body, available, result):
+        # Appends the block to `result` with every read of a copy replaced by
+        # the copied value. `available` holds the bits of the copies holding
+        # on entry; `copies` the ones made in the block.
+        values = self.values
+        targets = self.targets
+        kills = self.kills
+        copies = {}
+        # readers[v]: names currently holding a copy of v in `copies`.
+        readers = {}
+
+        def lookup(name):
+            value = copies.get(name)
+            if value is not None:
+                return value
+            # Follow copies holding on entry (at most one per name holds).
+            value = name
+            while type(value) is not int:
+                bits = available & targets.get(value, 0)
+                if not bits:
+                    break
+                value = values[(bits & -bits).bit_length() - 1]
+            return value
+
+        for instr in body:
+            op = instr.op
+            arg1 = instr.arg1
+            arg2 = instr.arg2
+            if op not in LITERAL_OPS and arg1 is not None and type(arg1) is not int:
+                arg1 = lookup(arg1)
+            if arg2 is not None and type(arg2) is not int:
+                arg2 = lookup(arg2)
+            if arg1 is instr.arg1 and arg2 is instr.arg2:
+                result.append(instr)
+            else:
+                result.append(Quadruple(op, arg1, arg2, instr.result))
+                self.rewritten += 1
+
+            name = definition(instr)
+            if name is None:
+                continue
+            # `name` changes: copies of it and its own copy are stale.
+            for reader in readers.pop(name, ()):
+                del copies[reader]
+            stale = copies.pop(name, None)
+            if stale is not None and type(stale) is not int:
+                readers[stale].discard(name)
+            mask = kills.get(name)
+            if mask is not None:
+                available &= ~mask
+            if op == OpCode.CONST or (op in COPY_OPS and arg1 != name):
+                copies[name] = arg1
+                if type(arg1) is not int:
+                    entry = readers.get(arg1)
+                    if entry is None:
+                        readers[arg1] = {name}
+                    else:
+                        entry.add(name)
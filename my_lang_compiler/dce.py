@@ -0,0 +1,105 @@
+from .ir import OpCode, IRProgram, Variable
+from .cfg import ControlFlowGraph, BRANCH_OPS
+from .ssa import jumps_to_next
+from .liveness import Liveness, uses, definition
+
+# Instructions kept even when nothing reads their result.
+EFFECT_OPS = (OpCode.PRINT, OpCode.PRINTS)
+
+
+class DeadCodeEliminator:
+    # Removes blocks the entry can't reach, instructions whose result is never
+    # read (dead temps, and stores to variables that are overwritten or never
+    # read again), jumps to the label right after them and labels nothing
+    # jumps to. Deleting a dead instruction can make the ones feeding it dead
+    # too, so the liveness pass repeats until nothing changes.
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.unreachable_removed = 0
+        self.temps_removed = 0
+        self.stores_removed = 0
+        self.jumps_removed = 0
+        self.labels_removed = 0
+
+    def optimize(self):
+        program = self._remove_unreachable(self.ir)
+        while True:
+            instructions = self._remove_dead(program)
+            if len(instructions) == len(program.instructions):
+                break
+            program = IRProgram()
+            program.instructions = instructions
+        return self._remove_labels(program)
+
+    def _remove_unreachable(self, program):
+        cfg = ControlFlowGraph.of(program)
+        instructions = []
+        for block in range(len(cfg)):
+            if cfg.reachable(block):
+                instructions.extend(cfg.instructions(block))
+            else:
+                self.unreachable_removed += cfg.ends[block] - cfg.starts[block]
+        if len(instructions) == len(program.instructions):
+            return program
+        reachable = IRProgram()
+        reachable.instructions = instructions
+        return reachable
+
+    def _remove_dead(self, program):
+        liveness = Liveness.of(program)
+        cfg = liveness.cfg
+        index = liveness.index
+        instructions = program.instructions
+        kept = []
+        for block in range(len(cfg)):
+            # Walk the block backwards: `live` holds the bits of names that
+            # live across blocks, `local` the other names read further down.
+            live = liveness.live_out[block]
+            local = set()
+            body = []
+            for instr in reversed(instructions[cfg.starts[block]:cfg.ends[block]]):
+                result = definition(instr)
+                if result is not None:
+                    bit = index.get(result)
+                    if bit is None:
+                        read = result in local
+                        local.discard(result)
+                    else:
+                        read = live >> bit & 1
+                        live &= ~(1 << bit)
+                    if not read and instr.op not in EFFECT_OPS:
+                        if type(result) is Variable:
+                            self.stores_removed += 1
+                        else:
+                            self.temps_removed += 1
+                        continue
+                for operand in uses(instr):
+                    bit = index.get(operand)
+                    if bit is None:
+                        local.add(operand)
+                    else:
+                        live |= 1 << bit
+                body.append(instr)
+            body.reverse()
+            kept.extend(body)
+        return kept
+
+    def _remove_labels(self, program):
+        instructions = []
+        for position, instr in enumerate(program.instructions):
+            if instr.op == OpCode.JMP and jumps_to_next(program.instructions, position):
+                self.jumps_removed += 1
+                continue
+            instructions.append(instr)
+
+        targets = {instr.result for instr in instructions if instr.op in BRANCH_OPS}
+        result = []
+        for instr in instructions:
+            if instr.op == OpCode.LABEL and instr.result not in targets:
+                self.labels_removed += 1
+                continue
+            result.append(instr)
+
+        cleaned = IRProgram()
+        cleaned.instructions = result
+        return cleaned
@@ -0,0 +1,162 @@
+from .ir import OpCode, Quadruple, IRProgram, evaluate
+from .cfg import ControlFlowGraph
+from .ssa import build_ssa, destroy_ssa, LITERAL_OPS
+
+BINARY_OPS = (
+    OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV,
+    OpCode.SLT, OpCode.SLE, OpCode.SGT, OpCode.SGE, OpCode.SEQ, OpCode.SNE,
+)
+COMMUTATIVE_OPS = (OpCode.ADD, OpCode.MUL, OpCode.SEQ, OpCode.SNE)
+# a > b is looked up as b < a, a >= b as b <= a.
+SWAPPED_OPS = {OpCode.SGT: OpCode.SLT, OpCode.SGE: OpCode.SLE}
+COPY_OPS = (OpCode.LOAD, OpCode.STORE)
+
+
+def _order(operand):
+    return (type(operand).__name__, str(operand))
+
+
+def expression_key(op, left, right):
+    # Equal for expressions that compute the same value from the same value
+    # numbers: commutative operands are sorted and > and >= flipped.
+    swapped = SWAPPED_OPS.get(op)
+    if swapped is not None:
+        return (swapped, right, left)
+    if op in COMMUTATIVE_OPS and _order(right) < _order(left):
+        return (op, right, left)
+    return (op, left, right)
+
+
+class ValueNumbering:
+    # Hash-based value numbering on the SSA form of the program. A value
+    # number is an int for a known constant, else the name that first held
+    # the value; copies share the number of their source. An expression whose
+    # key (see expression_key) was computed before, in the same block or in
+    # a dominating one, reuses that result: a temp is dropped and its uses
+    # read the earlier temp, a variable is assigned from it. Expressions on
+    # two constants are folded.
+    #
+    # Renaming gives every STORE a new version, so expressions over a
+    # variable's old value never match ones over its new value. Only temps
+    # with a single definition stand in for a reused value, which keeps the
+    # versions of a name from overlapping for destroy_ssa.
+    #
+    # LocalValueNumbering forgets the table at the end of each block.
+    dominators = True
+
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.reused = 0
+        self.folded = 0
+
+    def optimize(self):
+        ssa = build_ssa(self.ir)
+        cfg = ControlFlowGraph.of(ssa)
+        instructions = ssa.instructions
+        self.values = {}
+        self.table = {}
+        self.rename = {}
+
+        bodies = [None] * len(cfg)
+        if self.dominators:
+            # Walk the dominator tree over an explicit stack; a block's frame
+            # comes back once its subtree is done, to drop what it added.
+            cfg.idom()
+            stack = [(0, None)] if len(cfg) else []
+            while stack:
+                block, added = stack.pop()
+                if added is not None:
+                    for key in added:
+                        del self.table[key]
+                    continue
+                added = []
+                bodies[block] = self._number_block(instructions[cfg.starts[block]:cfg.ends[block]], added)
+                stack.append((block, added))
+                for child in cfg.dom_children[block]:
+                    stack.append((child, None))
+        else:
+            for block in range(len(cfg)):
+                bodies[block] = self._number_block(instructions[cfg.starts[block]:cfg.ends[block]], [])
+                self.table.clear()
+
+        rename = self.rename
+        result = []
+        for body in bodies:
+            for instr in body:
+                if rename:
+                    instr = self._renamed(instr)
+                result.append(instr)
+        program = IRProgram()
+        program.instructions = result
+        return destroy_ssa(program)
+
+    def _number(self, operand):
+        if type(operand) is int:
+            return operand
+        return self.values.get(operand, operand)
+
+    def _number_block(self, instructions, added):
+        body = []
+        values = self.values
+        for instr in instructions:
+            op = instr.op
+            result = instr.result
+            if op == OpCode.CONST:
+                value = instr.arg1
+            elif op in COPY_OPS:
+                value = self._number(instr.arg1)
+            elif op in BINARY_OPS:
+                left = self._number(instr.arg1)
+                right = self._number(instr.arg2)
+                value = None
+                if type(left) is int and type(right) is int:
+                    value = evaluate(op, left, right)
+                if value is None:
+                    key = expression_key(op, left, right)
+                    value = self.table.get(key)
+                    if value is None:
+                        value = self.table[key] = result
+                        added.append(key)
+            else:
+                body.append(instr)
+                continue
+
+            values[result] = value
+            if value is result or (op in COPY_OPS and instr.arg1 == value):
+                body.append(instr)
+            elif type(value) is int:
+                self.folded += 1
+                if op == OpCode.STORE:
+                    body.append(Quadruple(OpCode.STORE, arg1=value, result=result))
+                else:
+                    body.append(Quadruple(OpCode.CONST, arg1=value, result=result))
+            elif type(value) is not str:
+                # Held by a variable version: leave it to copy propagation.
+                body.append(instr)
+            elif type(result) is str:
+                self.reused += 1
+                self.rename[result] = value
+            else:
+                self.reused += 1
+                body.append(Quadruple(OpCode.STORE, arg1=value, result=result))
+        return body
+
+    def _renamed(self, instr):
+        rename = self.rename
+        op = instr.op
+        arg1 = instr.arg1
+        arg2 = instr.arg2
+        if op == OpCode.PHI:
+            arg1 = [rename.get(operand, operand) for operand in arg1]
+        elif op not in LITERAL_OPS:
+            arg1 = rename.get(arg1, arg1)
+        arg2 = rename.get(arg2, arg2)
+        if arg1 is instr.arg1 and arg2 is instr.arg2:
+            return instr
+        if op == OpCode.PHI and arg1 == instr.arg1:
+            return instr
+        return Quadruple(op, arg1, arg2, instr.result)
+
+
+class LocalValueNumbering(ValueNumbering):
+    dominators = False
@@ -0,0 +1,322 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+
+from .scanner import Scanner
+from .parser import Parser
+from .semantic_analyzer import SemanticAnalyzer, ScopeStack
+from .ir_generator import IRGenerator
+from .optimizer import Optimizer
+from .codegen import CodeGenerator
+from .tokens import TokenType
+
+
+class GlobalScope(ScopeStack):
+    # Scopes as seen by a single top-level statement: its own declarations,
+    # plus whatever `earlier(name)` reports as declared by the statements
+    # before it. Names resolved through `earlier` are recorded.
+    def __init__(self, earlier):
+        super().__init__()
+        self.earlier = earlier
+        self.uses = set()
+
+    def lookup(self, name, local_only=False):
+        variable = super().lookup(name, local_only)
+        if variable is not None:
+            return variable
+        if local_only:
+            if len(self.frames) > 1:
+                return None
+            return self.earlier(name)
+        self.uses.add(name)
+        return self.earlier(name)
+
+
+class StatementIRGenerator(IRGenerator):
+    # Temps and labels carry the statement id so per-statement IR can be
+    # regenerated independently and still be concatenated. RESERVED_NAME
+    # covers these names, so no variable is declared with one.
+    def __init__(self, sid, variables):
+        super().__init__(variables)
+        self.sid = sid
+
+    def fresh_temp(self):
+        self.temp_counter += 1
+        return f"t{self.sid}_{self.temp_counter}"
+
+    def fresh_label(self):
+        self.label_counter += 1
+        return f"L{self.sid}_{self.label_counter}"
+
+
+class StatementRecord:
+    # One top-level statement of Program.statements. `length` is the size of
+    # its source span, which runs up to the first token of the next statement.
+    # `declares`/`uses` summarise its interaction with the global scope and do
+    # not depend on the statements around it.
+    __slots__ = ('node', 'length', 'sid', 'order', 'declares', 'uses', 'slots', 'variables', 'temps', 'code')
+
+    def __init__(self, node, length, sid):
+        self.node = node
+        self.length = length
+        self.sid = sid
+        self.order = 0.0
+        self.declares = None
+        self.uses = None
+        self.slots = None
+        self.variables = None
+        self.temps = None
+        self.code = None
+
+
+class IncrementalResult:
+    def __init__(self, text, c_code=None, error=None, records=None, prefix_length=0, owners=None, stats=None):
+        self.text = text
+        self.c_code = c_code
+        self.error = error
+        self.records = records
+        self.prefix_length = prefix_length
+        self.owners = owners
+        self.stats = stats or {}
+
+
+class IncrementalCompiler:
+    # Compilation session for editor integrations.
+    #
+    #   compiler = IncrementalCompiler()
+    #   result = compiler.compile(text)
+    #   result = compiler.recompile(result, [(offset, length, new_text)])
+    #
+    # Edits are applied in order, each offset relative to the text produced by
+    # the edits before it. Only the top-level statements overlapping an edit
+    # (plus the one before, which a new `myelse` could attach to) are re-lexed
+    # and re-parsed. Semantic analysis and IR generation rerun for those
+    # statements; the rest of the program is only rechecked when the set of
+    # top-level declarations changed. Generated temps and labels are named and
+    # declared per statement, so the C differs textually from compile_source()
+    # but not in behaviour.
+    def __init__(self):
+        self._next_sid = 0
+
+    def compile(self, text):
+        stats = {'reparsed': 0, 'analyzed': 0, 'generated': 0}
+        try:
+            parsed, end, _, prefix_length = self._parse_region(text, 0, lambda boundary: None)
+        except Exception as e:
+            return IncrementalResult(text, error=str(e), stats=stats)
+
+        records = self._make_records(parsed, end)
+        self._assign_order(records, 0, len(records))
+        stats['reparsed'] = len(records)
+        return self._finish(text, records, prefix_length, None, set(records), [], stats)
+
+    def recompile(self, previous, edits):
+        text = previous.text
+        if previous.records is None:
+            for offset, length, new_text in edits:
+                text = self._apply_edit(text, offset, length, new_text)
+            return self.compile(text)
+
+        stats = {'reparsed': 0, 'analyzed': 0, 'generated': 0}
+        records = list(previous.records)
+        prefix_length = previous.prefix_length
+        added = set()
+        removed = []
+
+        for index, (offset, length, new_text) in enumerate(edits):
+            text = self._apply_edit(text, offset, length, new_text)
+            starts = list(accumulate([prefix_length] + [record.length for record in records[:-1]])) if records else []
+
+            containing = bisect_right(starts, offset) - 1
+            first = max(containing - 1, 0)
+            region_start = starts[first] if first > 0 else 0
+            delta = len(new_text) - length
+            edit_end_old = offset + length
+            edit_end_new = offset + len(new_text)
+
+            def stop(boundary):
+                # Resume at the first old statement boundary past the edit.
+                if boundary < edit_end_new:
+                    return None
+                old_start = boundary - delta
+                if old_start < edit_end_old:
+                    return None
+                resume = bisect_left(starts, old_start)
+                if resume < len(starts) and starts[resume] == old_start and resume >= first:
+                    return resume
+                return None
+
+            try:
+                parsed, end, last, first_token = self._parse_region(text, region_start, stop)
+            except Exception:
+                # The error may be fixed by a later edit; either way the final
+                # text has to be compiled from scratch.
+                for offset, length, new_text in edits[index + 1:]:
+                    text = self._apply_edit(text, offset, length, new_text)
+                return self.compile(text)
+
+            if last is None:
+                last = len(records)
+            if first == 0:
+                prefix_length = first_token
+            new_records = self._make_records(parsed, end)
+            for record in records[first:last]:
+                if record in added:
+                    added.discard(record)
+                else:
+                    removed.append(record)
+            records[first:last] = new_records
+            added.update(new_records)
+            self._assign_order(records, first, len(new_records))
+            stats['reparsed'] += len(new_records)
+
+        owners = previous.owners if previous.error is None else None
+        return self._finish(text, records, prefix_length, owners, added, removed, stats)
+
+    def _apply_edit(self, text, offset, length, new_text):
+        if offset < 0 or length < 0 or offset + length > len(text):
+            raise ValueError(f"Edit ({offset}, {length}) is outside the source text")
+        return text[:offset] + new_text + text[offset + length:]
+
+    def _parse_region(self, text, region_start, stop):
+        # Parses top-level statements from region_start until `stop` accepts a
+        # statement boundary or input ends. Returns the statements with their
+        # start offsets, the final boundary, stop's answer and the offset of
+        # the first token.
+        scanner = Scanner(text)
+        scanner.pos = region_start
+        scanner.line = text.count('\n', 0, region_start) + 1
+        scanner.line_start = text.rfind('\n', 0, region_start) + 1
+        parser = Parser(scanner)
+        first_token = scanner.token_start
+
+        parsed = []
+        while True:
+            boundary = scanner.token_start
+            if parser.current_token.type == TokenType.EOF:
+                return parsed, boundary, None, first_token
+            resume = stop(boundary)
+            if resume is not None:
+                return parsed, boundary, resume, first_token
+            parsed.append((boundary, parser.statement()))
+
+    def _make_records(self, parsed, end):
+        records = []
+        for index, (start, node) in enumerate(parsed):
+            next_start = parsed[index + 1][0] if index + 1 < len(parsed) else end
+            records.append(StatementRecord(node, next_start - start, self._next_sid))
+            self._next_sid += 1
+        return records
+
+    def _assign_order(self, records, first, count):
+        # Order keys let the fast path compare statement positions without
+        # renumbering the whole list after every splice.
+        low = records[first - 1].order if first > 0 else 0.0
+        following = first + count
+        high = records[following].order if following < len(records) else low + count + 1
+        step = (high - low) / (count + 1)
+        if step < 1e-9:
+            for index, record in enumerate(records):
+                record.order = float(index + 1)
+            return
+        for index in range(count):
+            records[first + index].order = low + step * (index + 1)
+
+    def _analyze(self, record, earlier):
+        analyzer = SemanticAnalyzer()
+        scope = GlobalScope(earlier)
+        analyzer.current_scope = scope
+        analyzer.visit(record.node)
+        record.declares = list(scope.frames[0].items())
+        record.uses = frozenset(scope.uses)
+        record.slots = analyzer.variables
+        # Generated C names depend on the analysis.
+        record.code = None
+
+    def _check_fast(self, owners, added, removed, stats):
+        # Valid when the edited statements analyse cleanly against the
+        # declarations before them and declare the same names as the
+        # statements they replaced; nothing else can observe the change.
+        old_names = Counter(name for record in removed for name, _ in record.declares)
+        new_names = Counter()
+        owners = dict(owners)
+        for record in removed:
+            for name, _ in record.declares:
+                if owners.get(name) is record:
+                    del owners[name]
+
+        for record in sorted(added, key=lambda record: record.order):
+            def earlier(name, order=record.order):
+                owner = owners.get(name)
+                if owner is None or owner.order >= order:
+                    return None
+                return dict(owner.declares)[name]
+
+            try:
+                self._analyze(record, earlier)
+            except Exception:
+                return None
+            stats['analyzed'] += 1
+            for name, _ in record.declares:
+                new_names[name] += 1
+                owners[name] = record
+
+        if new_names != old_names:
+            return None
+        return owners
+
+    def _check_full(self, records, added, stats):
+        declared = {}
+        owners = {}
+        for record in records:
+            fresh = record in added or record.uses is None
+            if not fresh:
+                fresh = (
+                    any(name not in declared for name in record.uses)
+                    or any(name in declared for name, _ in record.declares)
+                )
+            if fresh:
+                # Raises the same error the full analyzer would report.
+                self._analyze(record, declared.get)
+                stats['analyzed'] += 1
+            for name, type_ in record.declares:
+                declared[name] = type_
+                owners[name] = record
+        return owners
+
+    def _finish(self, text, records, prefix_length, owners, added, removed, stats):
+        try:
+            checked = None
+            if owners is not None:
+                checked = self._check_fast(owners, added, removed, stats)
+            if checked is None:
+                checked = self._check_full(records, added, stats)
+        except Exception as e:
+            return IncrementalResult(text, error=str(e), records=records, prefix_length=prefix_length, stats=stats)
+
+        # Temps are private to their statement, so each statement declares its
+        # own; only user variables need merging and sorting.
+        body = []
+        for record in records:
+            if record.code is None:
+                self._generate(record)
+                stats['generated'] += 1
+            if record.temps:
+                body.append(record.temps)
+        for record in records:
+            if record.code:
+                body.append(record.code)
+
+        variables = set().union(*[record.variables for record in records])
+        c_code = CodeGenerator(None).assemble(variables, body)
+        return IncrementalResult(text, c_code, None, records, prefix_length, checked, stats)
+
+    def _generate(self, record):
+        generator = StatementIRGenerator(record.sid, record.slots)
+        generator.visit(record.node)
+        instructions = Optimizer(generator.program).optimize().instructions
+        codegen = CodeGenerator(None)
+        codegen.collect(instructions)
+        record.variables = frozenset(codegen.vars)
+        record.temps = "    int " + ", ".join(sorted(codegen.temps)) + ";" if codegen.temps else ""
+        record.code = "\n".join(codegen.emit(instructions))
@@ -0,0 +1,240 @@
+from .ir import OpCode, Variable, INT_BITS
+from .codegen import LABEL_OPS
+
+INT_MIN = -(1 << (INT_BITS - 1))
+INT_MAX = (1 << (INT_BITS - 1)) - 1
+WRAP = 1 << INT_BITS
+
+
+class Interpreter:
+    # Runs an IRProgram in-process and returns what the generated C would
+    # print. Loading resolves every label to the index of the instruction
+    # after it and drops the LABEL instructions; temps, variables and integer
+    # literals each get a slot in one flat list, so an instruction becomes
+    # (opcode number, slot, slot, slot or target index). run() dispatches on
+    # the opcode number through a table of small handlers, each returning the
+    # index of the next instruction.
+    #
+    # Values follow the C code: 32-bit ints that wrap, division that
+    # truncates towards zero and uninitialized variables read as 0. Dividing
+    # by zero raises. With `max_steps`, running more instructions than that
+    # raises as well, which bounds programs that loop forever. `steps` counts
+    # the instructions run and `output` holds the lines printed so far, also
+    # after an error.
+    def __init__(self, ir_program, max_steps=None):
+        if max_steps is not None and max_steps < 1:
+            raise ValueError(f"max_steps must be at least 1, not {max_steps}")
+        self.ir = ir_program
+        self.max_steps = max_steps
+        self.steps = 0
+        self.output = []
+        self.code = None
+        self.initial = None
+
+    def load(self):
+        # Resolves labels and operands once; run() calls it if needed.
+        instructions = self.ir.instructions
+        targets = {}
+        position = 0
+        for instr in instructions:
+            if instr.op == OpCode.LABEL:
+                targets[instr.result] = position
+            else:
+                position += 1
+
+        slots = {}
+        constants = {}
+        initial = []
+
+        def slot(operand):
+            if operand is None:
+                return None
+            if type(operand) is int:
+                index = constants.get(operand)
+                if index is None:
+                    index = constants[operand] = len(initial)
+                    initial.append(operand)
+                return index
+            name = operand.name if type(operand) is Variable else operand
+            index = slots.get(name)
+            if index is None:
+                index = slots[name] = len(initial)
+                initial.append(0)
+            return index
+
+        code = []
+        for instr in instructions:
+            op = instr.op
+            if op == OpCode.LABEL:
+                continue
+            if op == OpCode.PRINTS:
+                code.append((op.value, instr.arg1, None, None))
+            elif op in LABEL_OPS:
+                code.append((op.value, slot(instr.arg1), slot(instr.arg2), targets[instr.result]))
+            elif op in HANDLERS:
+                code.append((op.value, slot(instr.arg1), slot(instr.arg2), slot(instr.result)))
+            else:
+                raise Exception(f"Unsupported opcode in interpreter: {op}")
+        self.code = code
+        self.initial = initial
+        return self
+
+    def run(self):
+        if self.code is None:
+            self.load()
+        code = self.code
+        slots = list(self.initial)
+        self.output = output = []
+        handlers = dispatch_table(slots, output.append)
+        end = len(code)
+        limit = self.max_steps if self.max_steps is not None else -1
+        pc = 0
+        steps = 0
+        try:
+            while pc < end:
+                if steps == limit:
+                    raise Exception(f"Step limit of {limit} instructions exceeded")
+                op, a, b, r = code[pc]
+                pc = handlers[op](pc + 1, a, b, r)
+                steps += 1
+        finally:
+            self.steps = steps
+        return "".join(output)
+
+
+def wrap(value):
+    if INT_MIN <= value <= INT_MAX:
+        return value
+    return (value - INT_MIN) % WRAP + INT_MIN
+
+
+def dispatch_table(s, write):
+    # Handlers over the slot list `s`, indexed by opcode number. Each takes
+    # the index of the next instruction and the three operands and returns
+    # where to continue.
+    def copy(pc, a, b, r):
+        s[r] = s[a]
+        return pc
+
+    def add(pc, a, b, r):
+        v = s[a] + s[b]
+        s[r] = v if INT_MIN <= v <= INT_MAX else wrap(v)
+        return pc
+
+    def sub(pc, a, b, r):
+        v = s[a] - s[b]
+        s[r] = v if INT_MIN <= v <= INT_MAX else wrap(v)
+        return pc
+
+    def mul(pc, a, b, r):
+        v = s[a] * s[b]
+        s[r] = v if INT_MIN <= v <= INT_MAX else wrap(v)
+        return pc
+
+    def div(pc, a, b, r):
+        x = s[a]
+        y = s[b]
+        if y == 0:
+            raise Exception("Division by zero")
+        q = abs(x) // abs(y)
+        s[r] = wrap(q if (x < 0) == (y < 0) else -q)
+        return pc
+
+    def jmp(pc, a, b, r):
+        return r
+
+    def jif(pc, a, b, r):
+        return r if s[a] else pc
+
+    def jfalse(pc, a, b, r):
+        return pc if s[a] else r
+
+    def jlt(pc, a, b, r):
+        return r if s[a] < s[b] else pc
+
+    def jle(pc, a, b, r):
+        return r if s[a] <= s[b] else pc
+
+    def jgt(pc, a, b, r):
+        return r if s[a] > s[b] else pc
+
+    def jge(pc, a, b, r):
+        return r if s[a] >= s[b] else pc
+
+    def jeq(pc, a, b, r):
+        return r if s[a] == s[b] else pc
+
+    def jne(pc, a, b, r):
+        return r if s[a] != s[b] else pc
+
+    def print_int(pc, a, b, r):
+        write(f"{s[a]}\n")
+        return pc
+
+    def print_string(pc, a, b, r):
+        write(f"{a}\n")
+        return pc
+
+    def slt(pc, a, b, r):
+        s[r] = 1 if s[a] < s[b] else 0
+        return pc
+
+    def sle(pc, a, b, r):
+        s[r] = 1 if s[a] <= s[b] else 0
+        return pc
+
+    def sgt(pc, a, b, r):
+        s[r] = 1 if s[a] > s[b] else 0
+        return pc
+
+    def sge(pc, a, b, r):
+        s[r] = 1 if s[a] >= s[b] else 0
+        return pc
+
+    def seq(pc, a, b, r):
+        s[r] = 1 if s[a] == s[b] else 0
+        return pc
+
+    def sne(pc, a, b, r):
+        s[r] = 1 if s[a] != s[b] else 0
+        return pc
+
+    functions = locals()
+    table = [None] * (max(op.value for op in OpCode) + 1)
+    for op, name in HANDLERS.items():
+        table[op.value] = functions[name]
+    return table
+
+
+# Handler in dispatch_table() for each opcode the interpreter runs.
+HANDLERS = {
+    OpCode.CONST: "copy",
+    OpCode.LOAD: "copy",
+    OpCode.STORE: "copy",
+    OpCode.ADD: "add",
+    OpCode.SUB: "sub",
+    OpCode.MUL: "mul",
+    OpCode.DIV: "div",
+    OpCode.JMP: "jmp",
+    OpCode.JIF: "jif",
+    OpCode.JFALSE: "jfalse",
+    OpCode.JLT: "jlt",
+    OpCode.JLE: "jle",
+    OpCode.JGT: "jgt",
+    OpCode.JGE: "jge",
+    OpCode.JEQ: "jeq",
+    OpCode.JNE: "jne",
+    OpCode.PRINT: "print_int",
+    OpCode.PRINTS: "print_string",
+    OpCode.SLT: "slt",
+    OpCode.SLE: "sle",
+    OpCode.SGT: "sgt",
+    OpCode.SGE: "sge",
+    OpCode.SEQ: "seq",
+    OpCode.SNE: "sne",
+}
+
+
+def interpret(ir_program, max_steps=None):
+    # The output of running `ir_program`; see Interpreter.
+    return Interpreter(ir_program, max_steps).run()
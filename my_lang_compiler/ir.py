@@ -20,6 +20,82 @@ class OpCode(Enum):
     SGT = auto()        # Set Greater Than
     SGE = auto()        # Set Greater Equal
     SNE = auto()        # Set Not Equal
+    PHI = auto()        # SSA only: result = arg1[i] when entered from the block's i-th predecessor; arg2 is the renamed name
+    JLT = auto()        # if arg1 < arg2 goto result (label)
+    JLE = auto()        # if arg1 <= arg2 goto result
+    JGT = auto()        # if arg1 > arg2 goto result
+    JGE = auto()        # if arg1 >= arg2 goto result
+    JEQ = auto()        # if arg1 == arg2 goto result
+    JNE = auto()        # if arg1 != arg2 goto result
+
+# The compare each fused conditional jump tests.
+JUMP_COMPARES = {
+    OpCode.JLT: OpCode.SLT,
+    OpCode.JLE: OpCode.SLE,
+    OpCode.JGT: OpCode.SGT,
+    OpCode.JGE: OpCode.SGE,
+    OpCode.JEQ: OpCode.SEQ,
+    OpCode.JNE: OpCode.SNE,
+}
+
+class Variable:
+    # A resolved source variable: `slot` is its index in the analyzer's
+    # variable table, `name` the C local it is emitted as.
+    __slots__ = ('slot', 'name', 'type')
+
+    def __init__(self, slot, name, type_):
+        self.slot = slot
+        self.name = name
+        self.type = type_
+
+    def __repr__(self):
+        return self.name
+
+class Version:
+    # SSA name: definition `index` of `base` (a Variable or temp name).
+    # Index 0 is the value on entry to the program.
+    __slots__ = ('base', 'index')
+
+    def __init__(self, base, index):
+        self.base = base
+        self.index = index
+
+    def __repr__(self):
+        return f"{self.base}.{self.index}"
+
+INT_BITS = 32
+
+def wrap_int(value):
+    # Folded values wrap like the generated C's 32-bit ints.
+    return (value + (1 << (INT_BITS - 1))) % (1 << INT_BITS) - (1 << (INT_BITS - 1))
+
+def evaluate(op, a, b):
+    # Value of a binary opcode on constants with C semantics (truncating
+    # division), or None if it can't be folded.
+    if op == OpCode.ADD:
+        return wrap_int(a + b)
+    if op == OpCode.SUB:
+        return wrap_int(a - b)
+    if op == OpCode.MUL:
+        return wrap_int(a * b)
+    if op == OpCode.DIV:
+        if b == 0:
+            return None
+        quotient = abs(a) // abs(b)
+        return wrap_int(quotient if (a < 0) == (b < 0) else -quotient)
+    if op == OpCode.SLT:
+        return int(a < b)
+    if op == OpCode.SLE:
+        return int(a <= b)
+    if op == OpCode.SGT:
+        return int(a > b)
+    if op == OpCode.SGE:
+        return int(a >= b)
+    if op == OpCode.SEQ:
+        return int(a == b)
+    if op == OpCode.SNE:
+        return int(a != b)
+    return None
 
 class Quadruple:
     def __init__(self, op, arg1=None, arg2=None, result=None):
@@ -40,11 +116,43 @@ class Quadruple:
         return f"{op_name:6} {arg1_str:10} {arg2_str:10} -> {res_str}"
 
 class IRProgram:
+    # Analyses (see analysis()) are cached on the program and dropped whenever
+    # it changes. add() and assigning `instructions` count as changes; a pass
+    # that edits instructions in place must call changed() itself.
     def __init__(self):
-        self.instructions = []
+        self._instructions = []
+        self._analyses = {}
+        self.version = 0
+
+    @property
+    def instructions(self):
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, instructions):
+        self._instructions = instructions
+        self.changed()
 
     def add(self, quad):
-        self.instructions.append(quad)
-    
+        self._instructions.append(quad)
+        if self._analyses:
+            self._analyses.clear()
+        self.version += 1
+
+    def changed(self):
+        self._analyses.clear()
+        self.version += 1
+
+    def analysis(self, key, compute):
+        result = self._analyses.get(key)
+        if result is None:
+            result = self._analyses[key] = compute(self)
+        return result
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_analyses'] = {}
+        return state
+
     def __repr__(self):
         return "\n".join(str(instr) for instr in self.instructions)
@@ -1,9 +1,35 @@
+import re
+
 from .ast_nodes import Program, Block, VarDecl, Assignment, BinaryOp, UnaryOp, Num, String, Bool, Var, If, While, Print, NoOp
 from .ir import OpCode, Quadruple, IRProgram
 from .tokens import TokenType
-
-class IRGenerator:
-    def __init__(self):
+from .visitor import NodeVisitor
+
+BINARY_OPCODES = {
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUB,
+    TokenType.MUL: OpCode.MUL,
+    TokenType.DIV: OpCode.DIV,
+    TokenType.EQ: OpCode.SEQ,
+    TokenType.NE: OpCode.SNE,
+    TokenType.LT: OpCode.SLT,
+    TokenType.LE: OpCode.SLE,
+    TokenType.GT: OpCode.SGT,
+    TokenType.GE: OpCode.SGE,
+}
+# Operand nodes whose visit_* returns a temp directly.
+LEAF_OPERANDS = (Num, Bool, Var)
+# Names fresh_temp() and fresh_label() make (t1, L1), or those of
+# incremental.StatementIRGenerator (t1_1, L1_1), behind any number of "v_".
+# The temps share main()'s scope with the program's variables in the C, so the
+# SemanticAnalyzer prefixes variables named like this with another "v_".
+RESERVED_NAME = re.compile(r"(?:v_)*[tL][0-9]+(?:_[0-9]+)?")
+
+class IRGenerator(NodeVisitor):
+    # `variables` is the slot table of the SemanticAnalyzer that resolved the
+    # tree; variable operands are its Variable objects.
+    def __init__(self, variables):
+        self.variables = variables
         self.program = IRProgram()
         self.temp_counter = 0
         self.label_counter = 0
@@ -16,53 +42,45 @@ class IRGenerator:
         self.label_counter += 1
         return f"L{self.label_counter}"
 
-    def visit(self, node):
-        method_name = f'visit_{type(node).__name__}'
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
-
-    def generic_visit(self, node):
-        raise Exception(f'No visit_{type(node).__name__} method')
-
     def visit_Program(self, node):
         for stmt in node.statements:
-            self.visit(stmt)
+            yield stmt
         return self.program
 
     def visit_Block(self, node):
         for stmt in node.statements:
-            self.visit(stmt)
+            yield stmt
 
     def visit_VarDecl(self, node):
         if node.initializer:
             # Generate code for initializer expr
-            result_temp = self.visit(node.initializer)
+            result_temp = yield node.initializer
             # Store result in variable
-            self.program.add(Quadruple(OpCode.STORE, arg1=result_temp, result=node.var_name.value))
+            self.program.add(Quadruple(OpCode.STORE, arg1=result_temp, result=self.variables[node.var_name.slot]))
 
     def visit_Assignment(self, node):
-        result_temp = self.visit(node.right)
-        self.program.add(Quadruple(OpCode.STORE, arg1=result_temp, result=node.left.value))
+        result_temp = yield node.right
+        self.program.add(Quadruple(OpCode.STORE, arg1=result_temp, result=self.variables[node.left.slot]))
 
     def visit_BinaryOp(self, node):
-        left_temp = self.visit(node.left)
-        right_temp = self.visit(node.right)
+        left = node.left
+        right = node.right
+        if type(left) in LEAF_OPERANDS and type(right) in LEAF_OPERANDS:
+            # Both operands are variables or literals: no generator frame
+            # is needed to wait for them.
+            dispatch = self.dispatch_table()
+            return self.binary(node, dispatch[type(left)](self, left), dispatch[type(right)](self, right))
+        return self.nested_binary(node)
+
+    def nested_binary(self, node):
+        left_temp = yield node.left
+        right_temp = yield node.right
+        return self.binary(node, left_temp, right_temp)
+
+    def binary(self, node, left_temp, right_temp):
         result_temp = self.fresh_temp()
-        
-        op_map = {
-            TokenType.PLUS: OpCode.ADD,
-            TokenType.MINUS: OpCode.SUB,
-            TokenType.MUL: OpCode.MUL,
-            TokenType.DIV: OpCode.DIV,
-            TokenType.EQ: OpCode.SEQ,
-            TokenType.NE: OpCode.SNE,
-            TokenType.LT: OpCode.SLT,
-            TokenType.LE: OpCode.SLE,
-            TokenType.GT: OpCode.SGT,
-            TokenType.GE: OpCode.SGE,
-        }
-        
-        op_code = op_map.get(node.op.type)
+
+        op_code = BINARY_OPCODES.get(node.op.type)
         if op_code:
             self.program.add(Quadruple(op_code, arg1=left_temp, arg2=right_temp, result=result_temp))
         else:
@@ -71,7 +89,7 @@ class IRGenerator:
         return result_temp
 
     def visit_UnaryOp(self, node):
-        expr_temp = self.visit(node.expr)
+        expr_temp = yield node.expr
         result_temp = self.fresh_temp()
         
         if node.op.type == TokenType.MINUS:
@@ -99,12 +117,20 @@ class IRGenerator:
 
     def visit_Var(self, node):
         temp = self.fresh_temp()
-        self.program.add(Quadruple(OpCode.LOAD, arg1=node.value, result=temp))
+        self.program.add(Quadruple(OpCode.LOAD, arg1=self.variables[node.slot], result=temp))
         return temp
 
     def visit_If(self, node):
-        condition_temp = self.visit(node.condition)
-        
+        condition_temp = yield node.condition
+
+        if not node.else_branch:
+            # If false, skip the then block
+            end_label = self.fresh_label()
+            self.program.add(Quadruple(OpCode.JFALSE, arg1=condition_temp, result=end_label))
+            yield node.then_branch
+            self.program.add(Quadruple(OpCode.LABEL, result=end_label))
+            return
+
         else_label = self.fresh_label()
         end_label = self.fresh_label()
         
@@ -112,13 +138,12 @@ class IRGenerator:
         self.program.add(Quadruple(OpCode.JFALSE, arg1=condition_temp, result=else_label))
         
         # Then block
-        self.visit(node.then_branch)
+        yield node.then_branch
         self.program.add(Quadruple(OpCode.JMP, result=end_label))
         
         # Else block
         self.program.add(Quadruple(OpCode.LABEL, result=else_label))
-        if node.else_branch:
-            self.visit(node.else_branch)
+        yield node.else_branch
             
         self.program.add(Quadruple(OpCode.LABEL, result=end_label))
 
@@ -128,10 +153,10 @@ class IRGenerator:
         
         self.program.add(Quadruple(OpCode.LABEL, result=start_label))
         
-        condition_temp = self.visit(node.condition)
+        condition_temp = yield node.condition
         self.program.add(Quadruple(OpCode.JFALSE, arg1=condition_temp, result=end_label))
-        
-        self.visit(node.body)
+
+        yield node.body
         self.program.add(Quadruple(OpCode.JMP, result=start_label))
         
         self.program.add(Quadruple(OpCode.LABEL, result=end_label))
@@ -140,7 +165,7 @@ class IRGenerator:
         if isinstance(node.expr, String):
             self.program.add(Quadruple(OpCode.PRINTS, arg1=node.expr.value))
         else:
-            expr_temp = self.visit(node.expr)
+            expr_temp = yield node.expr
             self.program.add(Quadruple(OpCode.PRINT, arg1=expr_temp))
 
     def visit_NoOp(self, node):
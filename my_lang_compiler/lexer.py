@@ -183,11 +183,12 @@ class Lexer:
 
         return Token(TokenType.EOF, None, self.line, self.column)
 
-    def tokenize(self):
-        tokens = []
+    def __iter__(self):
         while True:
             token = self.get_next_token()
-            tokens.append(token)
+            yield token
             if token.type == TokenType.EOF:
                 break
-        return tokens
+
+    def tokenize(self):
+        return list(self)
@@ -0,0 +1,107 @@
+from .cfg import ControlFlowGraph
+from .ssa import LABEL_OPS, LITERAL_OPS
+
+
+def uses(instr):
+    # Names an instruction reads; integer operands are literals.
+    if instr.op in LITERAL_OPS:
+        operands = (instr.arg2,)
+    else:
+        operands = (instr.arg1, instr.arg2)
+    return [operand for operand in operands if operand is not None and type(operand) is not int]
+
+
+def definition(instr):
+    # Name an instruction writes, or None.
+    if instr.op in LABEL_OPS:
+        return None
+    return instr.result
+
+
+class Liveness:
+    # Live names on entry to and exit from every block of an IRProgram, as int
+    # bitsets: bit `index[name]` is set in live_in[b] if `name` may be read
+    # before being written on some path from the start of block b.
+    #
+    # Only names read in some block before being written there get a bit.
+    # The rest (most temps) never live across blocks, so passes track them
+    # with a plain set while scanning a block.
+    #
+    # Build it through Liveness.of(program), which caches it on the program
+    # until the program changes.
+    def __init__(self, program):
+        cfg = ControlFlowGraph.of(program)
+        self.cfg = cfg
+        instructions = program.instructions
+
+        exposed = []
+        killed = []
+        for block in range(len(cfg)):
+            gen = set()
+            kill = set()
+            for instr in reversed(instructions[cfg.starts[block]:cfg.ends[block]]):
+                result = definition(instr)
+                if result is not None:
+                    kill.add(result)
+                    gen.discard(result)
+                gen.update(uses(instr))
+            exposed.append(gen)
+            killed.append(kill)
+
+        index = {}
+        names = []
+        for gen in exposed:
+            for name in gen:
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+        self.index = index
+        self.names = names
+
+        gen_bits = [self.encode(gen) for gen in exposed]
+        kill_bits = [self.encode(name for name in kill if name in index) for kill in killed]
+
+        count = len(cfg)
+        live_in = [0] * count
+        live_out = [0] * count
+        succs = cfg.succs
+        preds = cfg.preds
+        # Backward problem: seed the worklist so blocks are popped last to
+        # first, and revisit a block's predecessors when its live_in grows.
+        worklist = list(range(count))
+        queued = [True] * count
+        while worklist:
+            block = worklist.pop()
+            queued[block] = False
+            out = 0
+            for succ in succs[block]:
+                out |= live_in[succ]
+            live_out[block] = out
+            new = gen_bits[block] | (out & ~kill_bits[block])
+            if new != live_in[block]:
+                live_in[block] = new
+                for pred in preds[block]:
+                    if not queued[pred]:
+                        queued[pred] = True
+                        worklist.append(pred)
+        self.live_in = live_in
+        self.live_out = live_out
+
+    @classmethod
+    def of(cls, program):
+        return program.analysis(cls, cls)
+
+    def encode(self, names):
+        index = self.index
+        bits = 0
+        for name in names:
+            bits |= 1 << index[name]
+        return bits
+
+    def decode(self, bits):
+        names = []
+        while bits:
+            lowest = bits & -bits
+            names.append(self.names[lowest.bit_length() - 1])
+            bits ^= lowest
+        return names
@@ -0,0 +1,331 @@
+from .ir import OpCode, Quadruple, IRProgram, Variable, wrap_int
+from .cfg import ControlFlowGraph, BRANCH_OPS
+from .ssa import LITERAL_OPS
+from .liveness import uses, definition
+
+# Instructions safe to run in the preheader even when the loop body would
+# not have run. DIV only qualifies with a literal divisor that can't trap.
+PURE_OPS = (
+    OpCode.CONST, OpCode.LOAD, OpCode.ADD, OpCode.SUB, OpCode.MUL,
+    OpCode.SLT, OpCode.SLE, OpCode.SGT, OpCode.SGE, OpCode.SEQ, OpCode.SNE,
+)
+COPY_OPS = (OpCode.LOAD, OpCode.STORE)
+
+
+def _step(instr, name):
+    # The literal `instr` adds to `name` if it computes name + c, c + name or
+    # name - c, else None.
+    op = instr.op
+    if op == OpCode.ADD:
+        if instr.arg1 == name and type(instr.arg2) is int:
+            return instr.arg2
+        if instr.arg2 == name and type(instr.arg1) is int:
+            return instr.arg1
+    elif op == OpCode.SUB:
+        if instr.arg1 == name and type(instr.arg2) is int:
+            return -instr.arg2
+    return None
+
+
+class LoopOptimizer:
+    # Optimizes the natural loops of the program (see ControlFlowGraph.loops):
+    #
+    # - Induction variables: a name assigned exactly once in a loop, to
+    #   itself plus or minus a literal (`ADD i 1 -> t; STORE t -> i`).
+    # - Strength reduction: a multiplication by a literal of an expression
+    #   linear in an induction variable, such as `(i + n) * 3`, becomes a copy
+    #   of a new temp. The temp is set up in the loop's preheader and stepped
+    #   by an ADD right after the induction variable's update.
+    # - Invariant code motion: pure instructions whose operands don't change
+    #   in a loop move to its preheader, out of as many enclosing loops as
+    #   they are invariant in. Only results with a single definition move.
+    #
+    # A preheader is a block inserted before the loop header that every
+    # entry into the loop, but no back edge, goes through. Loops whose
+    # header is fallen into from inside the loop get none and are left alone.
+    # The instructions made dead are left for DeadCodeEliminator.
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.induction_variables = 0
+        self.reduced = 0
+        self.hoisted = 0
+
+    def optimize(self):
+        program = self.ir
+        cfg = ControlFlowGraph.of(program)
+        instructions = program.instructions
+        loops = [loop for loop in cfg.loops() if self._has_preheader_slot(cfg, instructions, loop)]
+        if not loops:
+            return program
+
+        self._collect_names(instructions)
+        bodies = [instructions[cfg.starts[block]:cfg.ends[block]] for block in range(len(cfg))]
+        preheaders = {loop: [] for loop in loops}
+        self._reduce_strength(cfg, loops, bodies, preheaders)
+        self._hoist(cfg, loops, bodies, preheaders)
+        return self._assemble(cfg, loops, bodies, preheaders)
+
+    def _has_preheader_slot(self, cfg, instructions, loop):
+        # The preheader goes right before the header, so the block above the
+        # header must not fall into it from inside the loop.
+        above = loop.header - 1
+        if above < 0 or above not in loop.blocks:
+            return True
+        return instructions[cfg.ends[above] - 1].op == OpCode.JMP
+
+    def _collect_names(self, instructions):
+        # Names new temps and labels must not clash with, as emitted in C.
+        taken = set()
+        for instr in instructions:
+            operands = (instr.arg2, instr.result) if instr.op in LITERAL_OPS else (instr.arg1, instr.arg2, instr.result)
+            for operand in operands:
+                taken.add(operand.name if type(operand) is Variable else operand)
+        self.taken = taken
+        self.counter = 0
+
+    def _fresh(self, prefix):
+        while True:
+            self.counter += 1
+            name = f"{prefix}{self.counter}"
+            if name not in self.taken:
+                self.taken.add(name)
+                return name
+
+    def _induction_variables(self, loop, bodies):
+        # name -> (defining instruction, step) for the loop's induction
+        # variables.
+        sites = {}
+        for block in loop.blocks:
+            body = bodies[block]
+            for position, instr in enumerate(body):
+                name = definition(instr)
+                if name is None:
+                    continue
+                if name in sites:
+                    sites[name] = None
+                else:
+                    sites[name] = (body, position)
+
+        found = {}
+        for name, site in sites.items():
+            if site is None:
+                continue
+            body, position = site
+            instr = body[position]
+            step = _step(instr, name)
+            if step is None and instr.op in COPY_OPS:
+                # `STORE t -> i` after `ADD i c -> t` in the same block.
+                for earlier in reversed(body[:position]):
+                    if definition(earlier) == instr.arg1:
+                        step = _step(earlier, name)
+                        break
+            if step:
+                found[name] = (instr, step)
+        return found
+
+    def _reduce_strength(self, cfg, loops, bodies, preheaders):
+        induction = {loop: self._induction_variables(loop, bodies) for loop in loops}
+        for variables in induction.values():
+            self.induction_variables += len(variables)
+        eligible = set(loops)
+
+        # Induction variables in scope in each loop, of the innermost loop
+        # defining them: name -> (loop, update, step).
+        scopes = {None: {}}
+
+        def scope(loop):
+            variables = scopes.get(loop)
+            if variables is None:
+                variables = scope(loop.parent)
+                if loop in eligible:
+                    variables = dict(variables)
+                    for name, (update, step) in induction[loop].items():
+                        variables[name] = (loop, update, step)
+                scopes[loop] = variables
+            return variables
+
+        reduced = {}
+        steps = {}
+        for block in sorted(set().union(*(loop.blocks for loop in loops))):
+            variables = scope(cfg.innermost_loop[block])
+            if not variables:
+                continue
+
+            # linear[x] = ((i, scale, offset), generation): x == scale * i +
+            # offset while i's generation, bumped when i is assigned, matches.
+            linear = {}
+            generations = {}
+
+            def affine(operand):
+                entry = linear.get(operand)
+                if entry is not None:
+                    entry, generation = entry
+                    if generation == generations.get(entry[0], 0):
+                        return entry
+                    return None
+                if operand in variables:
+                    return (operand, 1, 0)
+                return None
+
+            body = bodies[block]
+            rewritten = []
+            for instr in body:
+                op = instr.op
+                arg1 = instr.arg1
+                arg2 = instr.arg2
+                entry = None
+                if op == OpCode.ADD or op == OpCode.SUB or op == OpCode.MUL:
+                    left = None if type(arg1) is int else affine(arg1)
+                    right = None if type(arg2) is int else affine(arg2)
+                    if left is not None and type(arg2) is int:
+                        name, scale, offset = left
+                        if op == OpCode.ADD:
+                            entry = (name, scale, wrap_int(offset + arg2))
+                        elif op == OpCode.SUB:
+                            entry = (name, scale, wrap_int(offset - arg2))
+                        else:
+                            entry = (name, wrap_int(scale * arg2), wrap_int(offset * arg2))
+                    elif right is not None and type(arg1) is int:
+                        name, scale, offset = right
+                        if op == OpCode.ADD:
+                            entry = (name, scale, wrap_int(arg1 + offset))
+                        elif op == OpCode.SUB:
+                            entry = (name, wrap_int(-scale), wrap_int(arg1 - offset))
+                        else:
+                            entry = (name, wrap_int(arg1 * scale), wrap_int(arg1 * offset))
+                elif op in COPY_OPS and type(arg1) is not int:
+                    entry = affine(arg1)
+
+                if op == OpCode.MUL and entry is not None and entry[1] != 0:
+                    name, scale, offset = entry
+                    loop, update, step = variables[name]
+                    key = (loop, name, scale, offset)
+                    temp = reduced.get(key)
+                    if temp is None:
+                        temp = reduced[key] = self._fresh("t")
+                        preheader = preheaders[loop]
+                        if scale == 1:
+                            preheader.append(Quadruple(OpCode.LOAD, arg1=name, result=temp))
+                        else:
+                            preheader.append(Quadruple(OpCode.MUL, arg1=name, arg2=scale, result=temp))
+                        if offset:
+                            preheader.append(Quadruple(OpCode.ADD, arg1=temp, arg2=offset, result=temp))
+                        steps.setdefault(update, []).append(
+                            Quadruple(OpCode.ADD, arg1=temp, arg2=wrap_int(scale * step), result=temp))
+                    instr = Quadruple(OpCode.LOAD, arg1=temp, result=instr.result)
+                    self.reduced += 1
+                rewritten.append(instr)
+
+                result = definition(instr)
+                if result is None:
+                    continue
+                if result in variables:
+                    # Expressions in the old value no longer hold.
+                    generations[result] = generations.get(result, 0) + 1
+                    linear.pop(result, None)
+                elif entry is not None and type(result) is not Variable:
+                    linear[result] = (entry, generations.get(entry[0], 0))
+                else:
+                    linear.pop(result, None)
+            bodies[block] = rewritten
+
+        if steps:
+            for block in range(len(bodies)):
+                body = bodies[block]
+                if any(instr in steps for instr in body):
+                    stepped = []
+                    for instr in body:
+                        stepped.append(instr)
+                        stepped.extend(steps.get(instr, ()))
+                    bodies[block] = stepped
+
+    def _hoist(self, cfg, loops, bodies, preheaders):
+        def_blocks = {}
+        for block, body in enumerate(bodies):
+            for instr in body:
+                name = definition(instr)
+                if name is not None:
+                    def_blocks.setdefault(name, []).append(block)
+        for preheader in preheaders.values():
+            for instr in preheader:
+                # Preheaders belong to no block yet; -1 counts the definition
+                # without placing it in any loop.
+                def_blocks.setdefault(instr.result, []).append(-1)
+        eligible = set(loops)
+        # target[t]: the outermost loop the single definition of t left.
+        target = {}
+
+        def invariant(operand, loop):
+            moved = target.get(operand)
+            if moved is not None:
+                return loop.header in moved.blocks
+            blocks = loop.blocks
+            return not any(block in blocks for block in def_blocks.get(operand, ()))
+
+        for block in cfg.reverse_postorder():
+            innermost = cfg.innermost_loop[block]
+            if innermost is None:
+                continue
+            kept = []
+            for instr in bodies[block]:
+                op = instr.op
+                destination = None
+                result = instr.result
+                if (op in PURE_OPS or (op == OpCode.DIV and type(instr.arg2) is int and instr.arg2 not in (0, -1))) \
+                        and type(result) is not Variable and len(def_blocks[result]) == 1:
+                    operands = uses(instr)
+                    loop = innermost
+                    while loop is not None and all(invariant(operand, loop) for operand in operands):
+                        if loop in eligible:
+                            destination = loop
+                        loop = loop.parent
+                if destination is None:
+                    kept.append(instr)
+                else:
+                    target[result] = destination
+                    preheaders[destination].append(instr)
+                    self.hoisted += 1
+            bodies[block] = kept
+
+    def _assemble(self, cfg, loops, bodies, preheaders):
+        # Entries into a loop that jump to its header are sent to the
+        # preheader's label instead; the ones falling into it already pass
+        # through the preheader.
+        entries = {}
+        redirect = [None] * len(cfg)
+        for loop in loops:
+            preheader = preheaders[loop]
+            if not preheader:
+                continue
+            header = loop.header
+            labels = set()
+            for instr in bodies[header]:
+                if instr.op != OpCode.LABEL:
+                    break
+                labels.add(instr.result)
+            label = None
+            for pred in cfg.preds[header]:
+                if pred in loop.blocks:
+                    continue
+                body = bodies[pred]
+                if body and body[-1].op in BRANCH_OPS and body[-1].result in labels:
+                    if label is None:
+                        label = self._fresh("L")
+                        preheader.insert(0, Quadruple(OpCode.LABEL, result=label))
+                    redirect[pred] = label
+            entries[header] = preheader
+
+        result = []
+        for block, body in enumerate(bodies):
+            preheader = entries.get(block)
+            if preheader is not None:
+                result.extend(preheader)
+            label = redirect[block]
+            if label is not None:
+                last = body[-1]
+                body = body[:-1] + [Quadruple(last.op, last.arg1, last.arg2, label)]
+            result.extend(body)
+
+        optimized = IRProgram()
+        optimized.instructions = result
+        return optimized
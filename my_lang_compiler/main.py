@@ -1,78 +1,151 @@
 ﻿import argparse
-import re
+import os
 import sys
-from importlib.metadata import PackageNotFoundError, version
+import time
 from pathlib import Path
-from .lexer import Lexer
-from .parser import Parser
-from .semantic_analyzer import SemanticAnalyzer
-from .ir_generator import IRGenerator
-from .optimizer import Optimizer
-from .codegen import CodeGenerator
+from .scanner import DEFAULT_CHUNK_SIZE, Scanner
+from .pipeline import translate, execute, compile_python, cache_settings, ENGINES
+from .python_backend import ProgramCache
+from .batch import compile_path, compile_many, format_report, format_stages
+from .native import DEFAULT_CFLAGS, Toolchain, describe_status
+from .cache import CACHE_DIR_VARIABLE, CompileCache, default_cache_dir
+from .passes import DEFAULT_LEVEL, LEVELS
+from .version import cli_version
 
 
-def cli_version():
-    try:
-        return version("my-lang-compiler")
-    except PackageNotFoundError:
-        pyproject_path = Path(__file__).resolve().parent.parent / "pyproject.toml"
-        try:
-            pyproject_text = pyproject_path.read_text(encoding="utf-8")
-        except OSError:
-            return "unknown"
-
-        match = re.search(r'^version\s*=\s*"([^"]+)"', pyproject_text, flags=re.MULTILINE)
-        if match:
-            return match.group(1)
-        return "unknown"
+def compile_source(source_code, verbose=True, cache=None, opt_level=DEFAULT_LEVEL, max_locals=None):
+    # With a CompileCache, unchanged sources are served from disk; entries
+    # are kept apart per optimization level and locals limit.
+    if cache is None:
+        return compile_tokens(Scanner(source_code), verbose=verbose, opt_level=opt_level, max_locals=max_locals)
+    c_code, hit = cache.compile(
+        source_code,
+        lambda artifacts: compile_tokens(
+            Scanner(source_code), verbose=verbose, artifacts=artifacts, opt_level=opt_level, max_locals=max_locals
+        ),
+        settings=cache_settings(opt_level, max_locals),
+    )
+    if hit and verbose:
+        print("Using cached output")
+    return c_code
 
 
-def compile_source(source_code, verbose=True):
+def compile_file(path, verbose=True, use_mmap=False, chunk_size=DEFAULT_CHUNK_SIZE, opt_level=DEFAULT_LEVEL, max_locals=None):
+    # Streams the file through the scanner instead of reading it up front.
+    lexer = Scanner.from_file(path, chunk_size=chunk_size, use_mmap=use_mmap)
     try:
-        if verbose:
-            print("1. Lexical Analysis...")
-        lexer = Lexer(source_code)
-
-        if verbose:
-            print("2. Parsing...")
-        parser = Parser(lexer)
-        ast = parser.parse()
+        return compile_tokens(lexer, verbose=verbose, opt_level=opt_level, max_locals=max_locals)
+    finally:
+        lexer.close()
 
-        if verbose:
-            print("3. Semantic Analysis...")
-        semantic_analyzer = SemanticAnalyzer()
-        semantic_analyzer.visit(ast)
 
-        if verbose:
-            print("4. IR Generation...")
-        ir_generator = IRGenerator()
-        ir_program = ir_generator.visit(ast)
+def compile_tokens(lexer, verbose=True, artifacts=None, opt_level=DEFAULT_LEVEL, max_locals=None):
+    try:
+        return translate(lexer, verbose=verbose, artifacts=artifacts, opt_level=opt_level, max_locals=max_locals)
+    except Exception as e:
+        print(f"Compilation Error: {e}")
+        return None
 
-        if verbose:
-            print("Original IR:")
-            print(ir_program)
 
-        if verbose:
-            print("5. Optimization...")
-        optimizer = Optimizer(ir_program)
-        optimized_ir = optimizer.optimize()
+# Python programs compiled by run_source(), by source hash.
+python_programs = ProgramCache()
 
-        if verbose:
-            print("Optimized IR:")
-            print(optimized_ir)
 
-        if verbose:
-            print("6. Code Generation...")
-        codegen = CodeGenerator(optimized_ir)
-        c_code = codegen.generate()
+def run_source(source_code, verbose=False, opt_level=DEFAULT_LEVEL, max_locals=None, max_steps=None, engine=None,
+               programs=None):
+    # Runs the program in-process instead of compiling it to C and returns
+    # what it printed, or None after a compilation or runtime error. The
+    # bytecode VM runs it unless `max_steps` or engine="ir" ask for the IR
+    # interpreter. With engine="python" the compiled function is kept in
+    # `programs` (a ProgramCache, default python_programs), so running the
+    # same source again skips compilation.
+    if engine == "python":
+        if programs is None:
+            programs = python_programs
+        try:
+            program = programs.get(source_code, lambda: compile_python(Scanner(source_code), verbose))
+            return program.run()
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+    return run_tokens(Scanner(source_code), verbose=verbose, opt_level=opt_level, max_locals=max_locals, max_steps=max_steps,
+                      engine=engine)
 
-        return c_code
 
+def run_tokens(lexer, verbose=False, opt_level=DEFAULT_LEVEL, max_locals=None, max_steps=None, engine=None):
+    if engine is None:
+        engine = "bytecode" if max_steps is None else "ir"
+    try:
+        return execute(lexer, verbose=verbose, opt_level=opt_level, max_locals=max_locals, max_steps=max_steps, engine=engine)
     except Exception as e:
-        print(f"Compilation Error: {e}")
+        print(f"Error: {e}")
         return None
 
 
+def compile_batch(sources, output_dir, jobs=None, cache=None, opt_level=DEFAULT_LEVEL, max_locals=None, toolchain=None,
+                  build=False, run=False):
+    # With `run`, each program's output is written next to its C file, with
+    # the suffix .out.
+    start = time.perf_counter()
+    try:
+        results = compile_many(sources, jobs=jobs, output_dir=output_dir, cache=cache, opt_level=opt_level,
+                               max_locals=max_locals, toolchain=toolchain, build=build, run=run)
+    except ValueError as exc:
+        print(f"Error: {exc}")
+        return 1
+    for result in results:
+        if result.stdout is not None:
+            output = Path(result.output).with_suffix(".out")
+            try:
+                output.write_text(result.stdout, encoding="utf-8")
+            except OSError as exc:
+                result.error = f"Failed to write output file '{output}': {exc}"
+    print(format_report(results, time.perf_counter() - start))
+    return 0 if all(result.ok and not result.returncode for result in results) else 1
+
+
+def build_file(source, output, cache=None, opt_level=DEFAULT_LEVEL, max_locals=None, toolchain=None, build=True,
+               run=False, timings=False):
+    # The native pipeline for one file: writes the C to `output` (if any),
+    # builds it with `toolchain`, and with `run` runs it and passes its
+    # output through. Returns the program's exit status when it ran.
+    result = compile_path(source, output, cache, opt_level, max_locals, toolchain or Toolchain(), build, run)
+    if timings:
+        print(format_stages(result), file=sys.stderr)
+    if not result.ok:
+        print(result.error)
+        return 1
+    if not run:
+        print(f"Successfully compiled to {result.executable}")
+        return 0
+    sys.stdout.write(result.stdout)
+    sys.stderr.write(result.stderr)
+    if result.returncode:
+        print(f"Program {describe_status(result.returncode)}", file=sys.stderr)
+        return result.returncode if result.returncode > 0 else 1
+    return 0
+
+
+def run_file(source, stream=False, use_mmap=False, opt_level=DEFAULT_LEVEL, max_locals=None, engine=None):
+    try:
+        if stream:
+            lexer = Scanner.from_file(source, use_mmap=use_mmap)
+        else:
+            with open(source, "r", encoding="utf-8") as source_file:
+                lexer = Scanner(source_file.read())
+    except OSError as exc:
+        print(f"Failed to read source file '{source}': {exc}")
+        return 1
+    try:
+        output = run_tokens(lexer, opt_level=opt_level, max_locals=max_locals, engine=engine)
+    finally:
+        lexer.close()
+    if output is None:
+        return 1
+    sys.stdout.write(output)
+    return 0
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(
         prog="my-lang-compiler",
@@ -83,23 +156,157 @@ def main(argv=None):
         action="version",
         version=f"%(prog)s {cli_version()}",
     )
-    parser.add_argument("source", help="Path to source .src file")
+    parser.add_argument(
+        "source",
+        nargs="*",
+        help="Path to source .src file; several files or directories compile as a batch",
+    )
     parser.add_argument(
         "-o",
         "--output",
         default="output.c",
         help="Path to generated C file (default: output.c)",
     )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        help="Batch mode: directory for the generated C files",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Batch mode: number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "-O",
+        dest="opt_level",
+        type=int,
+        choices=sorted(LEVELS),
+        default=DEFAULT_LEVEL,
+        help=f"Optimization level: 0 none, 1 cheap cleanups, 2 all passes once, 3 passes repeated to a fixed point (default: {DEFAULT_LEVEL})",
+    )
+    parser.add_argument(
+        "--max-locals",
+        type=int,
+        help="Declare at most this many C locals for temps; the rest share one array (default: no limit)",
+    )
+    parser.add_argument(
+        "--run",
+        action="store_true",
+        help="Run the program and print its output instead of writing C",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=(*ENGINES, "native"),
+        default=ENGINES[0],
+        help="With --run: execute register bytecode, the IR instructions directly, the program compiled to a Python function, "
+        "or the C code built with the C compiler (default: bytecode)",
+    )
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="Also build an executable from each generated C file, next to it",
+    )
+    parser.add_argument(
+        "--cc",
+        help="C compiler for --build and --engine native (default: $CC, else cc)",
+    )
+    parser.add_argument(
+        "--cflags",
+        default=" ".join(DEFAULT_CFLAGS),
+        help=f"Flags for the C compiler (default: {' '.join(DEFAULT_CFLAGS)})",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="With --build or --engine native: print the frontend, C compiler and run times to stderr",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Lex the source incrementally instead of reading it into memory first",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Like --stream, but read the source through a memory map",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Reuse and store compiler outputs in the compilation cache (also on with --cache-dir or ${CACHE_DIR_VARIABLE})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help=f"Directory of the compilation cache; implies --cache (default: {default_cache_dir()})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the compilation cache, even with --cache-dir or $" + CACHE_DIR_VARIABLE,
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the compilation cache before compiling anything",
+    )
     args = parser.parse_args(argv)
 
-    try:
-        with open(args.source, "r", encoding="utf-8") as source_file:
-            source_code = source_file.read()
-    except OSError as exc:
-        print(f"Failed to read source file '{args.source}': {exc}")
-        return 1
+    # The cache is opt-in, so plain runs leave nothing behind on disk.
+    cache = None
+    if args.clear_cache:
+        CompileCache(args.cache_dir).clear()
+        print(f"Cleared compilation cache {args.cache_dir or default_cache_dir()}")
+        if not args.source:
+            return 0
+    if (args.cache or args.cache_dir or os.environ.get(CACHE_DIR_VARIABLE)) and not args.no_cache:
+        cache = CompileCache(args.cache_dir)
+    if not args.source:
+        parser.error("the following arguments are required: source")
+    if args.max_locals is not None and args.max_locals < 1:
+        parser.error("--max-locals must be at least 1")
+
+    native = args.build or (args.run and args.engine == "native")
+    toolchain = Toolchain(args.cc, args.cflags) if native else None
+    if native and (args.stream or args.mmap):
+        parser.error("--stream and --mmap don't apply to native builds")
+
+    if len(args.source) > 1 or args.output_dir or args.jobs or Path(args.source[0]).is_dir():
+        if args.run and args.engine != "native":
+            parser.error("--run runs a single file, except with --engine native")
+        if args.stream or args.mmap:
+            parser.error("--stream and --mmap compile a single file")
+        return compile_batch(args.source, args.output_dir or ".", args.jobs, cache, args.opt_level, args.max_locals,
+                             toolchain, args.build, args.run)
+
+    source = args.source[0]
+    if native:
+        return build_file(source, args.output if args.build else None, cache, args.opt_level, args.max_locals, toolchain, args.build, args.run,
+                          args.timings)
+    # Running in-process and the streamed compiles don't go through the cache;
+    # one turned on by $MY_LANG_CACHE_DIR is simply not used there.
+    if (args.run or args.stream or args.mmap) and (args.cache or args.cache_dir) and not args.no_cache:
+        parser.error("--cache and --cache-dir don't apply to --run, --stream or --mmap")
+    if args.run:
+        return run_file(source, args.stream or args.mmap, args.mmap, args.opt_level, args.max_locals, args.engine)
+
+    if args.stream or args.mmap:
+        try:
+            c_output = compile_file(source, use_mmap=args.mmap, opt_level=args.opt_level, max_locals=args.max_locals)
+        except OSError as exc:
+            print(f"Failed to read source file '{source}': {exc}")
+            return 1
+    else:
+        try:
+            with open(source, "r", encoding="utf-8") as source_file:
+                source_code = source_file.read()
+        except OSError as exc:
+            print(f"Failed to read source file '{source}': {exc}")
+            return 1
+
+        c_output = compile_source(source_code, cache=cache, opt_level=args.opt_level, max_locals=args.max_locals)
 
-    c_output = compile_source(source_code)
     if c_output is None:
         return 1
 
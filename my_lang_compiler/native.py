@@ -0,0 +1,86 @@
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+# -fwrapv makes int overflow wrap, as the optimization passes assume when
+# they fold constants.
+DEFAULT_CFLAGS = ("-O2", "-fwrapv")
+EXECUTABLE_SUFFIX = ".exe" if os.name == "nt" else ""
+
+
+def default_cc():
+    return os.environ.get("CC") or shutil.which("cc") or "cc"
+
+
+def executable_path(c_path):
+    # Where --build puts the executable for the C file at `c_path`.
+    return str(Path(c_path).with_suffix(EXECUTABLE_SUFFIX))
+
+
+class Toolchain:
+    # A local C compiler and the flags generated C is built with. build()
+    # turns C code into an executable, reusing one from a CompileCache when
+    # the same code was built with the same compiler and flags before; run()
+    # runs an executable and captures its output.
+    def __init__(self, cc=None, cflags=DEFAULT_CFLAGS):
+        self.cc = cc or default_cc()
+        if isinstance(cflags, str):
+            cflags = shlex.split(cflags)
+        self.cflags = tuple(cflags)
+
+    def settings(self):
+        # The part of a CompileCache key that comes from the toolchain.
+        return shlex.join((self.cc, *self.cflags))
+
+    def compile(self, c_code, executable):
+        # Runs the C compiler; raises with its diagnostics if it fails.
+        with tempfile.TemporaryDirectory(prefix="my_lang_") as directory:
+            source = Path(directory) / "program.c"
+            source.write_text(c_code, encoding="utf-8")
+            try:
+                completed = subprocess.run(
+                    [self.cc, *self.cflags, "-o", str(executable), str(source)], capture_output=True, text=True
+                )
+            except OSError as exc:
+                raise Exception(f"Failed to run C compiler '{self.cc}': {exc}")
+        if completed.returncode != 0:
+            raise Exception(f"C compiler failed ({completed.returncode}): {completed.stderr.strip()}")
+
+    def build(self, c_code, executable=None, cache=None):
+        # Returns (path of the executable, whether it came from `cache`).
+        # Without `executable` the executable stays in the cache, so one of
+        # the two is required.
+        if cache is None:
+            if executable is None:
+                raise ValueError("build() needs an executable path or a cache")
+            self._prepare(executable)
+            self.compile(c_code, executable)
+            return str(executable), False
+
+        key = cache.key(c_code, settings=self.settings())
+        cached = cache.get_binary(key)
+        hit = cached is not None
+        if not hit:
+            cached = cache.put_binary(key, lambda path: self.compile(c_code, path))
+        if executable is None:
+            return str(cached), hit
+        self._prepare(executable)
+        shutil.copy2(cached, executable)
+        return str(executable), hit
+
+    def _prepare(self, executable):
+        Path(executable).parent.mkdir(parents=True, exist_ok=True)
+
+    def run(self, executable, timeout=None):
+        # The finished subprocess.CompletedProcess, with stdout and stderr as
+        # text.
+        return subprocess.run([str(Path(executable).resolve())], capture_output=True, text=True, timeout=timeout)
+
+
+def describe_status(returncode):
+    if returncode < 0:
+        return f"killed by signal {-returncode}"
+    return f"exited with status {returncode}"
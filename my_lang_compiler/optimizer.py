@@ -1,4 +1,5 @@
-from .ir import OpCode, Quadruple, IRProgram
+from .ir import OpCode, Quadruple, IRProgram, evaluate
+from .cfg import ControlFlowGraph
 
 class Optimizer:
     def __init__(self, ir_program):
@@ -6,36 +7,40 @@ class Optimizer:
 
     def optimize(self):
         new_ir = IRProgram()
-        # Constants map: temp -> value
+        cfg = ControlFlowGraph.of(self.ir)
+        instructions = self.ir.instructions
+        # Constants map: temp -> (value, defining block). A constant is only
+        # used where its definition dominates the use.
         constants = {}
 
-        for instr in self.ir.instructions:
-            if instr.op == OpCode.CONST:
-                constants[instr.result] = instr.arg1
-                new_ir.add(instr)
-            elif instr.op in (OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV):
-                arg1_val = constants.get(instr.arg1)
-                arg2_val = constants.get(instr.arg2)
+        def constant(operand, block):
+            entry = constants.get(operand)
+            if entry is not None and cfg.dominates(entry[1], block):
+                return entry[0]
+            return None
 
-                if arg1_val is not None and arg2_val is not None:
-                    # Fold constant
-                    res_val = 0
-                    if instr.op == OpCode.ADD:
-                        res_val = arg1_val + arg2_val
-                    elif instr.op == OpCode.SUB:
-                        res_val = arg1_val - arg2_val
-                    elif instr.op == OpCode.MUL:
-                        res_val = arg1_val * arg2_val
-                    elif instr.op == OpCode.DIV:
-                        res_val = arg1_val // arg2_val  # Integer division
-                    
-                    # Replace with CONST
-                    new_instr = Quadruple(OpCode.CONST, arg1=res_val, result=instr.result)
-                    constants[instr.result] = res_val
-                    new_ir.add(new_instr)
+        for block in range(len(cfg)):
+            for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+                if instr.op == OpCode.CONST:
+                    constants[instr.result] = (instr.arg1, block)
+                    new_ir.add(instr)
+                elif instr.op in (OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV):
+                    arg1_val = constant(instr.arg1, block)
+                    arg2_val = constant(instr.arg2, block)
+
+                    # Fold with C semantics; division by zero is left alone
+                    res_val = None
+                    if arg1_val is not None and arg2_val is not None:
+                        res_val = evaluate(instr.op, arg1_val, arg2_val)
+
+                    if res_val is not None:
+                        # Replace with CONST
+                        new_instr = Quadruple(OpCode.CONST, arg1=res_val, result=instr.result)
+                        constants[instr.result] = (res_val, block)
+                        new_ir.add(new_instr)
+                    else:
+                        new_ir.add(instr)
                 else:
                     new_ir.add(instr)
-            else:
-                new_ir.add(instr)
-                
+
         return new_ir
@@ -0,0 +1,207 @@
+from array import array
+
+from .ir import OpCode, Quadruple, IRProgram, Variable, JUMP_COMPARES
+
+OPCODES = [None] + list(OpCode)
+
+# Operand kinds, kept per entry of the operand table.
+TEMP, VARIABLE, LABEL, CONST, STRING = range(5)
+OPERAND_KINDS = ("temp", "variable", "label", "const", "string")
+
+# Instructions whose result is a label rather than a value.
+LABEL_OPS = (OpCode.JMP, OpCode.JIF, OpCode.JFALSE, OpCode.LABEL) + tuple(JUMP_COMPARES)
+
+
+def _kind(operand, label=False, literal=False):
+    if type(operand) is int:
+        return CONST
+    if type(operand) is Variable:
+        return VARIABLE
+    if type(operand) is str:
+        if label:
+            return LABEL
+        if literal:
+            return STRING
+        return TEMP
+    raise ValueError(f"Packed IR cannot hold operand {operand!r}; leave SSA form first")
+
+
+# Operand names that are a prefix and a decimal number, as the generator makes
+# them, are kept as the number alone. Numbers index an array, so larger ones
+# are stored as names.
+NUMBERED_PREFIXES = {TEMP: "t", LABEL: "L"}
+MAX_NUMBER = 1 << 24
+
+
+def _number(name, prefix):
+    if not name.startswith(prefix):
+        return None
+    digits = name[len(prefix):]
+    if not (digits.isascii() and digits.isdigit()) or (digits[0] == "0" and digits != "0"):
+        return None
+    number = int(digits)
+    return number if number < MAX_NUMBER else None
+
+
+# Struct-of-arrays IR storage. One row per instruction in parallel typed
+# arrays:
+#   ops              OpCode value
+#   arg1, arg2, results  operand id (index into the operand table), -1 when
+#                    absent
+# The operand table holds every distinct operand once, in parallel columns:
+#   kinds            TEMP, VARIABLE, LABEL, CONST or STRING, from where the
+#                    operand is used, so a temp "t1" and a string literal "t1"
+#                    get separate entries
+#   numbers          n for a temp named "t<n>" or a label named "L<n>", else -1
+#   values           the operand itself, or None where `numbers` has it
+#
+# A PackedIR stands in for an IRProgram wherever passes and CodeGenerator only
+# read it: `instructions` is the program itself, a sequence that materialises
+# one Quadruple per row on access, and analyses are cached the same way.
+# Passes return regular IRPrograms; pack them again with from_program().
+class PackedIR:
+    def __init__(self):
+        self.ops = array("B")
+        self.arg1 = array("i")
+        self.arg2 = array("i")
+        self.results = array("i")
+        self.kinds = array("B")
+        self.numbers = array("i")
+        self.values = []
+        self._reset_index()
+        self._analyses = {}
+        self.version = 0
+
+    def _reset_index(self):
+        # Operand ids by value for each kind; numbered names are looked up by
+        # number in an array instead.
+        self._value_index = [{} for _ in OPERAND_KINDS]
+        self._numbered_index = {kind: array("i") for kind in NUMBERED_PREFIXES}
+
+    @classmethod
+    def from_program(cls, program):
+        packed = cls()
+        for quad in program.instructions:
+            packed.add(quad)
+        return packed
+
+    def to_program(self):
+        program = IRProgram()
+        program.instructions = list(self)
+        return program
+
+    def _new_operand(self, kind, value, number=-1):
+        self.kinds.append(kind)
+        self.numbers.append(number)
+        self.values.append(value)
+        return len(self.kinds) - 1
+
+    def intern(self, operand, kind):
+        prefix = NUMBERED_PREFIXES.get(kind)
+        if prefix is not None:
+            number = _number(operand, prefix)
+            if number is not None:
+                ids = self._numbered_index[kind]
+                if number >= len(ids):
+                    ids.extend(array("i", [-1]) * (number + 1 - len(ids)))
+                index = ids[number]
+                if index < 0:
+                    index = ids[number] = self._new_operand(kind, None, number)
+                return index
+        # Constants are ints only, so True and 1 can't collide here.
+        ids = self._value_index[kind]
+        index = ids.get(operand)
+        if index is None:
+            index = ids[operand] = self._new_operand(kind, operand)
+        return index
+
+    def operand(self, index):
+        value = self.values[index]
+        if value is None:
+            return NUMBERED_PREFIXES[self.kinds[index]] + str(self.numbers[index])
+        return value
+
+    def _operand_id(self, operand, label=False, literal=False):
+        if operand is None:
+            return -1
+        return self.intern(operand, _kind(operand, label, literal))
+
+    def add(self, quad):
+        op = quad.op
+        self.ops.append(op.value)
+        self.arg1.append(self._operand_id(quad.arg1, literal=op == OpCode.PRINTS))
+        self.arg2.append(self._operand_id(quad.arg2))
+        self.results.append(self._operand_id(quad.result, label=op in LABEL_OPS))
+        self.changed()
+
+    def changed(self):
+        if self._analyses:
+            self._analyses.clear()
+        self.version += 1
+
+    def analysis(self, key, compute):
+        result = self._analyses.get(key)
+        if result is None:
+            result = self._analyses[key] = compute(self)
+        return result
+
+    @property
+    def instructions(self):
+        return self
+
+    def operands(self, kind):
+        # Distinct operands of one kind, in order of first use.
+        return [self.operand(index) for index, entry_kind in enumerate(self.kinds) if entry_kind == kind]
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _quad(self, index):
+        operand = self.operand
+        arg1 = self.arg1[index]
+        arg2 = self.arg2[index]
+        result = self.results[index]
+        return Quadruple(
+            OPCODES[self.ops[index]],
+            operand(arg1) if arg1 >= 0 else None,
+            operand(arg2) if arg2 >= 0 else None,
+            operand(result) if result >= 0 else None,
+        )
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return [self._quad(row) for row in range(*index.indices(len(self.ops)))]
+        if index < 0:
+            index += len(self.ops)
+        if not 0 <= index < len(self.ops):
+            raise IndexError("instruction index out of range")
+        return self._quad(index)
+
+    def __iter__(self):
+        for index in range(len(self.ops)):
+            yield self._quad(index)
+
+    def __reversed__(self):
+        for index in range(len(self.ops) - 1, -1, -1):
+            yield self._quad(index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_value_index'], state['_numbered_index']
+        state['_analyses'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_index()
+        for index, (kind, number, value) in enumerate(zip(self.kinds, self.numbers, self.values)):
+            if value is None:
+                ids = self._numbered_index[kind]
+                if number >= len(ids):
+                    ids.extend(array("i", [-1]) * (number + 1 - len(ids)))
+                ids[number] = index
+            else:
+                self._value_index[kind][value] = index
+
+    def __repr__(self):
+        return "\n".join(str(instr) for instr in self)
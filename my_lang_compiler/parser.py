@@ -4,6 +4,26 @@ from .ast_nodes import (
     Program, Block, VarDecl, Assignment, BinaryOp, UnaryOp, Num, String, Bool, Var, If, While, Print, NoOp
 )
 
+# Binding powers used by Parser.expr. Unary prefixes bind tighter than any
+# binary operator; an open parenthesis acts as a barrier on the operator stack.
+PAREN = 0
+UNARY = 3
+BINARY_PRECEDENCE = {
+    TokenType.PLUS: 1,
+    TokenType.MINUS: 1,
+    TokenType.EQ: 1,
+    TokenType.NE: 1,
+    TokenType.LT: 1,
+    TokenType.GT: 1,
+    TokenType.LE: 1,
+    TokenType.GE: 1,
+    TokenType.MUL: 2,
+    TokenType.DIV: 2,
+}
+
+# Statement parser frame kinds.
+PROGRAM, BLOCK, SINGLE, IF, ELSE, WHILE = range(6)
+
 class Parser:
     def __init__(self, lexer):
         self.lexer = lexer
@@ -21,17 +41,8 @@ class Parser:
         else:
             self.error(expected=token_type)
 
-    def factor(self):
-        token = self.current_token
-        if token.type == TokenType.PLUS:
-            self.eat(TokenType.PLUS)
-            node = UnaryOp(token, self.factor())
-            return node
-        elif token.type == TokenType.MINUS:
-            self.eat(TokenType.MINUS)
-            node = UnaryOp(token, self.factor())
-            return node
-        elif token.type == TokenType.NUMBER:
+    def _operand(self, token):
+        if token.type == TokenType.NUMBER:
             self.eat(TokenType.NUMBER)
             return Num(token)
         elif token.type == TokenType.STRING:
@@ -40,47 +51,55 @@ class Parser:
         elif token.type == TokenType.MYBOOL:
             self.eat(TokenType.MYBOOL)
             return Bool(token)
-        elif token.type == TokenType.LPAREN:
-            self.eat(TokenType.LPAREN)
-            node = self.expr()
-            self.eat(TokenType.RPAREN)
-            return node
         elif token.type == TokenType.IDENTIFIER:
             self.eat(TokenType.IDENTIFIER)
             return Var(token)
         else:
             self.error()
 
-    def term(self):
-        node = self.factor()
-
-        while self.current_token.type in (TokenType.MUL, TokenType.DIV):
-            token = self.current_token
-            if token.type == TokenType.MUL:
-                self.eat(TokenType.MUL)
-            elif token.type == TokenType.DIV:
-                self.eat(TokenType.DIV)
-            
-            node = BinaryOp(left=node, op=token, right=self.factor())
-
-        return node
-
     def expr(self):
-        node = self.term()
+        # Precedence climbing over explicit stacks, so neither parentheses
+        # nor unary chains consume Python stack frames.
+        operands = []
+        operators = []  # (token, precedence); precedence is UNARY or PAREN for prefixes
+        open_parens = 0
 
-        while self.current_token.type in (TokenType.PLUS, TokenType.MINUS, TokenType.EQ, TokenType.NE, TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
+        while True:
             token = self.current_token
-            if token.type == TokenType.PLUS:
-                self.eat(TokenType.PLUS)
-            elif token.type == TokenType.MINUS:
-                self.eat(TokenType.MINUS)
-            # Add comparisons here for simplicity in expr, though precedence might be slightly off without a dedicated level
-            elif token.type in (TokenType.EQ, TokenType.NE, TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
-                 self.eat(token.type)
-
-            node = BinaryOp(left=node, op=token, right=self.term())
-
-        return node
+            while token.type in (TokenType.PLUS, TokenType.MINUS, TokenType.LPAREN):
+                if token.type == TokenType.LPAREN:
+                    operators.append((token, PAREN))
+                    open_parens += 1
+                else:
+                    operators.append((token, UNARY))
+                self.eat(token.type)
+                token = self.current_token
+
+            node = self._operand(token)
+
+            while True:
+                while operators and operators[-1][1] == UNARY:
+                    node = UnaryOp(operators.pop()[0], node)
+
+                token = self.current_token
+                precedence = BINARY_PRECEDENCE.get(token.type)
+                if precedence is not None:
+                    while operators and operators[-1][1] >= precedence:
+                        node = BinaryOp(left=operands.pop(), op=operators.pop()[0], right=node)
+                    operands.append(node)
+                    operators.append((token, precedence))
+                    self.eat(token.type)
+                    break
+
+                while operators and operators[-1][1] != PAREN:
+                    node = BinaryOp(left=operands.pop(), op=operators.pop()[0], right=node)
+
+                if not open_parens:
+                    return node
+
+                self.eat(TokenType.RPAREN)
+                operators.pop()
+                open_parens -= 1
 
     def empty(self):
         return NoOp()
@@ -114,61 +133,92 @@ class Parser:
         self.eat(TokenType.SEMICOLON)
         return Print(expr)
 
-    def block(self):
-        self.eat(TokenType.LBRACE)
-        statements = []
-        while self.current_token.type != TokenType.RBRACE and self.current_token.type != TokenType.EOF:
-            statements.append(self.statement())
-        self.eat(TokenType.RBRACE)
-        return Block(statements)
-
-    def if_statement(self):
-        self.eat(TokenType.MYIF)
-        self.eat(TokenType.LPAREN)
-        condition = self.expr()
-        self.eat(TokenType.RPAREN)
-        
-        then_branch = self.statement()
-        else_branch = None
-        
-        if self.current_token.type == TokenType.MYELSE:
-            self.eat(TokenType.MYELSE)
-            else_branch = self.statement()
-            
-        return If(condition, then_branch, else_branch)
-
-    def while_statement(self):
-        self.eat(TokenType.MYWHILE)
-        self.eat(TokenType.LPAREN)
-        condition = self.expr()
-        self.eat(TokenType.RPAREN)
-        body = self.statement()
-        return While(condition, body)
-
-    def statement(self):
-        if self.current_token.type == TokenType.LBRACE:
-            return self.block()
-        elif self.current_token.type == TokenType.MYVAR:
+    def _statement_head(self, stack):
+        # Returns a finished simple statement, or pushes a frame for a compound
+        # statement whose body still has to be parsed and returns None.
+        token_type = self.current_token.type
+        if token_type == TokenType.LBRACE:
+            self.eat(TokenType.LBRACE)
+            stack.append([BLOCK, []])
+        elif token_type == TokenType.MYVAR:
             return self.variable_declaration()
-        elif self.current_token.type == TokenType.IDENTIFIER:
+        elif token_type == TokenType.IDENTIFIER:
             return self.assignment_statement()
-        elif self.current_token.type == TokenType.MYPRINT:
+        elif token_type == TokenType.MYPRINT:
             return self.print_statement()
-        elif self.current_token.type == TokenType.MYIF:
-            return self.if_statement()
-        elif self.current_token.type == TokenType.MYWHILE:
-            return self.while_statement()
-        elif self.current_token.type == TokenType.SEMICOLON:
+        elif token_type == TokenType.MYIF:
+            self.eat(TokenType.MYIF)
+            self.eat(TokenType.LPAREN)
+            condition = self.expr()
+            self.eat(TokenType.RPAREN)
+            stack.append([IF, condition])
+        elif token_type == TokenType.MYWHILE:
+            self.eat(TokenType.MYWHILE)
+            self.eat(TokenType.LPAREN)
+            condition = self.expr()
+            self.eat(TokenType.RPAREN)
+            stack.append([WHILE, condition])
+        elif token_type == TokenType.SEMICOLON:
             self.eat(TokenType.SEMICOLON)
             return self.empty()
         else:
             self.error()
+        return None
+
+    def _statements(self, root_kind):
+        # Explicit-stack statement parser. Frames are [kind, ...]: list frames
+        # (PROGRAM, BLOCK, SINGLE) collect statements, IF/ELSE/WHILE frames wait
+        # for the single statement that forms their body.
+        root = [root_kind, []]
+        stack = [root]
+
+        while True:
+            frame = stack[-1]
+            kind = frame[0]
+            node = None
+            if kind == PROGRAM:
+                if self.current_token.type == TokenType.EOF:
+                    return Program(frame[1])
+            elif kind == SINGLE:
+                if frame[1]:
+                    return frame[1][0]
+            elif kind == BLOCK:
+                if self.current_token.type in (TokenType.RBRACE, TokenType.EOF):
+                    self.eat(TokenType.RBRACE)
+                    stack.pop()
+                    node = Block(frame[1])
+
+            if node is None:
+                node = self._statement_head(stack)
+                if node is None:
+                    continue
+
+            while True:
+                frame = stack[-1]
+                kind = frame[0]
+                if kind == IF:
+                    if self.current_token.type == TokenType.MYELSE:
+                        self.eat(TokenType.MYELSE)
+                        frame[0] = ELSE
+                        frame.append(node)
+                        break
+                    stack.pop()
+                    node = If(frame[1], node, None)
+                elif kind == ELSE:
+                    stack.pop()
+                    node = If(frame[1], frame[2], node)
+                elif kind == WHILE:
+                    stack.pop()
+                    node = While(frame[1], node)
+                else:
+                    frame[1].append(node)
+                    break
+
+    def statement(self):
+        return self._statements(SINGLE)
 
     def program(self):
-        statements = []
-        while self.current_token.type != TokenType.EOF:
-            statements.append(self.statement())
-        return Program(statements)
+        return self._statements(PROGRAM)
 
     def parse(self):
         return self.program()
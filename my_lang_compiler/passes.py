@@ -0,0 +1,161 @@
+from time import perf_counter
+
+from .optimizer import Optimizer
+from .sccp import ConstantPropagator
+from .dce import DeadCodeEliminator
+from .copyprop import CopyPropagator
+from .loops import LoopOptimizer
+from .peephole import PeepholeOptimizer
+from .gvn import ValueNumbering, LocalValueNumbering
+
+# Optimization passes by name. A pass is built from an IRProgram and its
+# optimize() returns the optimized program.
+PASSES = {
+    "fold": Optimizer,
+    "sccp": ConstantPropagator,
+    "dce": DeadCodeEliminator,
+    "copyprop": CopyPropagator,
+    "loops": LoopOptimizer,
+    "peephole": PeepholeOptimizer,
+    "lvn": LocalValueNumbering,
+    "gvn": ValueNumbering,
+}
+
+DEFAULT_LEVEL = 2
+
+
+def register_pass(name, factory):
+    # Makes `name` usable in pipelines of every PassManager created after.
+    PASSES[name] = factory
+
+
+class FixedPoint:
+    # Passes repeated as a group until a round leaves the IR unchanged, or
+    # for at most `max_iterations` rounds.
+    __slots__ = ('passes', 'max_iterations')
+
+    def __init__(self, passes, max_iterations=4):
+        self.passes = tuple(passes)
+        self.max_iterations = max_iterations
+
+    def __repr__(self):
+        return f"FixedPoint({list(self.passes)}, max_iterations={self.max_iterations})"
+
+
+# -O0 generates the IR as is; -O1 does the cheap cleanups and reuses values
+# within blocks; -O2 adds constant propagation, value numbering across
+# blocks and the loop passes; -O3 repeats the passes that feed each other
+# until they stop finding work. The peephole pass comes last so the others
+# see plain compares.
+LEVELS = {
+    0: (),
+    1: ("fold", "lvn", "dce", "copyprop", "peephole"),
+    2: ("fold", "sccp", "gvn", "dce", "copyprop", "loops", "copyprop", "peephole"),
+    3: ("fold", "sccp", "gvn", "dce", "copyprop", FixedPoint(("loops", "copyprop", "gvn", "sccp", "dce")), FixedPoint(("peephole", "dce"))),
+}
+
+
+class PassRecord:
+    # One run of a pass: seconds taken, instruction counts before and after,
+    # and the fixed-point round (0 outside FixedPoint groups). A skipped pass
+    # was not run because it had already left this exact program unchanged.
+    __slots__ = ('name', 'seconds', 'before', 'after', 'changed', 'skipped', 'iteration')
+
+    def __init__(self, name, seconds, before, after, changed, skipped=False, iteration=0):
+        self.name = name
+        self.seconds = seconds
+        self.before = before
+        self.after = after
+        self.changed = changed
+        self.skipped = skipped
+        self.iteration = iteration
+
+    def __repr__(self):
+        return f"PassRecord({self.name!r}, {self.seconds:.4f}s, {self.before} -> {self.after})"
+
+
+def _unchanged(before, after):
+    if after is before:
+        return True
+    old = before.instructions
+    new = after.instructions
+    if len(old) != len(new):
+        return False
+    for a, b in zip(old, new):
+        if a is not b and (a.op != b.op or a.arg1 != b.arg1 or a.arg2 != b.arg2 or a.result != b.result):
+            return False
+    return True
+
+
+class PassManager:
+    # Runs a pipeline of pass names and FixedPoint groups over an IRProgram.
+    # A pass that leaves the program unchanged hands on its input rather than
+    # its output, so the analyses cached on it (CFG, liveness) stay valid,
+    # and a pass that already left that same program unchanged is skipped.
+    # `records` lists a PassRecord per pass run; `last` holds the latest
+    # instance of each pass, for its counters.
+    def __init__(self, pipeline, passes=None):
+        self.pipeline = tuple(pipeline)
+        self.passes = dict(PASSES if passes is None else passes)
+        for step in self.pipeline:
+            for name in step.passes if type(step) is FixedPoint else (step,):
+                if name not in self.passes:
+                    raise ValueError(f"Unknown optimization pass '{name}'")
+        self.records = []
+        self.last = {}
+        self._settled = {}
+
+    @classmethod
+    def for_level(cls, level, passes=None):
+        pipeline = LEVELS.get(level)
+        if pipeline is None:
+            raise ValueError(f"Unknown optimization level {level!r}; expected one of {sorted(LEVELS)}")
+        return cls(pipeline, passes)
+
+    def run(self, program):
+        for step in self.pipeline:
+            if type(step) is FixedPoint:
+                program = self._run_group(step, program)
+            else:
+                program, _ = self._run_pass(step, program, 0)
+        return program
+
+    def _run_group(self, group, program):
+        for iteration in range(1, group.max_iterations + 1):
+            changed = False
+            for name in group.passes:
+                program, pass_changed = self._run_pass(name, program, iteration)
+                changed = changed or pass_changed
+            if not changed:
+                break
+        return program
+
+    def _run_pass(self, name, program, iteration):
+        count = len(program.instructions)
+        if self._settled.get(name) is program:
+            self.records.append(PassRecord(name, 0.0, count, count, False, True, iteration))
+            return program, False
+
+        start = perf_counter()
+        instance = self.passes[name](program)
+        result = instance.optimize()
+        changed = not _unchanged(program, result)
+        seconds = perf_counter() - start
+        self.last[name] = instance
+        self.records.append(PassRecord(name, seconds, count, len(result.instructions), changed, False, iteration))
+        if not changed:
+            self._settled[name] = program
+            return program, False
+        return result, True
+
+    def report(self):
+        if not self.records:
+            return "  (no passes)"
+        lines = []
+        for record in self.records:
+            name = record.name if not record.iteration else f"{record.name} #{record.iteration}"
+            if record.skipped:
+                lines.append(f"  {name:16} skipped")
+            else:
+                lines.append(f"  {name:16} {record.before:8} -> {record.after:8} instructions  {record.seconds * 1000:9.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,168 @@
+from .ir import OpCode, Quadruple, IRProgram, evaluate, JUMP_COMPARES
+from .cfg import BRANCH_OPS
+from .ssa import jumps_to_next
+from .liveness import uses, definition
+
+# The fused jump taken when a compare's result is true (for JIF) and when it
+# is false (for JFALSE).
+FUSED_JUMPS = {compare: jump for jump, compare in JUMP_COMPARES.items()}
+NEGATED_JUMPS = {
+    OpCode.SLT: OpCode.JGE,
+    OpCode.SLE: OpCode.JGT,
+    OpCode.SGT: OpCode.JLE,
+    OpCode.SGE: OpCode.JLT,
+    OpCode.SEQ: OpCode.JNE,
+    OpCode.SNE: OpCode.JEQ,
+}
+COPY_OPS = (OpCode.LOAD, OpCode.STORE)
+
+
+class PeepholeOptimizer:
+    # Local clean-ups of the jump structure:
+    # - branches on values known within their block become a JMP or go away,
+    # - a compare whose temp only feeds the conditional jump right after it
+    #   becomes one fused jump (JLT .. JNE), negated under JFALSE,
+    # - jumps to a label that is followed by a JMP go to that JMP's target,
+    # - code after a JMP up to the next label is dropped, as are jumps to
+    #   the labels right after them and labels nothing jumps to.
+    # The last three repeat until nothing changes, since each can expose
+    # work for the others.
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.branches_folded = 0
+        self.fused = 0
+        self.threaded = 0
+        self.unreachable_removed = 0
+        self.jumps_removed = 0
+        self.labels_removed = 0
+
+    def optimize(self):
+        instructions = self._fold_branches(self.ir.instructions)
+        while True:
+            count = len(instructions)
+            instructions = self._thread(instructions)
+            instructions = self._remove_unreachable(instructions)
+            instructions = self._remove_labels(instructions)
+            if len(instructions) == count:
+                break
+        program = IRProgram()
+        program.instructions = instructions
+        return program
+
+    def _fold_branches(self, instructions):
+        reads = {}
+        for instr in instructions:
+            for name in uses(instr):
+                reads[name] = reads.get(name, 0) + 1
+
+        result = []
+        # Names holding a known value since the last label.
+        known = {}
+
+        def value(operand):
+            if type(operand) is int:
+                return operand
+            return known.get(operand)
+
+        for instr in instructions:
+            op = instr.op
+            if op == OpCode.LABEL:
+                known.clear()
+            elif op == OpCode.JFALSE or op == OpCode.JIF:
+                condition = value(instr.arg1)
+                if condition is not None:
+                    self._fold(result, instr, (condition != 0) == (op == OpCode.JIF))
+                    continue
+                previous = result[-1] if result else None
+                if (previous is not None and previous.result == instr.arg1 and type(instr.arg1) is str
+                        and reads[instr.arg1] == 1 and previous.op in FUSED_JUMPS):
+                    jumps = FUSED_JUMPS if op == OpCode.JIF else NEGATED_JUMPS
+                    result[-1] = Quadruple(jumps[previous.op], previous.arg1, previous.arg2, instr.result)
+                    self.fused += 1
+                    continue
+            elif op in JUMP_COMPARES:
+                left = value(instr.arg1)
+                right = value(instr.arg2)
+                if left is not None and right is not None:
+                    self._fold(result, instr, evaluate(JUMP_COMPARES[op], left, right) != 0)
+                    continue
+            else:
+                name = definition(instr)
+                if name is not None:
+                    if op == OpCode.CONST:
+                        known[name] = instr.arg1
+                    elif op in COPY_OPS and value(instr.arg1) is not None:
+                        known[name] = value(instr.arg1)
+                    else:
+                        known.pop(name, None)
+            result.append(instr)
+        return result
+
+    def _fold(self, result, instr, taken):
+        self.branches_folded += 1
+        if taken:
+            result.append(Quadruple(OpCode.JMP, result=instr.result))
+
+    def _thread(self, instructions):
+        # Where control goes after each label: the target of the JMP that
+        # follows it (and its labels), else the label itself.
+        next_jump = {}
+        labels = []
+        for instr in instructions:
+            if instr.op == OpCode.LABEL:
+                labels.append(instr.result)
+                continue
+            if instr.op == OpCode.JMP:
+                for label in labels:
+                    next_jump[label] = instr.result
+            labels = []
+
+        def final(label):
+            seen = {label}
+            while True:
+                target = next_jump.get(label)
+                if target is None or target in seen:
+                    return label
+                seen.add(target)
+                label = target
+
+        result = []
+        for instr in instructions:
+            if instr.op in BRANCH_OPS and instr.result in next_jump:
+                target = final(instr.result)
+                if target != instr.result:
+                    instr = Quadruple(instr.op, instr.arg1, instr.arg2, target)
+                    self.threaded += 1
+            result.append(instr)
+        return result
+
+    def _remove_unreachable(self, instructions):
+        result = []
+        dead = False
+        for instr in instructions:
+            if instr.op == OpCode.LABEL:
+                dead = False
+            elif dead:
+                self.unreachable_removed += 1
+                continue
+            result.append(instr)
+            if instr.op == OpCode.JMP:
+                dead = True
+        return result
+
+    def _remove_labels(self, instructions):
+        kept = []
+        for position, instr in enumerate(instructions):
+            if instr.op in BRANCH_OPS and jumps_to_next(instructions, position):
+                self.jumps_removed += 1
+                continue
+            kept.append(instr)
+
+        targets = {instr.result for instr in kept if instr.op in BRANCH_OPS}
+        result = []
+        for instr in kept:
+            if instr.op == OpCode.LABEL and instr.result not in targets:
+                self.labels_removed += 1
+                continue
+            result.append(instr)
+        return result
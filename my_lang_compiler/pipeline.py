@@ -0,0 +1,202 @@
+from ast import unparse
+from time import perf_counter
+
+from .parser import Parser
+from .semantic_analyzer import SemanticAnalyzer
+from .ir_generator import IRGenerator
+from .passes import PassManager, DEFAULT_LEVEL
+from .regalloc import TempAllocator
+from .structure import StructuredCodeGenerator
+from .interpreter import Interpreter
+from .vm import Bytecode
+from .python_backend import PythonGenerator, PythonProgram
+
+# Ways execute() can run a program: the bytecode VM, the IR interpreter, or
+# CPython on the program compiled to a Python function.
+ENGINES = ("bytecode", "ir", "python")
+
+
+def cache_settings(opt_level=DEFAULT_LEVEL, max_locals=None):
+    # The part of a CompileCache key that comes from translate()'s options.
+    if max_locals is None:
+        return f"O{opt_level}"
+    return f"O{opt_level} L{max_locals}"
+
+
+def analyze(lexer, verbose=False, lap=None):
+    # Parses the token source and resolves its names; returns the AST and
+    # the SemanticAnalyzer holding its variables.
+    if lap is None:
+        lap = _stopwatch(None)
+
+    if verbose:
+        print("1. Lexical Analysis...")
+    if verbose:
+        print("2. Parsing...")
+    parser = Parser(lexer)
+    ast = parser.parse()
+    lap("parse")
+
+    if verbose:
+        print("3. Semantic Analysis...")
+    semantic_analyzer = SemanticAnalyzer()
+    semantic_analyzer.visit(ast)
+    lap("semantic")
+
+    return ast, semantic_analyzer
+
+
+def lower(lexer, verbose=False, timings=None, artifacts=None, opt_level=DEFAULT_LEVEL, max_locals=None, lap=None):
+    # Runs the phases up to and including optimization and temp allocation
+    # and returns the IRProgram they leave; see translate() for the options.
+    # `lap(phase)` is called as each phase ends.
+    if lap is None:
+        lap = _stopwatch(timings)
+
+    ast, semantic_analyzer = analyze(lexer, verbose, lap)
+    return lower_tree(ast, semantic_analyzer, verbose, artifacts, opt_level, max_locals, lap)
+
+
+def lower_tree(ast, semantic_analyzer, verbose=False, artifacts=None, opt_level=DEFAULT_LEVEL, max_locals=None, lap=None):
+    # lower() for a tree analyze() already resolved.
+    if lap is None:
+        lap = _stopwatch(None)
+
+    if verbose:
+        print("4. IR Generation...")
+    ir_generator = IRGenerator(semantic_analyzer.variables)
+    ir_program = ir_generator.visit(ast)
+    lap("ir")
+
+    if verbose:
+        print("Original IR:")
+        print(ir_program)
+
+    if verbose:
+        print("5. Optimization...")
+    passes = PassManager.for_level(opt_level)
+    optimized_ir = passes.run(ir_program)
+    lap("optimize")
+
+    allocator = None
+    if opt_level >= 1 or max_locals is not None:
+        allocator = TempAllocator(optimized_ir, max_locals)
+        optimized_ir = allocator.optimize()
+        lap("allocate")
+    if artifacts is not None:
+        artifacts["ir"] = optimized_ir
+        artifacts["passes"] = passes.records
+
+    if verbose:
+        print(f"Passes at -O{opt_level}:")
+        print(passes.report())
+        if allocator is not None:
+            spilled = ""
+            if allocator.spilled:
+                spilled = f", {allocator.spilled} spilled to {allocator.array_size} array elements"
+            print(f"Temps: {allocator.temps} -> {allocator.locals} locals{spilled}")
+        print("Optimized IR:")
+        print(optimized_ir)
+    return optimized_ir
+
+
+def _stopwatch(timings):
+    # A lap(phase) function storing the seconds since the previous lap in
+    # `timings`.
+    clock = perf_counter()
+
+    def lap(phase):
+        nonlocal clock
+        now = perf_counter()
+        if timings is not None:
+            timings[phase] = now - clock
+        clock = now
+
+    return lap
+
+
+def translate(lexer, verbose=False, timings=None, artifacts=None, opt_level=DEFAULT_LEVEL, max_locals=None):
+    # Runs the compiler phases over a token source and returns the C code.
+    # Errors propagate as exceptions. If `timings` is a dict, the seconds
+    # spent in each phase are stored in it by phase name; lexing happens on
+    # demand while parsing, so it is counted under "parse". If `artifacts` is
+    # a dict, the optimized IRProgram is stored in it under "ir" and the
+    # PassRecords of the optimization passes under "passes". `opt_level`
+    # picks the pass pipeline (see passes.LEVELS). From -O1 on, or whenever
+    # `max_locals` is given, temps then share C locals (see TempAllocator),
+    # at most `max_locals` of them.
+    lap = _stopwatch(timings)
+    optimized_ir = lower(lexer, verbose, timings, artifacts, opt_level, max_locals, lap)
+
+    if verbose:
+        print("6. Code Generation...")
+    codegen = StructuredCodeGenerator(optimized_ir)
+    c_code = codegen.generate()
+    lap("codegen")
+
+    return c_code
+
+
+def execute(lexer, verbose=False, timings=None, artifacts=None, opt_level=DEFAULT_LEVEL, max_locals=None, max_steps=None,
+            engine="bytecode"):
+    # Like translate(), but runs the optimized IR in-process instead of
+    # generating C, and returns what the program printed. `engine` "bytecode"
+    # lowers it to a Bytecode and runs that; "ir" runs the instructions as
+    # they are through an Interpreter, which is slower but can stop after
+    # `max_steps` instructions. Lowering is timed as "bytecode", the run as
+    # "run". "python" skips the IR and runs compile_python()'s program, so
+    # `opt_level`, `max_locals` and `artifacts` don't apply to it.
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}")
+    if max_steps is not None and engine != "ir":
+        raise ValueError("max_steps needs the ir engine")
+    lap = _stopwatch(timings)
+    if engine == "python":
+        program = compile_python(lexer, verbose, lap=lap)
+        output = program.run()
+        lap("run")
+        return output
+    optimized_ir = lower(lexer, verbose, timings, artifacts, opt_level, max_locals, lap)
+
+    if verbose:
+        print("6. Execution...")
+    if engine == "bytecode":
+        bytecode = Bytecode.from_program(optimized_ir)
+        lap("bytecode")
+        if verbose:
+            print("Bytecode:")
+            print(bytecode.disassemble())
+        output = bytecode.run()
+    else:
+        output = Interpreter(optimized_ir, max_steps).run()
+    lap("run")
+
+    return output
+
+
+def compile_python(lexer, verbose=False, timings=None, lap=None, filename="<program>"):
+    # Compiles the token source to a PythonProgram (see PythonGenerator).
+    # Code generation is timed as "python", compile() as "compile". A program
+    # CPython can't compile (more than 20 nested loops, or expressions nested
+    # about as deep as the recursion limit) is lowered to a Bytecode instead,
+    # timed as "bytecode"; it has the same run().
+    if lap is None:
+        lap = _stopwatch(timings)
+    ast, semantic_analyzer = analyze(lexer, verbose, lap)
+
+    if verbose:
+        print("4. Python Generation...")
+    try:
+        module = PythonGenerator(semantic_analyzer.variables).visit(ast)
+        lap("python")
+        if verbose:
+            print(unparse(module))
+        program = PythonProgram.from_module(module, filename)
+    except (SyntaxError, RecursionError, MemoryError) as exc:
+        if verbose:
+            print(f"Python can't compile the program ({exc}); running it as bytecode")
+        program = Bytecode.from_program(lower_tree(ast, semantic_analyzer, verbose, lap=lap))
+        lap("bytecode")
+        return program
+    lap("compile")
+    return program
@@ -0,0 +1,150 @@
+from .tokens import TokenType
+from .ast_nodes import Block, If, BinaryOp
+from .visitor import NodeVisitor
+
+PRECEDENCE = {
+    TokenType.PLUS: 1,
+    TokenType.MINUS: 1,
+    TokenType.EQ: 1,
+    TokenType.NE: 1,
+    TokenType.LT: 1,
+    TokenType.GT: 1,
+    TokenType.LE: 1,
+    TokenType.GE: 1,
+    TokenType.MUL: 2,
+    TokenType.DIV: 2,
+}
+ATOM = 3
+
+INDENT = "    "
+
+
+def _quote(value):
+    escaped = value.replace("\\", "\\\\")
+    escaped = escaped.replace('"', '\\"')
+    escaped = escaped.replace("\n", "\\n")
+    escaped = escaped.replace("\t", "\\t")
+    escaped = escaped.replace("\r", "\\r")
+    return f'"{escaped}"'
+
+
+def _precedence(node):
+    if isinstance(node, BinaryOp):
+        return PRECEDENCE[node.op.type]
+    return ATOM
+
+
+# Formats an AST (or an Arena view of one) back into source text.
+# Expressions evaluate to their text; statements append lines.
+class PrettyPrinter(NodeVisitor):
+    def __init__(self):
+        self.lines = []
+        self.depth = 0
+        self.prefix = None
+
+    def format(self, node):
+        self.visit(node)
+        return "\n".join(self.lines) + "\n" if self.lines else ""
+
+    def _line(self, text):
+        if self.prefix is not None:
+            text = self.prefix + text
+            self.prefix = None
+        else:
+            text = INDENT * self.depth + text
+        self.lines.append(text)
+
+    def _header(self, text):
+        # Compound statements start on the line of the statement owning them.
+        if self.prefix is None:
+            self.prefix = INDENT * self.depth + text
+        else:
+            self.prefix += text
+
+    def visit_Program(self, node):
+        return tuple(node.statements)
+
+    def visit_Block(self, node):
+        self._line("{")
+        self.depth += 1
+        for stmt in node.statements:
+            yield stmt
+        self.depth -= 1
+        self._line("}")
+
+    def visit_VarDecl(self, node):
+        if node.initializer:
+            text = yield node.initializer
+            self._line(f"myvar {node.var_name.value} = {text};")
+        else:
+            self._line(f"myvar {node.var_name.value};")
+
+    def visit_Assignment(self, node):
+        text = yield node.right
+        self._line(f"{node.left.value} = {text};")
+
+    def visit_Print(self, node):
+        text = yield node.expr
+        self._line(f"myprint({text});")
+
+    def visit_If(self, node):
+        condition = yield node.condition
+        self._header(f"myif ({condition}) ")
+        then_branch = node.then_branch
+        if node.else_branch and isinstance(then_branch, If) and not then_branch.else_branch:
+            # Keep the else attached to this myif rather than the nested one.
+            # The extra braces add a scope, which is harmless for a myif body.
+            self._line("{")
+            self.depth += 1
+            yield then_branch
+            self.depth -= 1
+            self._line("}")
+        else:
+            yield then_branch
+        if node.else_branch:
+            if isinstance(then_branch, Block) or self.lines[-1].endswith("}"):
+                self.prefix = self.lines.pop() + " myelse "
+            else:
+                self._header("myelse ")
+            yield node.else_branch
+
+    def visit_While(self, node):
+        condition = yield node.condition
+        self._header(f"mywhile ({condition}) ")
+        yield node.body
+
+    def visit_NoOp(self, node):
+        self._line(";")
+
+    def visit_BinaryOp(self, node):
+        precedence = PRECEDENCE[node.op.type]
+        left_node = node.left
+        right_node = node.right
+        left = yield left_node
+        right = yield right_node
+        if _precedence(left_node) < precedence:
+            left = f"({left})"
+        if _precedence(right_node) <= precedence:
+            right = f"({right})"
+        return f"{left} {node.op.value} {right}"
+
+    def visit_UnaryOp(self, node):
+        expr = node.expr
+        text = yield expr
+        if _precedence(expr) < ATOM:
+            text = f"({text})"
+        elif text[0] in "+-":
+            text = " " + text
+        return f"{node.op.value}{text}"
+
+    def visit_Num(self, node):
+        return str(node.value)
+
+    def visit_String(self, node):
+        return _quote(node.value)
+
+    def visit_Bool(self, node):
+        return "mytrue" if node.value else "myfalse"
+
+    def visit_Var(self, node):
+        return node.value
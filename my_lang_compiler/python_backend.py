@@ -0,0 +1,256 @@
+import ast
+import hashlib
+import keyword
+from collections import OrderedDict
+
+from .ast_nodes import String
+from .ir import INT_BITS
+from .tokens import TokenType
+from .visitor import NodeVisitor
+
+WRAPPING_OPERATORS = {
+    TokenType.PLUS: ast.Add,
+    TokenType.MINUS: ast.Sub,
+    TokenType.MUL: ast.Mult,
+}
+COMPARE_OPERATORS = {
+    TokenType.EQ: ast.Eq,
+    TokenType.NE: ast.NotEq,
+    TokenType.LT: ast.Lt,
+    TokenType.LE: ast.LtE,
+    TokenType.GT: ast.Gt,
+    TokenType.GE: ast.GtE,
+}
+# The generated function's parameters: the division helper and the output
+# callback. Program variables starting with "_" are renamed, so these can't
+# clash with them.
+DIVIDE = "_div"
+WRITE = "_write"
+FUNCTION = "_program"
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def divide(a, b):
+    # C division of 32-bit ints: truncates towards zero and wraps.
+    if b == 0:
+        raise Exception("Division by zero")
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        quotient = -quotient
+    if quotient == 1 << (INT_BITS - 1):
+        quotient = -quotient
+    return quotient
+
+
+def _name(node, ctx):
+    return ast.Name(id=node, ctx=ctx())
+
+
+class PythonGenerator(NodeVisitor):
+    # Lowers a resolved AST to a Python ast.Module defining
+    # `_program(_div, _write)`. Every variable is a local of that function,
+    # mywhile and myif become while and if, and myprint calls _write with the
+    # line. `variables` is the slot table of the SemanticAnalyzer that
+    # resolved the tree.
+    #
+    # Ints behave as in the generated C. +, - and * are exact modulo 2**32,
+    # so an expression built from them is computed on Python ints and
+    # wrapped to 32 bits once, where its value is observed: when it is
+    # stored, printed, compared, divided or tested. A compare used as a value
+    # becomes 1 or 0.
+    #
+    # The module nests as deep as the program, and CPython has limits there:
+    # compile() rejects more than 20 nested loops with a SyntaxError, and
+    # expressions nested about as deep as the recursion limit (1000) raise
+    # RecursionError in ast or compile(). compile_python() runs such programs
+    # on the bytecode VM instead.
+    def __init__(self, variables):
+        self.variables = variables
+        self.names = {}
+
+    def local(self, slot):
+        name = self.names.get(slot)
+        if name is None:
+            name = self.variables[slot].name
+            if name.startswith("_") or keyword.iskeyword(name) or not name.isidentifier():
+                name = f"_v{slot}"
+            self.names[slot] = name
+        return name
+
+    def wrapped(self, expression):
+        # `expression` reduced to a 32-bit int. Only +, - and * (BinOps) can
+        # leave the range; names hold wrapped values and _div wraps.
+        if not isinstance(expression, ast.BinOp):
+            return expression
+        half = 1 << (INT_BITS - 1)
+        biased = ast.BinOp(expression, ast.Add(), ast.Constant(half))
+        masked = ast.BinOp(biased, ast.BitAnd(), ast.Constant((1 << INT_BITS) - 1))
+        return ast.BinOp(masked, ast.Sub(), ast.Constant(half))
+
+    def value(self, expression):
+        # `expression` as an int, for a store, a print or an operand.
+        if isinstance(expression, ast.Compare):
+            return ast.IfExp(expression, ast.Constant(1), ast.Constant(0))
+        return self.wrapped(expression)
+
+    def test(self, expression):
+        # `expression` as the test of an if or while.
+        if isinstance(expression, ast.Compare):
+            return expression
+        return self.wrapped(expression)
+
+    def visit_Program(self, node):
+        body = []
+        for stmt in node.statements:
+            body.extend((yield stmt))
+        if self.names:
+            targets = [_name(self.names[slot], ast.Store) for slot in sorted(self.names)]
+            body.insert(0, ast.Assign(targets=targets, value=ast.Constant(0)))
+        arguments = ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg=DIVIDE), ast.arg(arg=WRITE)], kwonlyargs=[], kw_defaults=[], defaults=[],
+        )
+        function = ast.FunctionDef(name=FUNCTION, args=arguments, body=body or [ast.Pass()], decorator_list=[])
+        module = ast.Module(body=[function], type_ignores=[])
+        return ast.fix_missing_locations(module)
+
+    def visit_Block(self, node):
+        body = []
+        for stmt in node.statements:
+            body.extend((yield stmt))
+        return body
+
+    def store(self, slot, node):
+        expression = yield node
+        return [ast.Assign(targets=[_name(self.local(slot), ast.Store)], value=self.value(expression))]
+
+    def visit_VarDecl(self, node):
+        if node.initializer is None:
+            return []
+        return (yield from self.store(node.var_name.slot, node.initializer))
+
+    def visit_Assignment(self, node):
+        return (yield from self.store(node.left.slot, node.right))
+
+    def visit_BinaryOp(self, node):
+        left = yield node.left
+        right = yield node.right
+        op = node.op.type
+        if op in WRAPPING_OPERATORS:
+            # Operands stay unwrapped; see the class comment.
+            if isinstance(left, ast.Compare):
+                left = self.value(left)
+            if isinstance(right, ast.Compare):
+                right = self.value(right)
+            return ast.BinOp(left, WRAPPING_OPERATORS[op](), right)
+        left = self.value(left)
+        right = self.value(right)
+        if op == TokenType.DIV:
+            return ast.Call(_name(DIVIDE, ast.Load), [left, right], [])
+        if op in COMPARE_OPERATORS:
+            return ast.Compare(left, [COMPARE_OPERATORS[op]()], [right])
+        raise Exception(f"Unknown binary op {op}")
+
+    def visit_UnaryOp(self, node):
+        operand = yield node.expr
+        if node.op.type == TokenType.PLUS:
+            return operand
+        if node.op.type == TokenType.MINUS:
+            if isinstance(operand, ast.Compare):
+                operand = self.value(operand)
+            return ast.BinOp(ast.Constant(0), ast.Sub(), operand)
+        raise Exception(f"Unknown unary op {node.op.type}")
+
+    def visit_Num(self, node):
+        return ast.Constant(node.value)
+
+    def visit_String(self, node):
+        raise Exception("Strings can only be printed")
+
+    def visit_Bool(self, node):
+        return ast.Constant(1 if node.value else 0)
+
+    def visit_Var(self, node):
+        return _name(self.local(node.slot), ast.Load)
+
+    def visit_If(self, node):
+        condition = yield node.condition
+        then_branch = yield node.then_branch
+        else_branch = []
+        if node.else_branch:
+            else_branch = yield node.else_branch
+        return [ast.If(self.test(condition), then_branch or [ast.Pass()], else_branch)]
+
+    def visit_While(self, node):
+        condition = yield node.condition
+        body = yield node.body
+        return [ast.While(self.test(condition), body or [ast.Pass()], [])]
+
+    def visit_Print(self, node):
+        if isinstance(node.expr, String):
+            line = ast.Constant(f"{node.expr.value}\n")
+        else:
+            expression = self.value((yield node.expr))
+            if isinstance(expression, ast.Constant):
+                line = ast.Constant(f"{expression.value}\n")
+            else:
+                line = ast.JoinedStr([ast.FormattedValue(expression, -1), ast.Constant("\n")])
+        return [ast.Expr(ast.Call(_name(WRITE, ast.Load), [line], []))]
+
+    def visit_NoOp(self, node):
+        return []
+
+
+class PythonProgram:
+    # A program compiled to a Python code object. run() calls the function it
+    # defines and returns what the program printed. from_module() raises
+    # SyntaxError or RecursionError for a module nested past CPython's limits
+    # (see PythonGenerator).
+    def __init__(self, code):
+        self.code = code
+        namespace = {}
+        exec(code, namespace)
+        self.function = namespace[FUNCTION]
+
+    @classmethod
+    def from_module(cls, module, filename="<program>"):
+        return cls(compile(module, filename, "exec"))
+
+    def run(self):
+        output = []
+        self.function(divide, output.append)
+        return "".join(output)
+
+
+class ProgramCache:
+    # Compiled PythonPrograms by SHA-256 of their source text, in memory. The
+    # least recently used entry is dropped past `max_entries`.
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_code):
+        return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+    def get(self, source_code, build):
+        # The program for `source_code`; `build()` makes it on a miss.
+        key = self.key(source_code)
+        program = self.entries.get(key)
+        if program is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return program
+        self.misses += 1
+        program = build()
+        self.entries[key] = program
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return program
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
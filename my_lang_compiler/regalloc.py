@@ -0,0 +1,149 @@
+from heapq import heapify, heappop, heappush
+
+from .ir import IRProgram, Quadruple, Variable
+from .ssa import LABEL_OPS, LITERAL_OPS
+from .liveness import Liveness, uses, definition
+
+
+class TempAllocator:
+    # Maps temps to a pool of reusable C locals by linear scan. A temp's live
+    # interval runs from its first to its last appearance in instruction
+    # order, widened to the start or end of every block it is live into or
+    # out of, so it covers loops it is live around. Temps whose intervals
+    # don't overlap share a local. Positions are doubled so that instruction
+    # i reads at 2i and writes at 2i + 1: in `t2 = t1 + 1` at t1's last use,
+    # t2 can take t1's local.
+    #
+    # With `max_locals`, temps beyond that many live at once go to elements of
+    # a single C array instead, the ones live furthest ahead first. Array
+    # elements are reused the same way.
+    #
+    # Run it after the optimization passes: they expect each temp to have a
+    # single definition. `temps` counts the temps before, `locals` the locals
+    # declared for them after, `spilled` the temps moved to the array and
+    # `array_size` its length.
+    def __init__(self, ir_program, max_locals=None):
+        if max_locals is not None and max_locals < 1:
+            raise ValueError(f"max_locals must be at least 1, not {max_locals}")
+        self.ir = ir_program
+        self.max_locals = max_locals
+        self.temps = 0
+        self.locals = 0
+        self.spilled = 0
+        self.array_size = 0
+
+    def optimize(self):
+        program = self.ir
+        instructions = program.instructions
+        starts, ends = self._intervals(program)
+        self.temps = len(starts)
+        order = sorted(starts, key=starts.__getitem__)
+
+        assignment, self.locals, spilled = self._scan(order, starts, ends, self.max_locals)
+        slots, self.array_size, _ = self._scan(spilled, starts, ends, None)
+        self.spilled = len(spilled)
+
+        taken = {operand.name for instr in instructions for operand in (instr.arg1, instr.arg2, instr.result)
+                 if type(operand) is Variable}
+        names = []
+        number = 0
+        while len(names) < self.locals:
+            number += 1
+            name = f"t{number}"
+            if name not in taken:
+                names.append(name)
+        array = "spill"
+        suffix = 2
+        while array in taken:
+            array = f"spill_{suffix}"
+            suffix += 1
+
+        rename = {temp: names[local] for temp, local in assignment.items()}
+        for temp, slot in slots.items():
+            rename[temp] = f"{array}[{slot}]"
+
+        allocated = []
+        for instr in instructions:
+            arg1 = instr.arg1 if instr.op in LITERAL_OPS else rename.get(instr.arg1, instr.arg1)
+            arg2 = rename.get(instr.arg2, instr.arg2)
+            result = instr.result if instr.op in LABEL_OPS else rename.get(instr.result, instr.result)
+            if arg1 is instr.arg1 and arg2 is instr.arg2 and result is instr.result:
+                allocated.append(instr)
+            else:
+                allocated.append(Quadruple(instr.op, arg1, arg2, result))
+        program = IRProgram()
+        program.instructions = allocated
+        return program
+
+    def _intervals(self, program):
+        # First and last position at which each temp is live.
+        starts = {}
+        ends = {}
+        for position, instr in enumerate(program.instructions):
+            read = 2 * position
+            for name in uses(instr):
+                if type(name) is str:
+                    if name not in starts:
+                        starts[name] = read
+                    ends[name] = read
+            name = definition(instr)
+            if type(name) is str:
+                if name not in starts:
+                    starts[name] = read + 1
+                ends[name] = read + 1
+
+        # Blocks are numbered in instruction order, so only the first block a
+        # name is live into and the last it is live out of can widen it.
+        live = Liveness.of(program)
+        cfg = live.cfg
+        seen = 0
+        for block in range(len(cfg)):
+            first = live.live_in[block] & ~seen
+            if first:
+                seen |= first
+                entry = 2 * cfg.starts[block]
+                for name in live.decode(first):
+                    if type(name) is str and entry < starts[name]:
+                        starts[name] = entry
+        seen = 0
+        for block in range(len(cfg) - 1, -1, -1):
+            last = live.live_out[block] & ~seen
+            if last:
+                seen |= last
+                leave = 2 * cfg.ends[block]
+                for name in live.decode(last):
+                    if type(name) is str and leave > ends[name]:
+                        ends[name] = leave
+        return starts, ends
+
+    def _scan(self, order, starts, ends, limit):
+        # Assigns the temps in `order` (by interval start) to numbered slots.
+        # Returns (temp -> slot, slots used, temps left over past `limit`).
+        assignment = {}
+        spilled = []
+        active = []
+        free = []
+        count = 0
+        for temp in order:
+            start = starts[temp]
+            while active and active[0][0] < start:
+                free.append(assignment[heappop(active)[1]])
+            if free:
+                slot = free.pop()
+            elif limit is None or count < limit:
+                slot = count
+                count += 1
+            else:
+                # Spill whichever of this temp and the active ones ends last.
+                furthest = max(active)
+                if furthest[0] <= ends[temp]:
+                    spilled.append(temp)
+                    continue
+                active.remove(furthest)
+                heapify(active)
+                slot = assignment.pop(furthest[1])
+                spilled.append(furthest[1])
+            assignment[temp] = slot
+            heappush(active, (ends[temp], temp))
+        spilled.sort(key=starts.__getitem__)
+        return assignment, count, spilled
@@ -0,0 +1,268 @@
+import codecs
+import io
+import mmap
+import os
+import re
+
+from .lexer import Lexer
+from .tokens import Token, TokenType
+
+KEYWORDS = {
+    "myif": TokenType.MYIF,
+    "myelse": TokenType.MYELSE,
+    "mywhile": TokenType.MYWHILE,
+    "myvar": TokenType.MYVAR,
+    "myprint": TokenType.MYPRINT,
+    "mytrue": TokenType.MYBOOL,
+    "myfalse": TokenType.MYBOOL,
+}
+
+# Operators that the reference lexer reports at the column *after* the lexeme.
+TRAILING_OPERATORS = {
+    "==": TokenType.EQ,
+    "!=": TokenType.NE,
+    "<=": TokenType.LE,
+    ">=": TokenType.GE,
+    "=": TokenType.ASSIGN,
+    "<": TokenType.LT,
+    ">": TokenType.GT,
+}
+
+SINGLE_CHAR_TOKENS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MUL,
+    '/': TokenType.DIV,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    ';': TokenType.SEMICOLON,
+    ',': TokenType.COMMA,
+}
+
+ESCAPE_MAP = {
+    'n': '\n',
+    't': '\t',
+    'r': '\r',
+    '\\': '\\',
+    '"': '"',
+    "'": "'",
+}
+
+# Only ASCII lexemes are matched here; anything else goes through the reference
+# Lexer so that Unicode letters, digits and whitespace behave exactly as before.
+# Leading whitespace and comments are consumed by the same match as the token.
+MASTER_PATTERN = re.compile(r"""
+    [ \t\n\r\f\v]*(?:\#[^\n]*(?:\n|\Z)[ \t\n\r\f\v]*)*
+    (?:
+        (?P<IDENT>[A-Za-z_][A-Za-z0-9_]*)(?![A-Za-z0-9_]|[^\x00-\x7f])
+      | (?P<PUNCT>[-+*/(){};,])
+      | (?P<NUMBER>[0-9]+)(?![0-9]|[^\x00-\x7f])
+      | (?P<OP>==|!=|<=|>=|[=<>])
+      | (?P<STRING>"(?:[^"\\\n]|\\[\s\S])*"|'(?:[^'\\\n]|\\[\s\S])*')
+      | (?P<END>\Z)
+    )
+""", re.VERBOSE)
+
+ESCAPE_PATTERN = re.compile(r"\\([\s\S])")
+
+# Whitespace and comments exactly as the reference Lexer skips them.
+SKIP_PATTERN = re.compile(r"(?:\s|\#[^\n]*\n?)*")
+
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def _unescape(match):
+    char = match.group(1)
+    return ESCAPE_MAP.get(char, char)
+
+
+# Drop-in replacement for Lexer driven by MASTER_PATTERN. Positions are kept as
+# offsets; line and column are derived from the last newline offset only when a
+# token is built.
+#
+# When constructed with a reader (any object with read(size) -> str, see
+# open_source) the source is consumed in chunks: self.source only holds the
+# unread window starting at absolute offset self.base, and the window is refilled
+# whenever a lexeme might continue past its end.
+class Scanner:
+    def __init__(self, source_code: str = "", reader=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.source = source_code
+        self.pos = 0
+        self.base = 0
+        self.line = 1
+        self.line_start = 0
+        # Absolute offset of the first character of the last token returned.
+        self.token_start = 0
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.at_eof = reader is None
+
+    @classmethod
+    def from_file(cls, path, chunk_size=DEFAULT_CHUNK_SIZE, use_mmap=False):
+        return cls(reader=open_source(path, use_mmap=use_mmap), chunk_size=chunk_size)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+    def __iter__(self):
+        while True:
+            token = self.get_next_token()
+            yield token
+            if token.type == TokenType.EOF:
+                break
+
+    def _fill(self):
+        # Drop the consumed prefix and append the next chunk to the window.
+        data = self.reader.read(self.chunk_size)
+        if not data:
+            self.at_eof = True
+            return
+        self.base += self.pos
+        self.source = self.source[self.pos:] + data
+        self.pos = 0
+
+    def _advance_lines(self, start, end):
+        newlines = self.source.count('\n', start, end)
+        if newlines:
+            self.line += newlines
+            self.line_start = self.base + self.source.rfind('\n', start, end) + 1
+
+    def _fallback(self):
+        # Position a reference Lexer at the current offset and let it produce
+        # the token (or raise the error) exactly as it would have. In chunked
+        # mode the attempt is repeated with a larger window if the Lexer looked
+        # at the last buffered character.
+        while True:
+            lexer = Lexer.__new__(Lexer)
+            lexer.source = self.source
+            lexer.keywords = KEYWORDS
+            lexer.pos = self.pos
+            lexer.line = self.line
+            lexer.column = self.base + self.pos - self.line_start + 1
+            lexer.current_char = self.source[self.pos]
+
+            try:
+                token = lexer.get_next_token()
+            except Exception:
+                if self.at_eof or lexer.pos + 1 < len(self.source):
+                    raise
+                self._fill()
+                continue
+
+            if not self.at_eof and lexer.pos + 1 >= len(self.source):
+                self._fill()
+                continue
+
+            start = self.pos
+            self.token_start = self.base + SKIP_PATTERN.match(self.source, start).end()
+            self.pos = lexer.pos
+            self._advance_lines(start, self.pos)
+            if token.type == TokenType.EOF:
+                return self._eof_token()
+            return token
+
+    def _eof_token(self):
+        length = self.base + len(self.source)
+        if not length:
+            return Token(TokenType.EOF, None, 1, 1)
+        return Token(TokenType.EOF, None, self.line, length - self.line_start)
+
+    def get_next_token(self):
+        while True:
+            source = self.source
+            pos = self.pos
+            match = MASTER_PATTERN.match(source, pos)
+            if self.at_eof or (match is not None and match.end() < len(source)):
+                break
+            if match is None and pos < len(source):
+                return self._fallback()
+            self._fill()
+
+        if match is None:
+            return self._fallback()
+
+        kind = match.lastgroup
+        start, end = match.span(kind)
+        if start != pos:
+            self._advance_lines(pos, start)
+        self.pos = end
+        self.token_start = self.base + start
+
+        if kind == 'END':
+            return self._eof_token()
+
+        column = self.base + start - self.line_start + 1
+        text = match.group(kind)
+
+        if kind == 'IDENT':
+            token_type = KEYWORDS.get(text, TokenType.IDENTIFIER)
+            if token_type == TokenType.MYBOOL:
+                return Token(token_type, text == "mytrue", self.line, column)
+            return Token(token_type, text, self.line, column)
+
+        if kind == 'PUNCT':
+            return Token(SINGLE_CHAR_TOKENS[text], text, self.line, column)
+
+        if kind == 'NUMBER':
+            return Token(TokenType.NUMBER, int(text), self.line, column)
+
+        if kind == 'OP':
+            # The reference lexer reads the column after consuming the
+            # operator, which stays on the last character at end of input.
+            if end < len(source):
+                column += len(text)
+            else:
+                column += len(text) - 1
+            return Token(TRAILING_OPERATORS[text], text, self.line, column)
+
+        # STRING
+        body = text[1:-1]
+        if '\\' in body:
+            self._advance_lines(start, end)
+            body = ESCAPE_PATTERN.sub(_unescape, body)
+        return Token(TokenType.STRING, body, self.line, column)
+
+    def tokenize(self):
+        return list(self)
+
+
+# Reads decoded text from a memory-mapped file. Newlines are translated the
+# same way open() does in text mode so both readers see identical text.
+class MappedReader:
+    def __init__(self, path, encoding="utf-8"):
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        self._done = False
+
+    def read(self, size):
+        if self._done:
+            return ""
+        while True:
+            data = self._map.read(size) if self._map is not None else b""
+            if not data:
+                self._done = True
+                return self._decoder.decode(b"", final=True)
+            text = self._decoder.decode(data)
+            if text:
+                return text
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def open_source(path, use_mmap=False):
+    if use_mmap:
+        return MappedReader(path)
+    return open(path, "r", encoding="utf-8")
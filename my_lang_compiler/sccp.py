@@ -0,0 +1,226 @@
+from .ir import OpCode, Quadruple, IRProgram, evaluate, JUMP_COMPARES
+from .cfg import ControlFlowGraph, BRANCH_OPS
+from .ssa import build_ssa, destroy_ssa, LABEL_OPS
+
+# Lattice values besides constants: UNDEFINED (no evidence yet) is above
+# every constant, VARYING (not a constant) below.
+UNDEFINED = object()
+VARYING = object()
+
+BINARY_OPS = (
+    OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV,
+    OpCode.SLT, OpCode.SLE, OpCode.SGT, OpCode.SGE, OpCode.SEQ, OpCode.SNE,
+)
+# Instructions that can be replaced by a CONST of their result.
+FOLDABLE_OPS = BINARY_OPS + (OpCode.LOAD,)
+CONDITIONAL_OPS = (OpCode.JFALSE, OpCode.JIF) + tuple(JUMP_COMPARES)
+
+
+def _meet(a, b):
+    if a is UNDEFINED:
+        return b
+    if b is UNDEFINED:
+        return a
+    if a is VARYING or b is VARYING or a != b:
+        return VARYING
+    return a
+
+
+def _taken(instr, value):
+    # Whether a conditional jump is taken (True or False), or UNDEFINED or
+    # VARYING while its operands are.
+    op = instr.op
+    compare = JUMP_COMPARES.get(op)
+    if compare is not None:
+        left = value(instr.arg1)
+        right = value(instr.arg2)
+        if left is VARYING or right is VARYING:
+            return VARYING
+        if left is UNDEFINED or right is UNDEFINED:
+            return UNDEFINED
+        return evaluate(compare, left, right) != 0
+    condition = value(instr.arg1)
+    if condition is VARYING or condition is UNDEFINED:
+        return condition
+    return (condition != 0) == (op == OpCode.JIF)
+
+
+class ConstantPropagator:
+    # Sparse conditional constant propagation (Wegman and Zadeck) on the SSA
+    # form of the program. Values flow through variables, phis, compares and
+    # branches; a branch on a constant only makes one successor executable.
+    # Afterwards constant results become CONSTs, constant branches become a
+    # JMP or fall through, and blocks never found executable are dropped.
+    # Values read before any assignment are treated as unknown.
+    #
+    # Values only move down the lattice, so a phi takes in one operand at a
+    # time: the one whose edge became executable or whose value changed. A
+    # join with n predecessors then costs O(n), not O(n) per edge.
+    def __init__(self, ir_program):
+        self.ir = ir_program
+        self.folded = 0
+        self.branches_folded = 0
+        self.blocks_removed = 0
+
+    def optimize(self):
+        ssa = build_ssa(self.ir)
+        cfg = ControlFlowGraph.of(ssa)
+        instructions = ssa.instructions
+        starts = cfg.starts
+        ends = cfg.ends
+
+        block_of = [0] * len(instructions)
+        definitions = set()
+        # uses[name]: the instructions reading it, as indices, or as
+        # (index, position) for phi operands.
+        uses = {}
+        for block in range(len(cfg)):
+            for index in range(starts[block], ends[block]):
+                block_of[index] = block
+                instr = instructions[index]
+                op = instr.op
+                if op == OpCode.PHI:
+                    operands = instr.arg1
+                    readers = [(index, position) for position in range(len(operands))]
+                elif op == OpCode.CONST or op == OpCode.PRINTS:
+                    operands = readers = ()
+                else:
+                    operands = (instr.arg1, instr.arg2)
+                    readers = (index, index)
+                for operand, reader in zip(operands, readers):
+                    if operand is not None:
+                        entry = uses.get(operand)
+                        if entry is None:
+                            uses[operand] = [reader]
+                        else:
+                            entry.append(reader)
+                if instr.result is not None and op not in LABEL_OPS:
+                    definitions.add(instr.result)
+
+        values = {}
+        executable = [False] * len(cfg)
+        edges = set()
+        flow = [(-1, 0)] if len(cfg) else []
+        work = []
+
+        def value(operand):
+            # Names without a definition (values on entry, string literals)
+            # are not constants.
+            if type(operand) is int:
+                return operand
+            if operand in definitions:
+                return values.get(operand, UNDEFINED)
+            return VARYING
+
+        def update(name, new):
+            old = values.get(name, UNDEFINED)
+            new = _meet(old, new)
+            if new is not old and (old is UNDEFINED or new is VARYING):
+                values[name] = new
+                work.extend(uses.get(name, ()))
+
+        positions = [{pred: position for position, pred in enumerate(preds)} for preds in cfg.preds]
+
+        def take(index, position):
+            # Meets one phi operand into its result once its edge is executable.
+            instr = instructions[index]
+            block = block_of[index]
+            if (cfg.preds[block][position], block) in edges:
+                update(instr.result, value(instr.arg1[position]))
+
+        def visit(index):
+            instr = instructions[index]
+            op = instr.op
+            block = block_of[index]
+            if op == OpCode.PHI:
+                result = UNDEFINED
+                for pred, operand in zip(cfg.preds[block], instr.arg1):
+                    if (pred, block) in edges:
+                        result = _meet(result, value(operand))
+                update(instr.result, result)
+            elif op == OpCode.CONST:
+                update(instr.result, instr.arg1)
+            elif op == OpCode.LOAD or op == OpCode.STORE:
+                update(instr.result, value(instr.arg1))
+            elif op in BINARY_OPS:
+                left = value(instr.arg1)
+                right = value(instr.arg2)
+                if left is VARYING or right is VARYING:
+                    update(instr.result, VARYING)
+                elif left is not UNDEFINED and right is not UNDEFINED:
+                    result = evaluate(op, left, right)
+                    update(instr.result, VARYING if result is None else result)
+            elif op in CONDITIONAL_OPS:
+                taken = _taken(instr, value)
+                if taken is UNDEFINED:
+                    return
+                target = cfg.block_of_label[instr.result]
+                if taken is VARYING:
+                    for succ in cfg.succs[block]:
+                        flow.append((block, succ))
+                elif taken:
+                    flow.append((block, target))
+                elif block + 1 < len(cfg):
+                    flow.append((block, block + 1))
+            elif op == OpCode.JMP:
+                flow.append((block, cfg.block_of_label[instr.result]))
+
+        while flow or work:
+            while flow:
+                edge = flow.pop()
+                if edge in edges:
+                    continue
+                edges.add(edge)
+                block = edge[1]
+                if executable[block]:
+                    # Only the phis depend on which edges are executable.
+                    position = positions[block][edge[0]]
+                    for index in range(starts[block], ends[block]):
+                        op = instructions[index].op
+                        if op == OpCode.PHI:
+                            take(index, position)
+                        elif op != OpCode.LABEL:
+                            break
+                    continue
+                executable[block] = True
+                for index in range(starts[block], ends[block]):
+                    visit(index)
+                if instructions[ends[block] - 1].op not in BRANCH_OPS:
+                    for succ in cfg.succs[block]:
+                        flow.append((block, succ))
+            while work:
+                reader = work.pop()
+                if type(reader) is tuple:
+                    if executable[block_of[reader[0]]]:
+                        take(*reader)
+                elif executable[block_of[reader]]:
+                    visit(reader)
+
+        return destroy_ssa(self._rewrite(cfg, instructions, executable, value))
+
+    def _rewrite(self, cfg, instructions, executable, value):
+        result = []
+        for block in range(len(cfg)):
+            if not executable[block]:
+                self.blocks_removed += 1
+                continue
+            for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+                op = instr.op
+                if op in FOLDABLE_OPS:
+                    constant = value(instr.result)
+                    if constant is not VARYING and constant is not UNDEFINED:
+                        result.append(Quadruple(OpCode.CONST, arg1=constant, result=instr.result))
+                        self.folded += 1
+                        continue
+                elif op in CONDITIONAL_OPS:
+                    taken = _taken(instr, value)
+                    if taken is not VARYING and taken is not UNDEFINED:
+                        self.branches_folded += 1
+                        if taken:
+                            result.append(Quadruple(OpCode.JMP, result=instr.result))
+                        continue
+                result.append(instr)
+
+        program = IRProgram()
+        program.instructions = result
+        return program
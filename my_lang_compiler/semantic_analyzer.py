@@ -1,55 +1,99 @@
 from .ast_nodes import Program, Block, VarDecl, Assignment, BinaryOp, UnaryOp, Num, String, Bool, Var, If, While, Print, NoOp, AST
-
-class SymbolTable:
-    def __init__(self, parent=None):
-        self.symbols = {}
-        self.parent = parent
-
-    def define(self, name, type_):
-        # Keep declared symbols truthy even when no explicit type annotation is provided.
-        self.symbols[name] = type_ if type_ is not None else "auto"
+from .ir import Variable
+from .ir_generator import RESERVED_NAME
+from .visitor import NodeVisitor, iter_child_nodes
+
+class ScopeStack:
+    # Flat scope stack: every name maps to the chain of variables bound to it,
+    # innermost last, so lookups don't walk parent scopes. Each frame lists
+    # the names its scope declared, to unbind them when it is popped.
+    def __init__(self):
+        self.bindings = {}
+        self.frames = [{}]
+
+    def push(self):
+        self.frames.append({})
+
+    def pop(self):
+        bindings = self.bindings
+        for name in self.frames.pop():
+            chain = bindings[name]
+            chain.pop()
+            if not chain:
+                del bindings[name]
+
+    def define(self, name, variable):
+        self.frames[-1][name] = variable
+        chain = self.bindings.get(name)
+        if chain is None:
+            self.bindings[name] = [variable]
+        else:
+            chain.append(variable)
 
     def lookup(self, name, local_only=False):
-        if name in self.symbols:
-            return self.symbols[name]
         if local_only:
-            return None
-        if self.parent:
-            return self.parent.lookup(name)
+            return self.frames[-1].get(name)
+        chain = self.bindings.get(name)
+        if chain:
+            return chain[-1]
         return None
 
-class SemanticAnalyzer:
+class SemanticAnalyzer(NodeVisitor):
+    # Resolves every Var to a slot in `variables`, stored on the node as
+    # `slot`. A declaration whose name is already taken by another variable
+    # gets a suffixed C name, so shadowed variables don't share storage, and
+    # one named like a temp or label gets a "v_" prefix (see RESERVED_NAME).
     def __init__(self):
-        self.current_scope = SymbolTable()
-
-    def visit(self, node):
-        method_name = f'visit_{type(node).__name__}'
-        # Basic dispatch
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        self.current_scope = ScopeStack()
+        self.variables = []
+        self.c_names = set()
+        self.imported = {}
+
+    def declare(self, name, type_):
+        scope = self.current_scope
+        nested = len(scope.frames) > 1
+        base = f"v_{name}" if RESERVED_NAME.fullmatch(name) else name
+        c_name = base
+        suffix = 2
+        # Variables declared elsewhere (see resolve) are only known by lookup.
+        while c_name in self.c_names or (nested and scope.lookup(c_name) is not None):
+            c_name = f"{base}_{suffix}"
+            suffix += 1
+        self.c_names.add(c_name)
+        # Keep declared symbols truthy even when no explicit type annotation is provided.
+        variable = Variable(len(self.variables), c_name, type_ if type_ is not None else "auto")
+        self.variables.append(variable)
+        return variable
+
+    def resolve(self, variable):
+        slot = variable.slot
+        variables = self.variables
+        if slot < len(variables) and variables[slot] is variable:
+            return slot
+        # A variable declared by another analyzer (incremental.GlobalScope
+        # resolves names against earlier statements) gets a slot here on
+        # first use.
+        slot = self.imported.get(variable)
+        if slot is None:
+            slot = self.imported[variable] = len(variables)
+            variables.append(variable)
+            self.c_names.add(variable.name)
+        return slot
 
     def generic_visit(self, node):
-        if hasattr(node, '__dict__'):
-            for child in node.__dict__.values():
-                if isinstance(child, list):
-                    for item in child:
-                        if isinstance(item, AST):
-                             self.visit(item)
-                elif isinstance(child, AST):
-                    self.visit(child)
+        return tuple(iter_child_nodes(node))
 
     def visit_Program(self, node):
-        for stmt in node.statements:
-            self.visit(stmt)
+        return tuple(node.statements)
 
     def visit_Block(self, node):
-        previous_scope = self.current_scope
-        self.current_scope = SymbolTable(parent=previous_scope)
+        scope = self.current_scope
+        scope.push()
         try:
             for stmt in node.statements:
-                self.visit(stmt)
+                yield stmt
         finally:
-            self.current_scope = previous_scope
+            scope.pop()
 
     def visit_VarDecl(self, node):
         var_name = node.var_name.value
@@ -58,9 +102,11 @@ class SemanticAnalyzer:
              raise Exception(f"Variable '{var_name}' already declared in this scope")
 
         if node.initializer:
-            self.visit(node.initializer)
-            
-        self.current_scope.define(var_name, node.type_annotation)
+            yield node.initializer
+
+        variable = self.declare(var_name, node.type_annotation)
+        node.var_name.slot = variable.slot
+        self.current_scope.define(var_name, variable)
 
     def visit_Assignment(self, node):
         # Check if left is a Var (it should be)
@@ -68,17 +114,18 @@ class SemanticAnalyzer:
              raise Exception(f"Invalid assignment target")
              
         var_name = node.left.value
-        if self.current_scope.lookup(var_name) is None:
+        variable = self.current_scope.lookup(var_name)
+        if variable is None:
             raise Exception(f"Variable '{var_name}' not declared before assignment")
-        
-        self.visit(node.right)
+        node.left.slot = self.resolve(variable)
+
+        yield node.right
 
     def visit_BinaryOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        return (node.left, node.right)
 
     def visit_UnaryOp(self, node):
-        self.visit(node.expr)
+        return (node.expr,)
 
     def visit_Num(self, node):
         pass
@@ -91,21 +138,21 @@ class SemanticAnalyzer:
 
     def visit_Var(self, node):
         var_name = node.value
-        if self.current_scope.lookup(var_name) is None:
+        variable = self.current_scope.lookup(var_name)
+        if variable is None:
             raise Exception(f"Variable '{var_name}' not declared")
+        node.slot = self.resolve(variable)
 
     def visit_If(self, node):
-        self.visit(node.condition)
-        self.visit(node.then_branch)
         if node.else_branch:
-            self.visit(node.else_branch)
+            return (node.condition, node.then_branch, node.else_branch)
+        return (node.condition, node.then_branch)
 
     def visit_While(self, node):
-        self.visit(node.condition)
-        self.visit(node.body)
+        return (node.condition, node.body)
 
     def visit_Print(self, node):
-        self.visit(node.expr)
+        return (node.expr,)
 
     def visit_NoOp(self, node):
         pass
@@ -0,0 +1,212 @@
+from .ir import OpCode, Quadruple, IRProgram, Variable, Version, JUMP_COMPARES
+from .cfg import ControlFlowGraph
+
+# Instructions whose result is a label rather than a value.
+LABEL_OPS = (OpCode.JMP, OpCode.JIF, OpCode.JFALSE, OpCode.LABEL) + tuple(JUMP_COMPARES)
+# Instructions whose arg1 is a literal rather than a name.
+LITERAL_OPS = (OpCode.CONST, OpCode.PRINTS)
+
+
+def _collect_names(instructions, cfg, blocks):
+    # Variables, plus temps assigned more than once, are renamed; the other
+    # temps already have a single definition. Returns the renamed names and,
+    # for those live into some block (the only ones needing phis), the blocks
+    # defining them.
+    definitions = {}
+    for block in blocks:
+        for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+            result = instr.result
+            if result is not None and instr.op not in LABEL_OPS:
+                sites = definitions.get(result)
+                if sites is None:
+                    definitions[result] = [block]
+                else:
+                    sites.append(block)
+
+    renamed = {name for name, sites in definitions.items() if type(name) is Variable or len(sites) > 1}
+    live_in = set()
+    for block in blocks:
+        killed = set()
+        for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+            for operand in (instr.arg2,) if instr.op in LITERAL_OPS else (instr.arg1, instr.arg2):
+                if operand in renamed:
+                    if operand not in killed:
+                        live_in.add(operand)
+                elif type(operand) is Variable:
+                    # Read but never assigned.
+                    renamed.add(operand)
+                    live_in.add(operand)
+            result = instr.result
+            if result in renamed and instr.op not in LABEL_OPS:
+                killed.add(result)
+    return renamed, {name: set(definitions.get(name, ())) for name in live_in}
+
+
+def build_ssa(program):
+    # Returns a copy of `program` in SSA form: every definition of a variable
+    # (or of a temp assigned more than once) gets its own Version, and PHI
+    # instructions merge versions at joins. Unreachable blocks are dropped.
+    # PHI operands line up with the block's predecessors in
+    # ControlFlowGraph.of() of the result.
+    cfg = ControlFlowGraph.of(program)
+    if len(cfg) and cfg.preds[0]:
+        # The entry must not be a join: enter through a jump to it instead.
+        entered = IRProgram()
+        entered.instructions = [Quadruple(OpCode.JMP, result=program.instructions[0].result)] + list(program.instructions)
+        program = entered
+        cfg = ControlFlowGraph.of(program)
+
+    instructions = program.instructions
+    reachable = sorted(cfg.reverse_postorder())
+    renamed, definitions = _collect_names(instructions, cfg, reachable)
+    # Predecessors as they will be once unreachable blocks are gone.
+    kept = [False] * len(cfg)
+    for block in reachable:
+        kept[block] = True
+    preds = [[pred for pred in block_preds if kept[pred]] for block_preds in cfg.preds]
+    # positions[b][pred]: the phi operand of b that pred supplies.
+    positions = [{pred: position for position, pred in enumerate(block_preds)} for block_preds in preds]
+
+    # Phis go on the iterated dominance frontier of each name's definitions
+    # (semi-pruned: only for names live into some block). Their results are
+    # filled in while renaming.
+    frontiers = cfg.dominance_frontiers()
+    phis = [[] for _ in range(len(cfg))]
+    for name, sites in definitions.items():
+        placed = set()
+        worklist = list(sites)
+        while worklist:
+            block = worklist.pop()
+            for join in frontiers[block]:
+                if join not in placed:
+                    placed.add(join)
+                    phis[join].append(Quadruple(OpCode.PHI, arg1=[None] * len(preds[join]), arg2=name))
+                    if join not in sites:
+                        worklist.append(join)
+
+    counters = {}
+    stacks = {}
+    entry_versions = {}
+
+    def current(name):
+        stack = stacks.get(name)
+        if stack:
+            return stack[-1]
+        version = entry_versions.get(name)
+        if version is None:
+            version = entry_versions[name] = Version(name, 0)
+        return version
+
+    def define(name, pushed):
+        index = counters.get(name, 0) + 1
+        counters[name] = index
+        version = Version(name, index)
+        stack = stacks.get(name)
+        if stack is None:
+            stacks[name] = [version]
+        else:
+            stack.append(version)
+        pushed.append(name)
+        return version
+
+    # Renaming walks the dominator tree over an explicit stack. A block's
+    # frame comes back once its subtree is done, to pop what it pushed.
+    bodies = [None] * len(cfg)
+    children = cfg.dom_children
+    stack = [(0, None)] if reachable else []
+    while stack:
+        block, pushed = stack.pop()
+        if pushed is not None:
+            for name in pushed:
+                stacks[name].pop()
+            continue
+
+        pushed = []
+        for phi in phis[block]:
+            phi.result = define(phi.arg2, pushed)
+
+        body = []
+        for instr in instructions[cfg.starts[block]:cfg.ends[block]]:
+            op = instr.op
+            arg1 = instr.arg1
+            arg2 = instr.arg2
+            result = instr.result
+            if arg1 in renamed and op not in LITERAL_OPS:
+                arg1 = current(arg1)
+            if arg2 in renamed:
+                arg2 = current(arg2)
+            if result in renamed and op not in LABEL_OPS:
+                result = define(result, pushed)
+            if arg1 is instr.arg1 and arg2 is instr.arg2 and result is instr.result:
+                # Nothing renamed: share the instruction.
+                body.append(instr)
+            else:
+                body.append(Quadruple(op, arg1, arg2, result))
+        bodies[block] = body
+
+        for succ in cfg.succs[block]:
+            position = positions[succ][block]
+            for phi in phis[succ]:
+                phi.arg1[position] = current(phi.arg2)
+
+        stack.append((block, pushed))
+        for child in children[block]:
+            stack.append((child, None))
+
+    result = IRProgram()
+    result.instructions = _assemble(reachable, bodies, phis)
+    return result
+
+
+def _assemble(blocks, bodies, phis):
+    # Phis go after a block's labels.
+    instructions = []
+    for block in blocks:
+        body = bodies[block]
+        labels = 0
+        while labels < len(body) and body[labels].op == OpCode.LABEL:
+            labels += 1
+        instructions.extend(body[:labels])
+        instructions.extend(phis[block])
+        instructions.extend(body[labels:])
+    return instructions
+
+
+def _base(operand):
+    if type(operand) is Version:
+        return operand.base
+    return operand
+
+
+def jumps_to_next(instructions, index):
+    # True if instructions[index] jumps to one of the labels right after it.
+    target = instructions[index].result
+    index += 1
+    while index < len(instructions) and instructions[index].op == OpCode.LABEL:
+        if instructions[index].result == target:
+            return True
+        index += 1
+    return False
+
+
+def destroy_ssa(program):
+    # Maps every Version back to its base name and drops the phis. This is
+    # only valid while the versions of a name never hold different values at
+    # the same time, which holds for passes that fold or delete instructions
+    # but do not move uses across definitions. Also drops a jump to one of
+    # the labels right after it, such as the one build_ssa may add at the
+    # entry.
+    instructions = program.instructions
+    result = []
+    for index, instr in enumerate(instructions):
+        op = instr.op
+        if op == OpCode.PHI:
+            continue
+        if op == OpCode.JMP and jumps_to_next(instructions, index):
+            continue
+        if type(instr.arg1) is Version or type(instr.arg2) is Version or type(instr.result) is Version:
+            instr = Quadruple(op, _base(instr.arg1), _base(instr.arg2), _base(instr.result))
+        result.append(instr)
+    destroyed = IRProgram()
+    destroyed.instructions = result
+    return destroyed
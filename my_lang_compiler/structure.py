@@ -0,0 +1,257 @@
+from .cfg import BRANCH_OPS, ControlFlowGraph
+from .codegen import CodeGenerator, JUMP_OPERATORS
+from .ir import OpCode
+from .packed import PackedIR
+
+# Statements of the structured body, as tuples tagged with their kind:
+# (LINE, text), (LABEL, block), (GOTO, block), (JUMP, text),
+# (IF, condition, then, else) and (WHILE, condition or None, body).
+LINE, LABEL, GOTO, JUMP, IF, WHILE = range(6)
+BREAK = (JUMP, "break;")
+CONTINUE = (JUMP, "continue;")
+RETURN = (JUMP, "return 0;")
+
+# Jump target past the last block.
+END = -1
+
+# Statements nested deeper than this are indented as much as at this depth,
+# so the C stays linear in the size of the program.
+MAX_INDENT = 32
+
+NEGATED = {
+    OpCode.JIF: OpCode.JFALSE, OpCode.JFALSE: OpCode.JIF,
+    OpCode.JLT: OpCode.JGE, OpCode.JGE: OpCode.JLT,
+    OpCode.JLE: OpCode.JGT, OpCode.JGT: OpCode.JLE,
+    OpCode.JEQ: OpCode.JNE, OpCode.JNE: OpCode.JEQ,
+}
+
+
+def negate(condition):
+    op, arg1, arg2 = condition
+    return NEGATED[op], arg1, arg2
+
+
+def _is_jump(statements):
+    return len(statements) == 1 and statements[0][0] in (GOTO, JUMP)
+
+
+class StructuredCodeGenerator(CodeGenerator):
+    # A CodeGenerator whose main() uses while loops, if/else and nested
+    # blocks rebuilt from the control-flow graph, instead of a label and a
+    # goto per branch.
+    #
+    # Blocks are placed along the dominator tree, as in Ramsey's "Beyond
+    # Relooper": a block reached only from its immediate dominator is
+    # emitted inline at that branch; a join (reached along several forward
+    # edges) right after its dominator's statement; a loop exit right after
+    # the loop. Natural loops become `while (1)`, or `while (cond)` when the
+    # header only tests the exit. A branch then becomes a fallthrough,
+    # `continue` or `break` where one does, and a goto to a label on the
+    # target otherwise. Irreducible control flow has no natural loop to
+    # rebuild, so its retreating edges all end up as such gotos; C can jump
+    # into a loop, so no label variable is needed as in the relooper.
+    def body(self):
+        program = self.ir.to_program() if type(self.ir) is PackedIR else self.ir
+        self.cfg = ControlFlowGraph.of(program)
+        if not len(self.cfg):
+            return []
+        self._place()
+        self.targets = set()
+        lines = []
+        self.render(self.run(self.sequence(0, END, ())), 1, lines)
+        return lines
+
+    def run(self, work):
+        # sequence(), code() and jump() are generators that yield the calls
+        # they need the statements of and return their own, so nesting depth
+        # grows this stack rather than Python's, as in NodeVisitor.
+        stack = [work]
+        result = None
+        while stack:
+            try:
+                call = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            stack.append(call)
+            result = None
+        return result
+
+    def _place(self):
+        # Sorts every reachable block but the entry into `inline`, `inside`
+        # (a loop header's joins, inside its loop) or `after` (the blocks
+        # following a block's statement, in reverse postorder). A block its
+        # dominator falls or jumps into unconditionally goes after it rather
+        # than inline: the C is the same, but sequence() doesn't nest a call.
+        cfg = self.cfg
+        idom = cfg.idom()
+        self.headers = {loop.header: loop for loop in cfg.loops()}
+        innermost = cfg.innermost_loop
+        self.inline = set()
+        self.inside = {}
+        self.after = {}
+        for block in cfg.reverse_postorder()[1:]:
+            parent = idom[block]
+            exited = None
+            loop = innermost[parent]
+            while loop is not None and block not in loop.blocks:
+                exited = loop
+                loop = loop.parent
+            if exited is not None:
+                self.after.setdefault(exited.header, []).append(block)
+            elif len(cfg.succs[parent]) > 1 and sum(
+                    1 for pred in cfg.preds[block] if cfg.reachable(pred) and not cfg.dominates(block, pred)) == 1:
+                self.inline.add(block)
+            elif parent in self.headers:
+                self.inside.setdefault(parent, []).append(block)
+            else:
+                self.after.setdefault(parent, []).append(block)
+
+    def sequence(self, block, follow, loops):
+        # Statements for `block` and the blocks placed after it, falling
+        # through to `follow`. `loops` holds (header, exit) of the enclosing
+        # while loops, innermost last. The last placed block continues the
+        # loop rather than yielding, so long runs of statements don't nest.
+        statements = []
+        while True:
+            statements.append((LABEL, block))
+            placed = self.after.get(block, ())
+            following = placed[0] if placed else follow
+            if block in self.headers:
+                inside = self.inside.get(block, ())
+                nested = loops + ((block, following),)
+                body = yield self.code(block, inside[0] if inside else block, nested)
+                for index, current in enumerate(inside):
+                    body += yield self.sequence(current, inside[index + 1] if index + 1 < len(inside) else block, nested)
+                statements.append(self.loop(body))
+            else:
+                statements += yield self.code(block, following, loops)
+            if not placed:
+                return statements
+            for current, next_block in zip(placed, placed[1:]):
+                statements += yield self.sequence(current, next_block, loops)
+            block = placed[-1]
+
+    def loop(self, body):
+        if body and body[0][0] == IF and body[0][2] == [BREAK] and not body[0][3]:
+            return (WHILE, negate(body[0][1]), body[1:])
+        return (WHILE, None, body)
+
+    def code(self, block, follow, loops):
+        # The block's instructions, then its branch.
+        cfg = self.cfg
+        instructions = [instr for instr in cfg.instructions(block) if instr.op != OpCode.LABEL]
+        branch = None
+        if instructions and instructions[-1].op in BRANCH_OPS:
+            branch = instructions.pop()
+        statements = [(LINE, line.strip()) for line in self.emit(instructions)]
+
+        fall = block + 1 if block + 1 < len(cfg) else END
+        if branch is None:
+            return statements + (yield self.jump(fall, follow, loops))
+        taken = cfg.block_of_label[branch.result]
+        if branch.op == OpCode.JMP or taken == fall:
+            return statements + (yield self.jump(taken, follow, loops))
+        condition = (branch.op, self._operand(branch.arg1), self._operand(branch.arg2))
+        then = yield self.jump(taken, follow, loops)
+        return statements + self.branch(condition, then, (yield self.jump(fall, follow, loops)))
+
+    def jump(self, target, follow, loops):
+        if target == follow:
+            return []
+        if loops:
+            header, exit = loops[-1]
+            if target == header:
+                return [CONTINUE]
+            if target == exit:
+                return [BREAK]
+        if target in self.inline:
+            return (yield self.sequence(target, follow, loops))
+        if target == END:
+            return [RETURN]
+        self.targets.add(target)
+        return [(GOTO, target)]
+
+    def branch(self, condition, then, other):
+        if not then:
+            if not other:
+                return []
+            condition, then, other = negate(condition), other, then
+        elif _is_jump(other) and not _is_jump(then):
+            condition, then, other = negate(condition), other, then
+        if _is_jump(then):
+            return [(IF, condition, then, [])] + other
+        return [(IF, condition, then, other)]
+
+    def label(self, block):
+        # The block's first IR label, else a name IR labels (L<n>) can't have.
+        instr = self.cfg.instructions(block)[0]
+        return instr.result if instr.op == OpCode.LABEL else f"B{block}"
+
+    def condition(self, condition):
+        op, arg1, arg2 = condition
+        if op == OpCode.JIF:
+            return f"{arg1}"
+        if op == OpCode.JFALSE:
+            return f"!{arg1}"
+        return f"{arg1} {JUMP_OPERATORS[op]} {arg2}"
+
+    def render(self, statements, depth, lines):
+        # Appends the C lines of `statements`. A frame of `work` holds the
+        # statements, finished lines (str) and nested bodies (list, one level
+        # deeper) still to render at its depth.
+        work = [(iter(statements), depth)]
+        while work:
+            items, depth = work[-1]
+            statement = next(items, None)
+            if statement is None:
+                work.pop()
+                continue
+            indent = "    " * min(depth, MAX_INDENT)
+            if type(statement) is str:
+                lines.append(statement)
+                continue
+            if type(statement) is list:
+                work.append((iter(statement), depth + 1))
+                continue
+            kind = statement[0]
+            if kind == LINE or kind == JUMP:
+                lines.append(indent + statement[1])
+            elif kind == LABEL:
+                if statement[1] in self.targets:
+                    lines.append(f"{self.label(statement[1])}:;")
+            elif kind == GOTO:
+                lines.append(f"{indent}goto {self.label(statement[1])};")
+            elif kind == WHILE:
+                _, condition, body = statement
+                lines.append(f"{indent}while ({self.condition(condition) if condition else 1}) {{")
+                work.append((iter((body, indent + "}")), depth))
+            else:
+                work.append((iter(self.render_if(statement, indent)), depth))
+
+    def render_if(self, statement, indent):
+        # The lines and bodies of an if, its else-ifs and its else.
+        _, condition, then, other = statement
+        if _is_jump(then) and not other:
+            return [f"{indent}if ({self.condition(condition)}) {self.jump_text(then[0])}"]
+        parts = [f"{indent}if ({self.condition(condition)}) {{"]
+        while True:
+            parts.append(then)
+            visible = [s for s in other if s[0] != LABEL or s[1] in self.targets]
+            if not visible:
+                break
+            if len(visible) == 1 and visible[0][0] == IF:
+                _, condition, then, other = visible[0]
+                parts.append(f"{indent}}} else if ({self.condition(condition)}) {{")
+                continue
+            parts.append(f"{indent}}} else {{")
+            parts.append(other)
+            break
+        parts.append(indent + "}")
+        return parts
+
+    def jump_text(self, statement):
+        if statement[0] == GOTO:
+            return f"goto {self.label(statement[1])};"
+        return statement[1]
@@ -1,3 +1,4 @@
+from array import array
 from enum import Enum, auto
 
 class TokenType(Enum):
@@ -39,6 +40,8 @@ class TokenType(Enum):
     EOF = auto()
 
 class Token:
+    __slots__ = ("type", "value", "line", "column")
+
     def __init__(self, type_: TokenType, value: any, line: int = 0, column: int = 0):
         self.type = type_
         self.value = value
@@ -47,3 +50,67 @@ class Token:
 
     def __repr__(self):
         return f"Token({self.type.name}, {repr(self.value)}, Line:{self.line}, Col:{self.column})"
+
+
+TOKEN_TYPES = [None] + list(TokenType)
+
+
+# Struct-of-arrays token storage. Type codes, positions and value ids live in
+# typed arrays; values are interned once in self.values. Parser consumes it
+# through get_next_token() like any lexer, materialising one Token at a time.
+class TokenStream:
+    def __init__(self):
+        self.types = array("B")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.value_ids = array("I")
+        self.values = []
+        self._value_index = {}
+        self.cursor = 0
+
+    @classmethod
+    def from_lexer(cls, lexer):
+        stream = cls()
+        for token in lexer:
+            stream.append(token)
+        return stream
+
+    def intern(self, value):
+        # Keyed by type as well so that True and 1 stay distinct.
+        key = (value.__class__, value)
+        index = self._value_index.get(key)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self._value_index[key] = index
+        return index
+
+    def append(self, token):
+        self.types.append(token.type.value)
+        self.lines.append(token.line)
+        self.columns.append(token.column)
+        self.value_ids.append(self.intern(token.value))
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        return Token(
+            TOKEN_TYPES[self.types[index]],
+            self.values[self.value_ids[index]],
+            self.lines[index],
+            self.columns[index],
+        )
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield self[index]
+
+    def get_next_token(self):
+        index = self.cursor
+        if index < len(self.types) - 1:
+            self.cursor = index + 1
+        return self[index]
+
+    def tokenize(self):
+        return list(self)
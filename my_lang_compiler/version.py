@@ -0,0 +1,19 @@
+import re
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+
+def cli_version():
+    try:
+        return version("my-lang-compiler")
+    except PackageNotFoundError:
+        pyproject_path = Path(__file__).resolve().parent.parent / "pyproject.toml"
+        try:
+            pyproject_text = pyproject_path.read_text(encoding="utf-8")
+        except OSError:
+            return "unknown"
+
+        match = re.search(r'^version\s*=\s*"([^"]+)"', pyproject_text, flags=re.MULTILINE)
+        if match:
+            return match.group(1)
+        return "unknown"
@@ -0,0 +1,128 @@
+from types import GeneratorType
+
+from .ast_nodes import AST
+
+tuple_iterator = type(iter(()))
+
+
+class DispatchTable(dict):
+    # Maps a node class to the visitor function handling it; each entry is
+    # resolved once, on first sight of the class.
+    def __init__(self, visitor_class):
+        super().__init__()
+        self.visitor_class = visitor_class
+
+    def __missing__(self, node_class):
+        # Subclasses of a node class (such as arena views) share its visitor.
+        method = self.visitor_class.generic_visit
+        for klass in node_class.__mro__:
+            found = getattr(self.visitor_class, f'visit_{klass.__name__}', None)
+            if found is not None:
+                method = found
+                break
+        self[node_class] = method
+        return method
+
+
+class NodeVisitor:
+    # Base class for AST passes.
+    #
+    # A visit_* method handles its node in one of three ways:
+    #   - return a value directly (leaves); the value must not be a tuple;
+    #   - return a tuple of child nodes, which are then visited in order and
+    #     whose results are discarded;
+    #   - be a generator that does `result = yield child` for every child it
+    #     needs, and returns its own result.
+    # visit() drives all of these from an explicit stack, so the depth of the
+    # tree never turns into Python recursion.
+    _dispatch_tables = {}
+
+    @classmethod
+    def dispatch_table(cls):
+        table = NodeVisitor._dispatch_tables.get(cls)
+        if table is None:
+            table = NodeVisitor._dispatch_tables[cls] = DispatchTable(cls)
+        return table
+
+    def generic_visit(self, node):
+        raise Exception(f'No visit_{type(node).__name__} method')
+
+    def visit(self, node):
+        dispatch = self.dispatch_table()
+        generator_type = GeneratorType
+        # Entries are generators, or iterators over tuples of child nodes.
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        try:
+            result = dispatch[type(node)](self, node)
+        except BaseException as exc:
+            self._unwind(stack, exc)
+        result_type = type(result)
+        while result_type is generator_type or result_type is tuple:
+            push(result if result_type is generator_type else iter(result))
+            result = None
+
+            # Resume the innermost frame until a child has children of its
+            # own. Leaves are visited right here: a tuple frame drops their
+            # results and a generator gets them sent straight back, without
+            # a trip through the stack.
+            while stack:
+                frame = stack[-1]
+                if type(frame) is tuple_iterator:
+                    for child in frame:
+                        try:
+                            result = dispatch[type(child)](self, child)
+                        except BaseException as exc:
+                            self._unwind(stack, exc)
+                        result_type = type(result)
+                        if result_type is generator_type or result_type is tuple:
+                            break
+                    else:
+                        pop()
+                        result = None
+                        continue
+                    break
+                try:
+                    child = frame.send(result)
+                except StopIteration as stop:
+                    pop()
+                    result = stop.value
+                    continue
+                except BaseException as exc:
+                    pop()
+                    self._unwind(stack, exc)
+                try:
+                    result = dispatch[type(child)](self, child)
+                except BaseException as exc:
+                    self._unwind(stack, exc)
+                result_type = type(result)
+                if result_type is generator_type or result_type is tuple:
+                    break
+            else:
+                return result
+        return result
+
+    def _unwind(self, stack, exc):
+        # Re-raise an error through the suspended generators so their
+        # try/finally blocks run innermost first.
+        while stack:
+            frame = stack.pop()
+            if type(frame) is not tuple_iterator:
+                try:
+                    frame.throw(exc)
+                except BaseException as raised:
+                    exc = raised
+        raise exc
+
+
+def iter_child_nodes(node):
+    for name in node._fields:
+        child = getattr(node, name)
+        if isinstance(child, list):
+            for item in child:
+                if isinstance(item, AST):
+                    yield item
+        elif isinstance(child, AST):
+            yield child
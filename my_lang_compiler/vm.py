@@ -0,0 +1,423 @@
+from array import array
+
+from .ir import OpCode, Quadruple, Variable, INT_BITS, JUMP_COMPARES
+from .liveness import Liveness, uses, definition
+from .peephole import FUSED_JUMPS, NEGATED_JUMPS
+
+# Bytecode opcodes. Operands follow the opcode in the code array; FORMATS
+# lists them: d is the register written, r a register read, k a constant,
+# t a jump target (code offset) and s an index into the string table.
+(MOV, MOVK, ADD, ADDK, SUB, SUBK, MUL, MULK, DIV, DIVK, SLT, SLE, SEQ, SNE,
+ JMP, JT, JF, JLT, JLE, JEQ, JNE, JLTK, JLEK, JGTK, JGEK, JEQK, JNEK,
+ PRINT, PRINTS, HALT) = range(30)
+NAMES = (
+    "MOV", "MOVK", "ADD", "ADDK", "SUB", "SUBK", "MUL", "MULK", "DIV", "DIVK", "SLT", "SLE", "SEQ", "SNE",
+    "JMP", "JT", "JF", "JLT", "JLE", "JEQ", "JNE", "JLTK", "JLEK", "JGTK", "JGEK", "JEQK", "JNEK",
+    "PRINT", "PRINTS", "HALT",
+)
+FORMATS = (
+    "dr", "dk", "drr", "drk", "drr", "drk", "drr", "drk", "drr", "drk", "drr", "drr", "drr", "drr",
+    "t", "rt", "rt", "rrt", "rrt", "rrt", "rrt", "rkt", "rkt", "rkt", "rkt", "rkt", "rkt",
+    "r", "s", "",
+)
+
+# IR arithmetic: (register form, constant form).
+ARITHMETIC = {
+    OpCode.ADD: (ADD, ADDK),
+    OpCode.SUB: (SUB, SUBK),
+    OpCode.MUL: (MUL, MULK),
+    OpCode.DIV: (DIV, DIVK),
+}
+COMMUTATIVE_OPS = (OpCode.ADD, OpCode.MUL)
+# IR compares and compare jumps: (bytecode op, operands swapped). a > b is
+# run as b < a.
+COMPARES = {
+    OpCode.SLT: (SLT, False), OpCode.SLE: (SLE, False), OpCode.SGT: (SLT, True),
+    OpCode.SGE: (SLE, True), OpCode.SEQ: (SEQ, False), OpCode.SNE: (SNE, False),
+}
+COMPARE_JUMPS = {
+    OpCode.JLT: (JLT, False), OpCode.JLE: (JLE, False), OpCode.JGT: (JLT, True),
+    OpCode.JGE: (JLE, True), OpCode.JEQ: (JEQ, False), OpCode.JNE: (JNE, False),
+}
+CONSTANT_JUMPS = {
+    OpCode.JLT: JLTK, OpCode.JLE: JLEK, OpCode.JGT: JGTK,
+    OpCode.JGE: JGEK, OpCode.JEQ: JEQK, OpCode.JNE: JNEK,
+}
+# `k < a` is `a > k`.
+MIRRORED_JUMPS = {
+    OpCode.JLT: OpCode.JGT, OpCode.JLE: OpCode.JGE, OpCode.JGT: OpCode.JLT,
+    OpCode.JGE: OpCode.JLE, OpCode.JEQ: OpCode.JEQ, OpCode.JNE: OpCode.JNE,
+}
+# The conditional jump taken exactly when the given one is not.
+INVERTED_JUMPS = {jump: NEGATED_JUMPS[compare] for jump, compare in JUMP_COMPARES.items()}
+INVERTED_JUMPS[OpCode.JIF] = OpCode.JFALSE
+INVERTED_JUMPS[OpCode.JFALSE] = OpCode.JIF
+COPY_OPS = (OpCode.CONST, OpCode.LOAD, OpCode.STORE)
+VALUE_OPS = COPY_OPS + tuple(ARITHMETIC) + tuple(COMPARES)
+
+INT_MIN = -(1 << (INT_BITS - 1))
+INT_MAX = (1 << (INT_BITS - 1)) - 1
+
+
+def wrap(value):
+    return (value - INT_MIN) % (1 << INT_BITS) + INT_MIN
+
+
+def _key(operand):
+    return operand.name if type(operand) is Variable else operand
+
+
+class Bytecode:
+    # An IRProgram lowered to register bytecode for run(). Temps and
+    # variables become registers, and instructions are an opcode followed by
+    # its operands in one array of ints (see FORMATS); jump targets are
+    # offsets into it. Lowering removes the instructions that only move
+    # values between IR names:
+    # - a copy (CONST, LOAD, STORE) into a temp that dies at its next read in
+    #   the block is dropped and the read uses the copy's source, so
+    #   `LOAD x -> t; ADD t 1 -> u` runs as one ADD reading x,
+    # - an instruction whose temp only feeds the STORE after it writes the
+    #   variable itself, so `ADD x 1 -> t; STORE t -> x` is one ADD,
+    # - a compare whose temp only feeds the JIF/JFALSE after it becomes one
+    #   compare-and-jump,
+    # - integer operands are embedded in the instruction (ADDK, JLTK, ...),
+    # - a JMP to a conditional jump, as at the end of every mywhile body,
+    #   becomes the inverted conditional jump to the instruction after it,
+    #   plus a JMP for when the loop exits.
+    # Counters: `forwarded`, `merged`, `fused` and `rotated` count the four
+    # rewrites, `instructions` the bytecode instructions.
+    def __init__(self):
+        self.code = array("i")
+        self.initial = []
+        self.strings = []
+        self.registers = {}
+        self.instructions = 0
+        self.forwarded = 0
+        self.merged = 0
+        self.fused = 0
+        self.rotated = 0
+        self._decoded = None
+
+    @classmethod
+    def from_program(cls, ir_program):
+        bytecode = cls()
+        bytecode._encode(bytecode._rewrite(ir_program))
+        return bytecode
+
+    def _rewrite(self, program):
+        # The IR with the copies, stores and compares described above folded
+        # into the instructions next to them.
+        live = Liveness.of(program)
+        cfg = live.cfg
+        instructions = program.instructions
+        result = []
+        for block in range(len(cfg)):
+            body = instructions[cfg.starts[block]:cfg.ends[block]]
+
+            # dies[i]: names whose value is read for the last time at body[i].
+            dies = [None] * len(body)
+            alive = set(live.decode(live.live_out[block]))
+            for position in range(len(body) - 1, -1, -1):
+                instr = body[position]
+                read = uses(instr)
+                dies[position] = {_key(name) for name in read if _key(name) not in alive}
+                name = definition(instr)
+                if name is not None:
+                    alive.discard(_key(name))
+                alive.update(_key(name) for name in read)
+
+            kept = []
+            # Temp -> (index in kept, source) of copies not read yet.
+            pending = {}
+            for position, instr in enumerate(body):
+                op = instr.op
+                arg1 = instr.arg1
+                arg2 = instr.arg2
+                dying = dies[position]
+                if op != OpCode.PRINTS:
+                    forwarded = False
+                    if type(arg1) is str and arg1 in pending:
+                        copy, source = pending.pop(arg1)
+                        if arg1 in dying:
+                            kept[copy] = None
+                            arg1 = source
+                            forwarded = True
+                    if type(arg2) is str and arg2 in pending:
+                        copy, source = pending.pop(arg2)
+                        if arg2 in dying:
+                            kept[copy] = None
+                            arg2 = source
+                            forwarded = True
+                    if type(instr.arg2) is str and instr.arg2 == instr.arg1 and forwarded:
+                        arg2 = arg1
+                    if forwarded:
+                        self.forwarded += 1
+                        instr = Quadruple(op, arg1, arg2, instr.result)
+
+                previous = kept[-1] if kept else None
+                if (op == OpCode.STORE and type(arg1) is str and arg1 in dying and previous is not None
+                        and previous.result == arg1 and previous.op in VALUE_OPS):
+                    kept[-1] = Quadruple(previous.op, previous.arg1, previous.arg2, instr.result)
+                    self.merged += 1
+                    self._written(pending, _key(instr.result))
+                    continue
+                if ((op == OpCode.JIF or op == OpCode.JFALSE) and type(arg1) is str and arg1 in dying
+                        and previous is not None and previous.result == arg1 and previous.op in FUSED_JUMPS):
+                    jumps = FUSED_JUMPS if op == OpCode.JIF else NEGATED_JUMPS
+                    kept[-1] = Quadruple(jumps[previous.op], previous.arg1, previous.arg2, instr.result)
+                    self.fused += 1
+                    continue
+
+                name = definition(instr)
+                if name is not None:
+                    self._written(pending, _key(name))
+                    if op in COPY_OPS and type(name) is str and _key(arg1) != name:
+                        pending[name] = (len(kept), arg1)
+                kept.append(instr)
+            result.extend(instr for instr in kept if instr is not None)
+        return result
+
+    def _written(self, pending, name):
+        # Copies of `name` can't be forwarded past a write to it.
+        pending.pop(name, None)
+        for temp in [temp for temp, (_, source) in pending.items() if _key(source) == name]:
+            del pending[temp]
+
+    def _register(self, operand):
+        key = ("int", operand) if type(operand) is int else _key(operand)
+        register = self.registers.get(key)
+        if register is None:
+            register = self.registers[key] = len(self.initial)
+            self.initial.append(operand if type(operand) is int else 0)
+        return register
+
+    def _encode(self, instructions):
+        # Instructions are built with symbolic targets: a label, or
+        # (label,) for the instruction after the one at the label.
+        first = {}
+        for index, instr in enumerate(instructions):
+            if instr.op == OpCode.LABEL:
+                first[instr.result] = index + 1
+        for label in first:
+            index = first[label]
+            while index < len(instructions) and instructions[index].op == OpCode.LABEL:
+                index += 1
+            first[label] = index
+
+        built = []
+        starts = {}
+        for index, instr in enumerate(instructions):
+            starts[index] = len(built)
+            op = instr.op
+            if op == OpCode.LABEL:
+                continue
+            if op == OpCode.JMP:
+                target = first[instr.result]
+                test = instructions[target] if target < len(instructions) else None
+                if test is not None and test.op in INVERTED_JUMPS:
+                    built.append(self._jump(INVERTED_JUMPS[test.op], test.arg1, test.arg2, (instr.result,)))
+                    built.append((JMP, test.result))
+                    self.rotated += 1
+                else:
+                    built.append((JMP, instr.result))
+            elif op in INVERTED_JUMPS:
+                built.append(self._jump(op, instr.arg1, instr.arg2, instr.result))
+            else:
+                built.append(self._instruction(instr))
+        starts[len(instructions)] = len(built)
+        built.append((HALT,))
+
+        offsets = []
+        offset = 0
+        for instr in built:
+            offsets.append(offset)
+            offset += len(instr)
+
+        def resolve(target):
+            if type(target) is tuple:
+                return offsets[starts[first[target[0]]] + 1]
+            return offsets[starts[first[target]]]
+
+        code = self.code
+        for instr in built:
+            code.append(instr[0])
+            for kind, operand in zip(FORMATS[instr[0]], instr[1:]):
+                code.append(resolve(operand) if kind == "t" else operand)
+        self.instructions = len(built)
+
+    def _embeddable(self, operand):
+        return type(operand) is int and INT_MIN <= operand <= INT_MAX
+
+    def _jump(self, op, arg1, arg2, target):
+        register = self._register
+        if op == OpCode.JIF or op == OpCode.JFALSE:
+            return (JT if op == OpCode.JIF else JF, register(arg1), target)
+        if self._embeddable(arg1) and not self._embeddable(arg2):
+            op = MIRRORED_JUMPS[op]
+            arg1, arg2 = arg2, arg1
+        if self._embeddable(arg2):
+            return (CONSTANT_JUMPS[op], register(arg1), arg2, target)
+        jump, swapped = COMPARE_JUMPS[op]
+        if swapped:
+            arg1, arg2 = arg2, arg1
+        return (jump, register(arg1), register(arg2), target)
+
+    def _instruction(self, instr):
+        register = self._register
+        op = instr.op
+        arg1 = instr.arg1
+        arg2 = instr.arg2
+        if op in COPY_OPS:
+            if self._embeddable(arg1):
+                return (MOVK, register(instr.result), arg1)
+            return (MOV, register(instr.result), register(arg1))
+        if op in ARITHMETIC:
+            plain, constant = ARITHMETIC[op]
+            if op in COMMUTATIVE_OPS and self._embeddable(arg1) and not self._embeddable(arg2):
+                arg1, arg2 = arg2, arg1
+            if self._embeddable(arg2) and not (op == OpCode.DIV and arg2 == 0):
+                return (constant, register(instr.result), register(arg1), arg2)
+            return (plain, register(instr.result), register(arg1), register(arg2))
+        if op in COMPARES:
+            compare, swapped = COMPARES[op]
+            if swapped:
+                arg1, arg2 = arg2, arg1
+            return (compare, register(instr.result), register(arg1), register(arg2))
+        if op == OpCode.PRINT:
+            return (PRINT, register(arg1))
+        if op == OpCode.PRINTS:
+            self.strings.append(arg1)
+            return (PRINTS, len(self.strings) - 1)
+        raise Exception(f"Unsupported opcode in bytecode: {op}")
+
+    def disassemble(self):
+        code = self.code
+        lines = []
+        pc = 0
+        while pc < len(code):
+            op = code[pc]
+            operands = " ".join(f"{kind}{code[pc + 1 + index]}" for index, kind in enumerate(FORMATS[op]))
+            lines.append(f"{pc:6}  {NAMES[op]:6} {operands}")
+            pc += 1 + len(FORMATS[op])
+        return "\n".join(lines)
+
+    def decode(self):
+        # The code as one (opcode, operand, operand, operand) tuple per
+        # instruction, with jump targets as instruction numbers; unused
+        # operands are 0.
+        code = self.code
+        starts = {}
+        decoded = []
+        pc = 0
+        while pc < len(code):
+            op = code[pc]
+            width = len(FORMATS[op])
+            starts[pc] = len(decoded)
+            decoded.append([op, *code[pc + 1:pc + 1 + width], *(0,) * (3 - width)])
+            pc += 1 + width
+        for instr in decoded:
+            for position, kind in enumerate(FORMATS[instr[0]], start=1):
+                if kind == "t":
+                    instr[position] = starts[instr[position]]
+        return [tuple(instr) for instr in decoded]
+
+    def run(self):
+        # Returns what the program prints. The code is decoded into tuples
+        # on the first run, which makes reading the operands one unpacking.
+        # Dispatch tests the opcode as a binary search over the opcode
+        # numbers, so every instruction is at most five comparisons away;
+        # arithmetic outside the int range takes the wrap() call.
+        if self._decoded is None:
+            self._decoded = self.decode()
+        code = self._decoded
+        r = list(self.initial)
+        strings = self.strings
+        output = []
+        write = output.append
+        pc = 0
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            if op < JMP:
+                if op < SUB:
+                    if op < ADD:
+                        if op == MOV:
+                            r[a] = r[b]
+                        else:
+                            r[a] = b
+                        continue
+                    if op == ADD:
+                        v = r[b] + r[c]
+                    else:
+                        v = r[b] + c
+                elif op < DIV:
+                    if op == SUB:
+                        v = r[b] - r[c]
+                    elif op == SUBK:
+                        v = r[b] - c
+                    elif op == MUL:
+                        v = r[b] * r[c]
+                    else:
+                        v = r[b] * c
+                elif op < SLT:
+                    x = r[b]
+                    y = c if op == DIVK else r[c]
+                    if y == 0:
+                        raise Exception("Division by zero")
+                    q = abs(x) // abs(y)
+                    v = q if (x < 0) == (y < 0) else -q
+                elif op < SEQ:
+                    if op == SLT:
+                        v = 1 if r[b] < r[c] else 0
+                    else:
+                        v = 1 if r[b] <= r[c] else 0
+                elif op == SEQ:
+                    v = 1 if r[b] == r[c] else 0
+                else:
+                    v = 1 if r[b] != r[c] else 0
+                r[a] = v if -2147483648 <= v <= 2147483647 else wrap(v)
+            elif op < JLTK:
+                if op < JLT:
+                    if op == JMP:
+                        pc = a
+                    elif op == JT:
+                        if r[a]:
+                            pc = b
+                    elif not r[a]:
+                        pc = b
+                elif op < JEQ:
+                    if op == JLT:
+                        if r[a] < r[b]:
+                            pc = c
+                    elif r[a] <= r[b]:
+                        pc = c
+                elif op == JEQ:
+                    if r[a] == r[b]:
+                        pc = c
+                elif r[a] != r[b]:
+                    pc = c
+            elif op < PRINT:
+                if op < JGEK:
+                    if op == JLTK:
+                        if r[a] < b:
+                            pc = c
+                    elif op == JLEK:
+                        if r[a] <= b:
+                            pc = c
+                    elif r[a] > b:
+                        pc = c
+                elif op == JGEK:
+                    if r[a] >= b:
+                        pc = c
+                elif op == JEQK:
+                    if r[a] == b:
+                        pc = c
+                elif r[a] != b:
+                    pc = c
+            elif op == PRINT:
+                write(f"{r[a]}\n")
+            elif op == PRINTS:
+                write(f"{strings[a]}\n")
+            else:
+                break
+        return "".join(output)